@@ -11,7 +11,9 @@ import sys
 from pathlib import Path
 from typing import Dict, Iterable, Tuple, NamedTuple
 
-import yaml
+from logger import log as _log
+from profiling import run_main
+
 
 ALLOWED_PREFIXES: Tuple[str, ...] = (
     "connectedSystem.",
@@ -32,10 +34,6 @@ class OverridesPayload(NamedTuple):
     count: int
 
 
-def _log(msg: str) -> None:
-    print(msg, file=sys.stderr, flush=True)
-
-
 def _flatten(data: Dict[str, object], prefix: str = "") -> Dict[str, object]:
     flat: Dict[str, object] = {}
     for key, value in data.items():
@@ -52,6 +50,11 @@ def _flatten(data: Dict[str, object], prefix: str = "") -> Dict[str, object]:
 def _load_yaml(path: Path, env: str) -> Dict[str, object]:
     if not path.exists():
         raise FileNotFoundError(f"No se encontró map_path: {path}")
+    # Import diferido: sin --map el ICF se genera sin cargar PyYAML
+    try:
+        import yaml
+    except ImportError as exc:
+        raise RuntimeError("PyYAML es necesario para --map (pip install pyyaml)") from exc
     with path.open("r", encoding="utf-8") as fh:
         loaded = yaml.safe_load(fh) or {}
     if not isinstance(loaded, dict):
@@ -288,4 +291,4 @@ def main(argv: Iterable[str] | None = None) -> int:
 
 
 if __name__ == "__main__":  # pragma: no cover
-    sys.exit(main())
+    sys.exit(run_main(main, "icf-build"))
@@ -2,150 +2,105 @@
 """CLI that orchestrates Appian export operations and artifact downloads."""
 
 import argparse
+import asyncio
 import json
 import os
 import re
 import sys
-import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
-
-
-def log(msg: str) -> None:
-    """Emit a log line to stderr (surfaced in GitHub Actions logs)."""
-    print(msg, file=sys.stderr, flush=True)
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+# Reutiliza los helpers HTTP compartidos (errores tipados, retries, circuit breaker)
+_PROMOTE_DIR = Path(__file__).resolve().parent.parent / "appian-promote"
+if str(_PROMOTE_DIR) not in sys.path:
+    sys.path.append(str(_PROMOTE_DIR))
+
+from async_http import gather_all, run_sync  # noqa: E402
+from artifact_store import ArtifactStore  # noqa: E402
+from checkpoint import Checkpoint, checkpoint_dir_from, reattach  # noqa: E402
+from deadline import operation_deadline, phase_reserve  # noqa: E402
+from engine import AppianEngine, Download  # noqa: E402
+from errors import AppianError, AppianHTTPError, AppianNetworkError  # noqa: E402
+from export_index import ExportIndex, namespace_for, safe_namespace  # noqa: E402
+from idempotency import new_marker  # noqa: E402
+from logger import log  # noqa: E402
+from metrics import timed_operation  # noqa: E402
+from poll_schedule import (  # noqa: E402
+    poll_schedule_for,
+    previous_export_size,
+    remember_export_size,
+)
+from profiling import run_main  # noqa: E402
+from retry import RetryPolicy  # noqa: E402
+from utils import _http  # noqa: E402
+
+if TYPE_CHECKING:  # pragma: no cover
+    from export_cache import ExportCache
+
+TERMINAL_STATUSES = ("COMPLETED", "COMPLETED_WITH_EXPORT_ERRORS", "FAILED")
+
+
+def _retry_policy() -> RetryPolicy:
+    """Retry policy for export calls (``APPIAN_EXPORT_RETRIES``/``_RETRY_DELAY``)."""
+    return RetryPolicy.from_env("APPIAN_EXPORT_RETRIES", 3, "APPIAN_EXPORT_RETRY_DELAY", 10)
 
 
 def http_json(method: str, url: str, headers: dict, body: dict | None = None):
     """HTTP helper that returns JSON or raw payloads depending on the response."""
     data = None if body is None else json.dumps(body).encode("utf-8")
-    req = Request(url, data=data, method=method)
-    for k, v in headers.items():
-        req.add_header(k, v)
+    h = dict(headers)
     if body is not None:
-        req.add_header("Content-Type", "application/json")
-    try:
-        with urlopen(req, timeout=60) as resp:
-            ct = resp.headers.get("Content-Type", "")
-            raw = resp.read()
-            if "application/json" in ct:
-                return json.loads(raw.decode("utf-8"))
-            return raw
-    except HTTPError as exc:
-        message = exc.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {exc.code} on {url}: {message}") from exc
-    except URLError as e:
-        raise RuntimeError(f"Network error on {url}: {e}") from e
-
-
-def _post_export_start(
-    base_url: str,
-    api_key: str,
-    kind: str,
-    resource_id: str,
-    name: str | None = None,
-    description: str | None = None,
-) -> dict:
-    """Kick off an export deployment and return the deployment metadata."""
-    # Build multipart/form-data with a single 'json' field
-    url = f"{base_url.rstrip('/')}/suite/deployment-management/v2/deployments"
-    boundary = f"----appianboundary{int(time.time())}"
-    # Appian API expects exportType values: "application" or "package".
-    # Allow callers to pass the short alias "app" and normalize here.
-    export_type = "application" if kind.lower() in ("app", "application") else kind
-    payload = {
-        "exportType": export_type,
-        "uuids": [resource_id],
-    }
-    if name:
-        payload["name"] = name
-    if description:
-        payload["description"] = description
-
-    part = (
-        f"--{boundary}\r\n"
-        "Content-Disposition: form-data; name=\"json\"\r\n"
-        "Content-Type: application/json\r\n\r\n"
-        f"{json.dumps(payload)}\r\n"
-        f"--{boundary}--\r\n"
-    ).encode("utf-8")
-
-    req = Request(url, data=part, method="POST")
-    req.add_header("appian-api-key", api_key)
-    req.add_header("Action-Type", "export")
-    req.add_header("Accept", "application/json")
-    req.add_header("Content-Type", f"multipart/form-data; boundary={boundary}")
-    try:
-        with urlopen(req, timeout=60) as resp:
-            raw = resp.read()
-            return json.loads(raw.decode("utf-8"))
-    except HTTPError as exc:
-        message = exc.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {exc.code} on export start: {message}") from exc
-    except URLError as e:
-        raise RuntimeError(f"Network error on export start: {e}") from e
+        h["Content-Type"] = "application/json"
+    raw, resp_headers = _http(method, url, h, data, timeout=60)
+    if "application/json" in resp_headers.get("content-type", ""):
+        return json.loads(raw.decode("utf-8"))
+    return raw
 
 
-def _get_deployment_status(
-    base_url: str,
-    api_key: str,
-    dep_uuid: str,
-    url_hint: str | None = None,
-) -> dict:
-    """Fetch the current export deployment status."""
-    url = url_hint or (
-        f"{base_url.rstrip('/')}/suite/deployment-management/v2/deployments/{dep_uuid}"
-    )
-    req = Request(url, method="GET")
-    req.add_header("appian-api-key", api_key)
-    req.add_header("Accept", "application/json")
-    try:
-        with urlopen(req, timeout=60) as resp:
-            raw = resp.read()
-            return json.loads(raw.decode("utf-8"))
-    except HTTPError as exc:
-        message = exc.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {exc.code} on status: {message}") from exc
-    except URLError as e:
-        raise RuntimeError(f"Network error on status: {e}") from e
+def _looks_like_zip(headers: Dict[str, str], head: bytes) -> bool:
+    """Accept the payload only when the header or the 'PK' signature says ZIP."""
+    is_zip_header = "application/zip" in headers.get("content-type", "").lower()
+    is_zip_magic = len(head) >= 4 and head[:2] == b"PK"
+    return is_zip_header or is_zip_magic
 
 
-def _attempt_download(url: str, api_key: str, out_path: Path) -> bool:
+async def _attempt_download(
+    engine: AppianEngine,
+    url: str,
+    out_path: Path,
+) -> Optional[Download]:
     """Try downloading a ZIP payload from the provided URL."""
-    req = Request(url, method="GET")
-    req.add_header("appian-api-key", api_key)
-    req.add_header("Accept", "application/zip")
-    try:
-        with urlopen(req, timeout=180) as resp:
-            ct = resp.headers.get("Content-Type", "")
-            data = resp.read()
-            # Aceptar solo si es un ZIP válido por header o firma 'PK'
-            is_zip_header = "application/zip" in ct.lower()
-            is_zip_magic = len(data) >= 4 and data[:2] == b"PK"
-            if is_zip_header or is_zip_magic:
-                out_path.parent.mkdir(parents=True, exist_ok=True)
-                out_path.write_bytes(data)
-                return True
-            return False
-    except HTTPError:
-        # 404/400: probamos siguiente candidato
-        return False
-    except URLError:
-        return False
-
-
-def _download_package_from_results(
-    base_url: str,
-    api_key: str,
+    policy = _retry_policy()
+    attempt = 0
+    while True:
+        try:
+            return await engine.download(
+                url,
+                out_path,
+                accept="application/zip",
+                check=_looks_like_zip,
+            )
+        except AppianHTTPError:
+            # 404/400: probamos siguiente candidato
+            return None
+        except AppianNetworkError as exc:
+            # Solo la red se reintenta sobre el mismo candidato
+            attempt += 1
+            if not policy.allows(exc, attempt):
+                return None
+            log(f"export.download=RETRY {attempt}/{policy.attempts} ({exc.cause}: {exc.summary})")
+            await asyncio.sleep(policy.delay_for(attempt))
+
+
+async def _download_package_from_results(
+    engine: AppianEngine,
     results: dict,
     dep_uuid: str,
     status_url: str | None,
     out_path: Path,
-) -> None:
+) -> Download:
     """Download the package ZIP using hints returned by Appian."""
-    base = base_url.rstrip("/")
+    base = engine.base_url
     candidates: list[str] = []
     # Preferir el campo explícito devuelto por v2
     pkg = results.get("packageZip")
@@ -179,8 +134,9 @@ def _download_package_from_results(
         if not u:
             continue
         tried.append(u)
-        if _attempt_download(u, api_key, out_path):
-            return
+        got = await _attempt_download(engine, u, out_path)
+        if got is not None:
+            return got
     joined = "; ".join(tried)
     raise RuntimeError(f"No se pudo descargar el ZIP de export. URLs probadas: {joined}")
 
@@ -211,36 +167,37 @@ def _sanitize_filename(name: str, fallback: str) -> str:
     return base
 
 
-def _download_binary(url: str, api_key: str, out_path: Path, accept: Optional[str] = None) -> str:
-    """Download a binary resource and return the absolute path on disk."""
-    req = Request(url, method="GET")
-    req.add_header("appian-api-key", api_key)
-    if accept:
-        req.add_header("Accept", accept)
+async def _download_binary(
+    engine: AppianEngine,
+    url: str,
+    out_path: Path,
+    accept: Optional[str] = None,
+) -> Download:
+    """Download a binary resource (size and SHA-256 computed while streaming)."""
     try:
-        with urlopen(req, timeout=180) as resp:
-            data = resp.read()
-    except HTTPError as exc:
-        message = exc.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {exc.code} al descargar recurso ({url}): {message}") from exc
-    except URLError as e:
-        raise RuntimeError(f"Network error al descargar recurso ({url}): {e}") from e
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_bytes(data)
-    return str(out_path.resolve())
+        got = await _retry_policy().run(
+            lambda: engine.download(url, out_path, accept=accept),
+            "export.download",
+        )
+    except AppianHTTPError as exc:
+        raise RuntimeError(
+            f"HTTP {exc.status} al descargar recurso ({url}): {exc.body}"
+        ) from exc
+    assert got is not None
+    return got
 
 
-def _download_database_scripts(
-    base_url: str,
-    api_key: str,
+async def _download_database_scripts(
+    engine: AppianEngine,
     results: Dict[str, Any],
     out_dir: Path,
-) -> List[Dict[str, Any]]:
-    """Download optional database scripts exposed by the export API."""
+) -> Tuple[List[Dict[str, Any]], List[Download]]:
+    """Download optional database scripts exposed by the export API (concurrently)."""
     scripts: List[Dict[str, Any]] = []
+    pending = []
     entries = results.get("databaseScripts") or []
     if not isinstance(entries, list):
-        return scripts
+        return scripts, []
     target_dir = out_dir / "db-scripts"
     for idx, entry in enumerate(entries, start=1):
         if not isinstance(entry, dict):
@@ -248,7 +205,7 @@ def _download_database_scripts(
         url = entry.get("url")
         if not url:
             continue
-        safe_url = _ensure_absolute_url(base_url, str(url))
+        safe_url = _ensure_absolute_url(engine.base_url, str(url))
         order = entry.get("orderId")
         fallback_name = f"script_{idx}.sql"
         original_name = str(entry.get("filename") or entry.get("fileName") or fallback_name)
@@ -263,40 +220,66 @@ def _download_database_scripts(
             prefix = f"{idx:03d}-"
             order_int = None
         dest = target_dir / f"{prefix}{safe_name}"
-        path = _download_binary(safe_url, api_key, dest)
+        pending.append(_download_binary(engine, safe_url, dest))
         scripts.append(
             {
-                "path": path,
+                "path": "",
                 "fileName": original_name,
                 "orderId": order if isinstance(order, int) else order_int,
                 "url": safe_url,
             }
         )
-    return scripts
+    downloads = await gather_all(*pending)
+    for entry, got in zip(scripts, downloads):
+        entry["path"] = str(got.path.resolve())
+        entry["size"] = got.size
+        entry["sha256"] = got.sha256
+    return scripts, downloads
+
+
+def _file_checksums(got: Download) -> Dict[str, Any]:
+    return {
+        "size": got.size,
+        "sha256": got.sha256,
+        "chunk_bytes": got.chunk_bytes,
+        "chunks": got.chunks,
+    }
 
 
-def _download_optional_file(
+async def _download_optional_file(
+    engine: AppianEngine,
     url: Optional[Any],
-    base_url: str,
-    api_key: str,
     dest: Path,
     accept: Optional[str] = None,
-) -> str:
+) -> Optional[Download]:
     """Helper to conditionally download optional resources."""
     if not url:
-        return ""
-    safe_url = _ensure_absolute_url(base_url, str(url))
-    return _download_binary(safe_url, api_key, dest, accept=accept)
+        return None
+    safe_url = _ensure_absolute_url(engine.base_url, str(url))
+    return await _download_binary(engine, safe_url, dest, accept=accept)
 
 
-def export_resource(
-    base_url: str,
-    api_key: str,
+@timed_operation("export")
+async def export_resource_async(
+    engine: AppianEngine,
     kind: str,
     resource_id: str,
     out_path: Path,
+    store: Optional[ArtifactStore] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    resume: bool = False,
+    app_uuid: Optional[str] = None,
+    force_export: bool = False,
 ) -> Dict[str, Any]:
-    """Orchestrate the export flow and gather downloadable assets."""
+    """Orchestrate the export flow and gather downloadable assets.
+
+    With ``store`` every downloaded file is added (copied or hardlinked) to the shared
+    artifact store. With ``checkpoint``
+    the submitted deployment is recorded; ``resume`` reattaches to it (and
+    downloads its results if it already finished) instead of re-exporting.
+    With ``store`` and ``app_uuid`` a package whose ``lastModified`` did not
+    change is served from the export cache unless ``force_export``.
+    """
     out_path.parent.mkdir(parents=True, exist_ok=True)
     package_abs = str(out_path.resolve())
     artifact_dir = str(out_path.resolve().parent)
@@ -313,89 +296,240 @@ def export_resource(
         "raw_response": {},
     }
 
-    start = _post_export_start(base_url, api_key, kind, resource_id)
+    cache: Optional[ExportCache] = None
+    last_modified: Optional[str] = None
+    if store is not None and app_uuid and kind == "package":
+        # Solo con store y --app-uuid: el resto de los exports no carga el cache
+        from export_cache import ExportCache, package_last_modified
+
+        cache = ExportCache(store, engine.base_url)
+        try:
+            last_modified = await package_last_modified(engine, app_uuid, resource_id)
+            if last_modified is None:
+                log("export.cache=SKIP Appian no informó lastModified del package")
+        except AppianError as exc:
+            # El cache es una optimización: si el listado falla se exporta como siempre
+            log(f"export.cache=SKIP no se pudo listar los packages ({exc.cause}: {exc.summary})")
+        if last_modified is not None and force_export:
+            log(f"export.cache=FORCED lastModified={last_modified} (--force-export)")
+        elif last_modified is not None:
+            entry = cache.lookup(kind, resource_id, last_modified)
+            if entry is not None:
+                # Sin cambios desde el último export: mismos bytes, mismo manifest
+                cached = cache.materialize(entry, out_path)
+                log(
+                    f"export.cache=HIT lastModified={last_modified} "
+                    f"deployment={cached.get('deployment_uuid')} files={len(cached['files'])}"
+                )
+                if checkpoint is not None:
+                    checkpoint.clear()
+                return cached
+            log(f"export.cache=MISS lastModified={last_modified}")
+
+    start: Optional[Dict[str, Any]] = None
+    marker = new_marker()
+    saved = checkpoint.resumable(resume) if checkpoint is not None else None
+    if saved is not None:
+        start = await reattach(engine, saved)
+        marker = saved.get("marker") or marker
+    if start is None:
+        if checkpoint is not None:
+            checkpoint.save(state="SUBMITTING", marker=marker, kind=kind, resourceId=resource_id)
+        start = await engine.start_export(kind, resource_id, _retry_policy(), marker=marker)
+        if checkpoint is not None and start.get("uuid"):
+            checkpoint.save(state="SUBMITTED", uuid=start.get("uuid"), url=start.get("url"))
     dep_uuid = start.get("uuid")
     status_url = start.get("url")
     if not dep_uuid:
         raise RuntimeError(f"Respuesta inesperada al iniciar export: {start}")
     result["deployment_uuid"] = dep_uuid
 
+    # El tamaño del paquete se conoce recién al descargarlo: el del export anterior lo estima
+    size_ref = f"export|{kind}:{resource_id}"
+    expected_size = previous_export_size(engine.base_url, size_ref) or 0
     max_wait_s = int(os.environ.get("APPIAN_EXPORT_MAX_WAIT", "900"))  # 15 min por defecto
     interval = int(os.environ.get("APPIAN_EXPORT_POLL_INTERVAL", "5"))
-    waited = 0
-    final: Optional[Dict[str, Any]] = None
-    status: str = ""
-    while True:
-        st = _get_deployment_status(base_url, api_key, dep_uuid, status_url)
-        status = str(st.get("status", "")).upper()
-        log(f"status={status} uuid={dep_uuid}")
-        if status in ("COMPLETED", "COMPLETED_WITH_EXPORT_ERRORS", "FAILED"):
-            final = st
-            break
-        time.sleep(interval)
-        waited += interval
-        if waited > max_wait_s:
-            raise RuntimeError("Timeout esperando export en Appian")
-
+    final = await engine.poll_deployment(
+        dep_uuid,
+        status_url,
+        TERMINAL_STATUSES,
+        "status",
+        interval,
+        max_wait_s,
+        "Timeout esperando export en Appian",
+        policy=_retry_policy(),
+        phase="export",
+        # Las descargas posteriores también consumen APPIAN_DEADLINE: reservar según el
+        # paquete anterior (cada descarga se acota luego por su Content-Length)
+        reserve_s=phase_reserve(download_bytes=expected_size),
+        schedule=poll_schedule_for(
+            engine.base_url,
+            "export",
+            interval,
+            size_ref=size_ref,
+            # Reenganchado a mitad de camino: su duración no es representativa
+            learn=saved is None,
+        ),
+    )
+    status = str(final.get("status", "")).upper()
     result["deployment_status"] = status
 
     if status in ("FAILED", "COMPLETED_WITH_EXPORT_ERRORS"):
+        if checkpoint is not None:
+            checkpoint.clear()
         raise RuntimeError(f"Export con errores/failed: {final}")
+    if checkpoint is not None:
+        # Si el runner muere durante las descargas, --resume solo vuelve a descargar
+        checkpoint.save(state=status)
 
-    final_payload: Dict[str, Any] = final or {}
+    final_payload: Dict[str, Any] = final
     result["raw_response"] = final_payload
 
-    _download_package_from_results(base_url, api_key, final_payload, dep_uuid, status_url, out_path)
+    base_dir = out_path.parent
+    # Paquete, scripts y archivos opcionales se descargan en paralelo (acotado por
+    # APPIAN_MAX_CONCURRENCY); si uno falla se cancelan los demás
+    package, (db_scripts, script_downloads), plugins, customization, customization_template = (
+        await gather_all(
+            _download_package_from_results(
+                engine,
+                final_payload,
+                dep_uuid,
+                status_url,
+                out_path,
+            ),
+            _download_database_scripts(engine, final_payload, base_dir),
+            _download_optional_file(
+                engine,
+                final_payload.get("pluginsZip"),
+                base_dir / "plugins" / "plugins.zip",
+            ),
+            _download_optional_file(
+                engine,
+                final_payload.get("customizationFile"),
+                base_dir / "customization" / "customization.properties",
+            ),
+            _download_optional_file(
+                engine,
+                final_payload.get("customizationFileTemplate"),
+                base_dir / "customization" / "customization-template.properties",
+            ),
+        )
+    )
     package_abs = str(out_path.resolve())
     result["package_path"] = package_abs
 
+    remember_export_size(engine.base_url, size_ref, package.size)
     downloaded: List[str] = [package_abs]
+    # Tamaño, SHA-256 y hashes por chunk salen del stream de descarga, sin releer archivos
+    files: Dict[str, Dict[str, Any]] = {package_abs: _file_checksums(package)}
 
-    base_dir = out_path.parent
-
-    db_scripts = _download_database_scripts(base_url, api_key, final_payload, base_dir)
     if db_scripts:
         result["database_scripts"] = db_scripts
         downloaded.extend([entry["path"] for entry in db_scripts])
-
-    plugins_dest = base_dir / "plugins" / "plugins.zip"
-    plugins_path = _download_optional_file(
-        final_payload.get("pluginsZip"),
-        base_url,
-        api_key,
-        plugins_dest,
-    )
-    if plugins_path:
-        result["plugins_zip"] = plugins_path
-        downloaded.append(plugins_path)
-
-    customization_dest = base_dir / "customization" / "customization.properties"
-    customization_path = _download_optional_file(
-        final_payload.get("customizationFile"),
-        base_url,
-        api_key,
-        customization_dest,
-    )
-    if customization_path:
-        result["customization_file"] = customization_path
-        downloaded.append(customization_path)
-
-    customization_template_dest = base_dir / "customization" / "customization-template.properties"
-    customization_template_path = _download_optional_file(
-        final_payload.get("customizationFileTemplate"),
-        base_url,
-        api_key,
-        customization_template_dest,
-    )
-    if customization_template_path:
-        result["customization_template"] = customization_template_path
-        downloaded.append(customization_template_path)
+        for entry, got in zip(db_scripts, script_downloads):
+            files[entry["path"]] = _file_checksums(got)
+
+    for key, got in (
+        ("plugins_zip", plugins),
+        ("customization_file", customization),
+        ("customization_template", customization_template),
+    ):
+        if got is None:
+            continue
+        path = str(got.path.resolve())
+        result[key] = path
+        downloaded.append(path)
+        files[path] = _file_checksums(got)
 
     result["downloaded_files"] = downloaded
+    result["files"] = files
+    if checkpoint is not None:
+        checkpoint.clear()
+    operation_deadline().report("export")
+
+    if store is not None:
+        # El store usa los hashes calculados durante la descarga; nada se vuelve a leer
+        digests = {path: meta["sha256"] for path, meta in files.items()}
+        for path, sha in digests.items():
+            await asyncio.to_thread(store.put, Path(path), sha)
+        result["artifact_store"] = {"root": str(store.root), "objects": digests}
+        log(f"store=WRITE root={store.root} objects={len(digests)}")
+        if cache is not None and last_modified is not None:
+            cache.record(kind, resource_id, last_modified, result)
 
     return result
 
 
+def export_resource(
+    base_url: str,
+    api_key: str,
+    kind: str,
+    resource_id: str,
+    out_path: Path,
+    checkpoint_dir: Optional[Path] = None,
+    resume: bool = False,
+    app_uuid: Optional[str] = None,
+    force_export: bool = False,
+) -> Dict[str, Any]:
+    """Blocking wrapper over :func:`export_resource_async`."""
+    engine = AppianEngine(base_url, api_key)
+    store = ArtifactStore.from_env()
+    checkpoint = None
+    if checkpoint_dir is not None:
+        checkpoint = Checkpoint(checkpoint_dir, "export", base_url, f"{kind}-{resource_id}")
+    elif resume:
+        raise RuntimeError("--resume requiere --checkpoint-dir o APPIAN_CHECKPOINT_DIR")
+    return run_sync(
+        export_resource_async(
+            engine,
+            kind,
+            resource_id,
+            out_path,
+            store,
+            checkpoint,
+            resume,
+            app_uuid,
+            force_export,
+        )
+    )
+
+
+def run_export(args: argparse.Namespace) -> Dict[str, Any]:
+    """Export into the namespace of ``args`` and record it in the outdir index."""
+    # Compose filename determinísticamente
+    nm = args.name or args.rid
+    fname = f"{args.kind}-{args.rid}-{nm}.zip"
+    # Un directorio por export: varios exports en paralelo no comparten archivos
+    namespace = (
+        safe_namespace(args.namespace)
+        if args.namespace
+        else namespace_for(args.kind, args.rid, nm)
+    )
+    index = ExportIndex(Path(args.outdir))
+    out_path = index.root / namespace / fname
+    index.update(namespace, replace=True, state="RUNNING", kind=args.kind, resourceId=args.rid)
+    try:
+        info = export_resource(
+            args.base_url,
+            args.api_key,
+            args.kind,
+            args.rid,
+            out_path,
+            checkpoint_dir_from(args.checkpoint_dir),
+            args.resume,
+            args.app_uuid or None,
+            args.force_export,
+        )
+    except BaseException as exc:
+        index.update(namespace, state="FAILED", error=str(exc)[:500])
+        raise
+    index.record_result(namespace, info)
+    log(f"export.namespace={namespace} index={index.path}")
+    info["namespace"] = namespace
+    info["index_path"] = str(index.path)
+    return info
+
+
 def main() -> None:
     """CLI entry-point."""
     p = argparse.ArgumentParser()
@@ -409,23 +543,44 @@ def main() -> None:
     pe.add_argument("--rid", required=True, help="resource_id")
     pe.add_argument("--name", default="", help="nombre amigable para archivo")
     pe.add_argument("--outdir", default="artifacts")
+    pe.add_argument(
+        "--namespace",
+        default="",
+        help="Subdirectorio del export dentro de --outdir (default <kind>-<rid>-<name>)",
+    )
+    pe.add_argument(
+        "--checkpoint-dir",
+        default="",
+        help="Directorio de checkpoints (default APPIAN_CHECKPOINT_DIR o $RUNNER_TEMP)",
+    )
+    pe.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reengancha el export registrado en el checkpoint (o descarga su resultado)",
+    )
+    pe.add_argument(
+        "--app-uuid",
+        default="",
+        help="App del package; habilita el cache por lastModified (requiere APPIAN_ARTIFACT_STORE)",
+    )
+    pe.add_argument(
+        "--force-export",
+        action="store_true",
+        help="Exporta aunque el package no haya cambiado desde el último export cacheado",
+    )
 
     args = p.parse_args()
 
     if args.cmd == "export":
-        # Compose filename determinísticamente
-        nm = args.name or args.rid
-        fname = f"{args.kind}-{args.rid}-{nm}.zip"
-        out_path = Path(args.outdir) / fname
-        info = export_resource(
-            args.base_url,
-            args.api_key,
-            args.kind,
-            args.rid,
-            out_path,
-        )
-        print(json.dumps(info))
+        if os.environ.get("APPIAN_SERVICE"):
+            from service import submit
+
+            # Mismos argumentos y salida; el servicio mantiene las conexiones abiertas
+            code = submit("export", args)
+            if code is not None:
+                sys.exit(code)
+        print(json.dumps(run_export(args)))
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "export")
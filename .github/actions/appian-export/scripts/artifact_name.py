@@ -9,6 +9,8 @@ import re
 import sys
 from pathlib import Path
 
+from profiling import run_main
+
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Compute Appian export artifact name.")
@@ -65,4 +67,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_main(main, "artifact-name"))
@@ -10,6 +10,9 @@ import sys
 from pathlib import Path
 from typing import Any, Dict
 
+from export_index import ExportIndex
+from profiling import run_main
+
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Post-process Appian export payload.")
@@ -97,6 +100,15 @@ def main() -> int:
         entry["path"] = _to_rel(str(entry.get("path", "")), workspace)
         db_scripts.append(entry)
 
+    # Checksums calculados al descargar; el promote los verifica antes de subir
+    files = []
+    for path, meta in sorted((data.get("files") or {}).items()):
+        if not isinstance(meta, dict):
+            continue
+        entry = {"path": _to_rel(path, workspace)}
+        entry.update(meta)
+        files.append(entry)
+
     manifest_data = {
         "artifact_path": _to_rel(str(package_file), workspace),
         "artifact_dir": _to_rel(str(artifact_dir), workspace),
@@ -109,6 +121,7 @@ def main() -> int:
         "customization_template": _to_rel(
             str(data.get("customization_template", "")), workspace
         ),
+        "files": files,
     }
 
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
@@ -121,6 +134,17 @@ def main() -> int:
         encoding="utf-8",
     )
 
+    # Índice del outdir: los pasos siguientes encuentran cada export por su namespace
+    namespace = str(data.get("namespace") or "")
+    index_path = str(data.get("index_path") or "")
+    if namespace and index_path:
+        index = ExportIndex(Path(index_path).parent)
+        index.update(
+            namespace,
+            manifest=index.relative(manifest_path),
+            rawResponse=index.relative(raw_response_path),
+        )
+
     _write_output(
         artifact_path=manifest_data["artifact_path"],
         artifact_dir=manifest_data["artifact_dir"],
@@ -128,9 +152,11 @@ def main() -> int:
         raw_response_path=_to_rel(str(raw_response_path), workspace),
         deployment_uuid=data.get("deployment_uuid", ""),
         deployment_status=data.get("deployment_status", ""),
+        namespace=namespace,
+        index_path=_to_rel(index_path, workspace),
     )
     return 0
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_main(main, "export-postprocess"))
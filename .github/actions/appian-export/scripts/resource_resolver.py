@@ -8,6 +8,8 @@ import os
 import sys
 from pathlib import Path
 
+from profiling import run_main
+
 
 def _write_outputs(**entries: str) -> None:
     output_path = os.environ.get("GITHUB_OUTPUT")
@@ -98,4 +100,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_main(main, "resource-resolver"))
@@ -9,6 +9,8 @@ import sys
 from pathlib import Path
 from typing import Any
 
+from profiling import run_main
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -103,6 +105,7 @@ def main() -> int:
         "db_scripts_path": "",
         "data_source": "",
         "db_scripts_manifest": "",
+        "export_manifest_path": "",
     }
 
     scripts_path = detect_scripts_dir(args.scripts_dir)
@@ -119,6 +122,10 @@ def main() -> int:
         if manifest:
             outputs["db_scripts_manifest"] = manifest
 
+        export_manifest = meta_dir / "export-manifest.json"
+        if export_manifest.is_file():
+            outputs["export_manifest_path"] = str(export_manifest.resolve())
+
     try:
         write_outputs(Path(args.output), outputs)
     except OSError as exc:
@@ -129,4 +136,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_main(main, "prepare-db-scripts"))
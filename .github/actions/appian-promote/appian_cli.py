@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-"""Command line interface to inspect or import Appian packages."""
+"""Command line interface to inspect, import or watch Appian packages."""
+
+from __future__ import annotations
 
 import argparse
 import json
@@ -7,15 +9,24 @@ import os
 import re
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
+from urllib.parse import urlsplit
 
 # Permite ejecutar módulos importando utilidades locales
 if __package__ is None:  # pragma: no cover
     sys.path.append(os.path.dirname(__file__))
 
 from utils import log
-from inspect_cli import inspect_package
-from import_cli import import_package, DbScriptSpec
+from profiling import run_main
+
+# Cada subcomando importa solo su flujo (ver scripts/bench_startup.py)
+if TYPE_CHECKING:  # pragma: no cover
+    from checkpoint import Checkpoint
+    from deploy_queue import DeploymentQueue
+    from engine import AppianEngine
+    from ledger import ScriptLedger
+    from release import ReleaseApp, ReleaseSpec
+    from upload import DbScriptSpec, PreparedUpload
 
 
 DB_SCRIPT_EXTS = {".sql", ".ddl"}
@@ -43,7 +54,341 @@ def _collect_db_scripts(directory: Path) -> List[DbScriptSpec]:
     return scripts
 
 
-def main():
+def _add_import_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--base-url", required=True)
+    parser.add_argument("--api-key", required=True)
+    parser.add_argument("--package-path", required=True)
+    parser.add_argument(
+        "--customization-path",
+        default="",
+        help="Ruta a .properties (opcional)",
+    )
+    parser.add_argument(
+        "--icf-path",
+        default="",
+        help="Ruta a ICF (alias de customization file)",
+    )
+    parser.add_argument(
+        "--admin-settings-path",
+        default="",
+        help="Ruta a Admin Console Settings .zip (opcional)",
+    )
+    parser.add_argument("--plugins-zip", default="", help="Ruta a ZIP de plug-ins (opcional)")
+    parser.add_argument(
+        "--data-source",
+        default="",
+        help="Nombre o UUID del data source para ejecutar scripts de base de datos (opcional)",
+    )
+    parser.add_argument(
+        "--db-scripts-dir",
+        default="",
+        help="Directorio con scripts SQL/DDL a ejecutar (opcional)",
+    )
+    parser.add_argument(
+        "--db-ledger-dir",
+        default="",
+        help="Directorio del ledger de scripts aplicados (default APPIAN_DB_LEDGER_DIR)",
+    )
+    parser.add_argument(
+        "--env-name",
+        default=os.environ.get("APPIAN_TARGET_ENV") or os.environ.get("APPIAN_ENV", ""),
+        help="Entorno destino, clave del ledger de scripts (default APPIAN_TARGET_ENV)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default="",
+        help="export-manifest.json con checksums; verifica los archivos antes de subirlos",
+    )
+    parser.add_argument(
+        "--allow-unlisted",
+        action="store_true",
+        default=os.environ.get("APPIAN_MANIFEST_ALLOW_UNLISTED", "") == "1",
+        help="Acepta paquete/plug-ins/scripts ausentes del manifest "
+        "(default APPIAN_MANIFEST_ALLOW_UNLISTED=1)",
+    )
+    parser.add_argument(
+        "--verify-cache",
+        default="",
+        help="Cache de archivos ya verificados (default APPIAN_VERIFY_CACHE o $RUNNER_TEMP)",
+    )
+    parser.add_argument("--name", default="", help="Nombre del deployment (opcional)")
+    parser.add_argument(
+        "--description",
+        default="",
+        help="Descripción del deployment (opcional)",
+    )
+    parser.add_argument("--json-output", default="", help="Archivo donde guardar status/uuid")
+    parser.add_argument(
+        "--checkpoint-dir",
+        default="",
+        help="Directorio de checkpoints (default APPIAN_CHECKPOINT_DIR o $RUNNER_TEMP)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reengancha el import registrado en el checkpoint en vez de enviar uno nuevo",
+    )
+    parser.add_argument(
+        "--queue-dir",
+        default="",
+        help="Cola compartida de imports por entorno destino (default APPIAN_QUEUE_DIR)",
+    )
+    parser.add_argument(
+        "--queue-lane",
+        default="",
+        help="Prioridad en la cola: hotfix pasa antes que routine (default APPIAN_QUEUE_LANE)",
+    )
+
+
+def _prepare_upload(args: argparse.Namespace) -> PreparedUpload:
+    """Validate and hash every attachment named by the import arguments once."""
+    from artifact_store import ArtifactStore
+    from integrity import load_manifest, verify_cache_from, verify_files
+    from upload import PreparedUpload
+
+    customization_arg = args.icf_path or args.customization_path
+    customization = Path(customization_arg).resolve() if customization_arg else None
+    admin_settings = (
+        Path(args.admin_settings_path).resolve() if args.admin_settings_path else None
+    )
+    plugins = Path(args.plugins_zip).resolve() if args.plugins_zip else None
+    db_scripts_dir = Path(args.db_scripts_dir).resolve() if args.db_scripts_dir else None
+    db_scripts: List[DbScriptSpec] = []
+    if db_scripts_dir:
+        if not db_scripts_dir.exists():
+            raise FileNotFoundError(f"No existe el directorio de scripts: {db_scripts_dir}")
+        db_scripts = _collect_db_scripts(db_scripts_dir)
+        if not db_scripts:
+            log(f"No se encontraron archivos .sql/.ddl en {db_scripts_dir}")
+        else:
+            names = ", ".join(script[1] for script in db_scripts)
+            log(
+                f"Adjuntando {len(db_scripts)} database scripts desde "
+                f"{db_scripts_dir}: {names}"
+            )
+    digests = None
+    if args.manifest:
+        # Detecta artifacts alterados/truncados en tránsito; los hashes verificados se reutilizan.
+        # Lo que sale del export (paquete, plug-ins, scripts) debe figurar en el manifest;
+        # ICF y admin settings se arman por entorno y pueden no estar
+        exported = [Path(args.package_path), plugins]
+        exported.extend(script[0] for script in db_scripts)
+        paths = [*exported, customization, admin_settings]
+        digests = verify_files(
+            [p for p in paths if p is not None and p.exists()],
+            load_manifest(Path(args.manifest)),
+            verify_cache_from(args.verify_cache),
+            required=[p for p in exported if p is not None],
+            allow_unlisted=getattr(args, "allow_unlisted", False),
+        )
+    upload = PreparedUpload(
+        Path(args.package_path),
+        customization,
+        admin_settings,
+        plugins,
+        db_scripts or None,
+        digests,
+    )
+    store = ArtifactStore.from_env()
+    if store is not None:
+        # Lo que dejó el export en este runner se sube desde el store (por digest)
+        hits = upload.use_store(store)
+        log(f"store=READ root={store.root} hits={hits}/{len(upload.attachments)}")
+    return upload
+
+
+def _apply_ledger(
+    args: argparse.Namespace,
+    upload: PreparedUpload,
+) -> Optional[ScriptLedger]:
+    """Drop scripts already applied to this env/data source (opt-in ledger)."""
+    from ledger import ScriptLedger, ledger_dir_from
+
+    ledger_dir = ledger_dir_from(args.db_ledger_dir)
+    if ledger_dir is None or not upload.db_scripts:
+        return None
+    ledger = ScriptLedger(ledger_dir, args.env_name, args.data_source or None)
+    pending, applied = ledger.partition(upload.db_scripts)
+    if applied:
+        names = ", ".join(att.filename for att, _ in applied)
+        log(f"db.ledger=SKIP {len(applied)} scripts ya aplicados en {ledger.env}: {names}")
+    # orderId quedó fijado al preparar el upload, así que filtrar no altera el orden
+    upload.db_scripts = pending
+    if not pending:
+        log("db.ledger=UP_TO_DATE: no hay scripts nuevos para ejecutar")
+    return ledger
+
+
+def _import_checkpoint(args: argparse.Namespace, upload: PreparedUpload) -> Optional[Checkpoint]:
+    from checkpoint import Checkpoint, checkpoint_dir_from
+
+    directory = checkpoint_dir_from(args.checkpoint_dir)
+    if directory is None:
+        if args.resume:
+            raise RuntimeError("--resume requiere --checkpoint-dir o APPIAN_CHECKPOINT_DIR")
+        return None
+    return Checkpoint(directory, "import", args.base_url, upload.package.filename)
+
+
+def _deployment_queue(args: argparse.Namespace) -> Optional[DeploymentQueue]:
+    from deploy_queue import deployment_queue_from
+
+    # La fila es por tenant: sin --env-name se identifica por el host de la URL
+    env = args.env_name or urlsplit(args.base_url).netloc or args.base_url
+    return deployment_queue_from(args.queue_dir, env.lower(), args.queue_lane)
+
+
+def _log_json_path(args: argparse.Namespace) -> Optional[Path]:
+    # Junto a --json-output: appian-promote-import.json -> appian-promote-import.log.json
+    if not args.json_output:
+        return None
+    out_path = Path(args.json_output)
+    return out_path.with_name(f"{out_path.stem}.log.json")
+
+
+def _run_import(
+    args: argparse.Namespace,
+    upload: PreparedUpload,
+    ledger: Optional[ScriptLedger] = None,
+    checkpoint: Optional[Checkpoint] = None,
+) -> None:
+    from import_cli import import_package
+
+    result = import_package(
+        base_url=args.base_url,
+        api_key=args.api_key,
+        package_path=Path(args.package_path),
+        data_source=args.data_source or None,
+        name=args.name or None,
+        description=args.description,
+        upload=upload,
+        checkpoint=checkpoint,
+        resume=args.resume,
+        queue=_deployment_queue(args),
+        log_json=_log_json_path(args),
+    )
+    result = result or {}
+    if ledger is not None and result.get("status") == "COMPLETED":
+        ledger.record(upload.db_scripts, str(result.get("uuid", "")))
+    if args.json_output:
+        out_path = Path(args.json_output)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(
+            {
+                "status": result.get("status", ""),
+                "uuid": result.get("uuid", ""),
+            }
+        )
+        out_path.write_text(payload, encoding="utf-8")
+    log(
+        "Import finalizado: "
+        f"status={result.get('status', '')} "
+        f"uuid={result.get('uuid', '')}"
+    )
+
+
+def _app_args(args: argparse.Namespace, spec: ReleaseSpec, app: ReleaseApp) -> argparse.Namespace:
+    """Arguments of ``promote`` for one app of the release."""
+    from release import APP_FIELDS
+
+    app_args = argparse.Namespace(**vars(args))
+    for field, attr in APP_FIELDS.items():
+        setattr(app_args, attr, str(app.paths[field]) if field in app.paths else "")
+    app_args.customization_path = ""
+    app_args.data_source = app.data_source
+    app_args.name = app.deployment_name or f"{spec.name} {app.name}"
+    app_args.description = app.description
+    app_args.json_output = ""
+    if args.json_output:
+        # Reporte del deployment log por app: release.json -> release.<app>.log.json
+        out_path = Path(args.json_output)
+        app_args.json_output = str(out_path.with_name(f"{out_path.stem}.{app.name}.json"))
+    return app_args
+
+
+async def _promote_app(
+    args: argparse.Namespace,
+    engine: AppianEngine,
+    spec: ReleaseSpec,
+    app: ReleaseApp,
+    previous: Optional[dict],
+) -> dict:
+    """Same flow as ``promote`` for one app, on the release's event loop."""
+    import asyncio
+
+    from import_cli import import_package_async
+    from inspect_cli import inspect_package_async
+
+    app_args = _app_args(args, spec, app)
+    upload = await asyncio.to_thread(_prepare_upload, app_args)
+    try:
+        sha256 = upload.package.sha256
+        if previous and previous.get("sha256") == sha256:
+            log(
+                f"release.app=SKIP name={app.name} uuid={previous.get('uuid') or '-'}: "
+                "ya importada con este paquete en la corrida anterior (--resume)"
+            )
+            return {"status": "SKIPPED", "uuid": previous.get("uuid") or "", "sha256": sha256}
+        ledger = _apply_ledger(app_args, upload)
+        checkpoint = _import_checkpoint(app_args, upload)
+        if args.skip_inspection or app.skip_inspection:
+            log(f"Inspección omitida para {app.name}")
+        elif args.resume and checkpoint is not None and checkpoint.load() is not None:
+            log(f"Inspección omitida para {app.name}: se reanuda un import ya enviado (--resume)")
+        else:
+            await inspect_package_async(engine, upload)
+        result = await import_package_async(
+            engine,
+            upload,
+            app_args.name,
+            app_args.description,
+            app_args.data_source or None,
+            checkpoint,
+            args.resume,
+            _deployment_queue(app_args),
+            _log_json_path(app_args),
+        )
+        if ledger is not None and result.get("status") == "COMPLETED":
+            ledger.record(upload.db_scripts, str(result.get("uuid", "")))
+        return {"status": result.get("status"), "uuid": result.get("uuid"), "sha256": sha256}
+    finally:
+        upload.release_store()
+
+
+def _run_release(args: argparse.Namespace) -> None:
+    from async_http import run_sync
+    from checkpoint import Checkpoint, checkpoint_dir_from
+    from engine import AppianEngine
+    from release import OK_STATUSES, ReleaseScheduler, load_spec
+
+    spec = load_spec(Path(args.spec))
+    directory = checkpoint_dir_from(args.checkpoint_dir)
+    if directory is None and args.resume:
+        raise RuntimeError("--resume requiere --checkpoint-dir o APPIAN_CHECKPOINT_DIR")
+    state = Checkpoint(directory, "release", args.base_url, spec.name) if directory else None
+    engine = AppianEngine(args.base_url, args.api_key)
+
+    async def _promote(app: ReleaseApp, previous: Optional[dict]) -> dict:
+        return await _promote_app(args, engine, spec, app, previous)
+
+    scheduler = ReleaseScheduler(spec, _promote, args.max_parallel, state, args.resume)
+    results = run_sync(scheduler.run())
+    incomplete = [name for name, r in results.items() if r["status"] not in OK_STATUSES]
+    if args.json_output:
+        out_path = Path(args.json_output)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "release": spec.name,
+            "status": "FAILED" if incomplete else "COMPLETED",
+            "apps": list(results.values()),
+        }
+        out_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    if incomplete:
+        detail = ", ".join(f"{name}={results[name]['status']}" for name in incomplete)
+        raise RuntimeError(f"Release {spec.name} incompleto: {detail}")
+
+
+def _build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser()
     sub = p.add_subparsers(dest="cmd", required=True)
 
@@ -64,38 +409,110 @@ def main():
     )
 
     pimp = sub.add_parser("import", help="Importa/promueve un paquete (sin inspección)")
-    pimp.add_argument("--base-url", required=True)
-    pimp.add_argument("--api-key", required=True)
-    pimp.add_argument("--package-path", required=True)
-    pimp.add_argument(
-        "--customization-path",
-        default="",
-        help="Ruta a .properties (opcional)",
+    _add_import_arguments(pimp)
+
+    ppro = sub.add_parser(
+        "promote",
+        help="Inspecciona e importa en un solo proceso, reutilizando el upload preparado",
     )
-    pimp.add_argument("--icf-path", default="", help="Ruta a ICF (alias de customization file)")
-    pimp.add_argument(
-        "--admin-settings-path",
-        default="",
-        help="Ruta a Admin Console Settings .zip (opcional)",
+    _add_import_arguments(ppro)
+    ppro.add_argument(
+        "--skip-inspection",
+        action="store_true",
+        help="Omite la inspección previa al import",
     )
-    pimp.add_argument("--plugins-zip", default="", help="Ruta a ZIP de plug-ins (opcional)")
-    pimp.add_argument(
-        "--data-source",
-        default="",
-        help="Nombre o UUID del data source para ejecutar scripts de base de datos (opcional)",
+
+    pwat = sub.add_parser(
+        "watch",
+        help="Sigue varios deployments/inspecciones (env:uuid) y emite transiciones JSON",
     )
-    pimp.add_argument(
-        "--db-scripts-dir",
+    pwat.add_argument(
+        "targets",
+        nargs="+",
+        help="ENV:UUID o ENV:KIND:UUID (kind: deployment|inspection)",
+    )
+    pwat.add_argument(
+        "--base-urls-file",
         default="",
-        help="Directorio con scripts SQL/DDL a ejecutar (opcional)",
+        help="Archivo ENV=URL (por defecto .github/actions/_config/appian_base_urls.env)",
+    )
+    pwat.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="Segundos entre polls por target (default APPIAN_PROMOTE_POLL_INTERVAL)",
+    )
+    pwat.add_argument(
+        "--max-wait",
+        type=float,
+        default=None,
+        help="Segundos máximos por target (default APPIAN_PROMOTE_MAX_WAIT)",
     )
-    pimp.add_argument("--name", default="", help="Nombre del deployment (opcional)")
-    pimp.add_argument("--description", default="", help="Descripción del deployment (opcional)")
-    pimp.add_argument("--json-output", default="", help="Archivo donde guardar status/uuid")
 
-    args = p.parse_args()
+    prel = sub.add_parser(
+        "release",
+        help="Promueve las apps de un release spec en orden de dependencias (ramas en paralelo)",
+    )
+    prel.add_argument("--base-url", required=True)
+    prel.add_argument("--api-key", required=True)
+    prel.add_argument("--spec", required=True, help="Release spec JSON (o YAML): apps y dependsOn")
+    prel.add_argument(
+        "--max-parallel",
+        type=int,
+        default=int(os.environ.get("APPIAN_RELEASE_MAX_PARALLEL", "4")),
+        help="Apps promovidas a la vez (default APPIAN_RELEASE_MAX_PARALLEL o 4)",
+    )
+    prel.add_argument(
+        "--skip-inspection",
+        action="store_true",
+        help="Omite la inspección de todas las apps",
+    )
+    for flag, help_text in (
+        ("--db-ledger-dir", "Directorio del ledger de scripts (default APPIAN_DB_LEDGER_DIR)"),
+        ("--verify-cache", "Cache de archivos ya verificados (default APPIAN_VERIFY_CACHE)"),
+        ("--json-output", "Resultado por app; los reportes del log van junto a este archivo"),
+        ("--checkpoint-dir", "Checkpoints del release y de cada import (--resume)"),
+        ("--queue-dir", "Cola de imports por entorno destino (default APPIAN_QUEUE_DIR)"),
+        ("--queue-lane", "Prioridad en la cola: hotfix|routine (default APPIAN_QUEUE_LANE)"),
+    ):
+        prel.add_argument(flag, default="", help=help_text)
+    prel.add_argument(
+        "--env-name",
+        default=os.environ.get("APPIAN_TARGET_ENV") or os.environ.get("APPIAN_ENV", ""),
+        help="Entorno destino, clave del ledger y de la cola (default APPIAN_TARGET_ENV)",
+    )
+    prel.add_argument(
+        "--resume",
+        action="store_true",
+        help="Salta las apps ya importadas con el mismo paquete y reengancha imports enviados",
+    )
 
+    pser = sub.add_parser(
+        "serve",
+        help="Servicio local de larga vida: corre export/inspect/import sin relanzar procesos",
+    )
+    where = pser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", default="", help="Unix socket donde escuchar (modo 0600)")
+    where.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Puerto TCP en 127.0.0.1 (0: libre); requiere APPIAN_SERVICE_TOKEN",
+    )
+    pser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("APPIAN_SERVICE_WORKERS", "4")),
+        help="Jobs a la vez (default APPIAN_SERVICE_WORKERS o 4)",
+    )
+    return p
+
+
+def run_command(args: argparse.Namespace) -> None:
+    """Run an ``inspect``/``import``/``promote``/``release`` command (also for ``serve``)."""
     if args.cmd == "inspect":
+        from inspect_cli import inspect_package
+
         customization_arg = args.icf_path or args.customization_path
         customization = Path(customization_arg).resolve() if customization_arg else None
         admin_settings = (
@@ -109,57 +526,84 @@ def main():
             admin_settings,
         )
     elif args.cmd == "import":
-        customization_arg = args.icf_path or args.customization_path
-        customization = Path(customization_arg).resolve() if customization_arg else None
-        admin_settings = (
-            Path(args.admin_settings_path).resolve() if args.admin_settings_path else None
-        )
-        plugins = Path(args.plugins_zip).resolve() if args.plugins_zip else None
-        name = args.name or ""
-        data_source = args.data_source or ""
-        db_scripts_dir = Path(args.db_scripts_dir).resolve() if args.db_scripts_dir else None
-        db_scripts: List[DbScriptSpec] = []
-        if db_scripts_dir:
-            if not db_scripts_dir.exists():
-                raise FileNotFoundError(f"No existe el directorio de scripts: {db_scripts_dir}")
-            db_scripts = _collect_db_scripts(db_scripts_dir)
-            if not db_scripts:
-                log(f"No se encontraron archivos .sql/.ddl en {db_scripts_dir}")
+        upload = _prepare_upload(args)
+        try:
+            ledger = _apply_ledger(args, upload)
+            _run_import(args, upload, ledger, _import_checkpoint(args, upload))
+        finally:
+            upload.release_store()
+    elif args.cmd == "release":
+        _run_release(args)
+    elif args.cmd == "promote":
+        from deadline import phase_reserve
+        from inspect_cli import inspect_package
+
+        upload = _prepare_upload(args)
+        try:
+            # Validar el ledger antes de inspeccionar: un script aplicado y editado falla rápido
+            ledger = _apply_ledger(args, upload)
+            checkpoint = _import_checkpoint(args, upload)
+            if args.skip_inspection:
+                log("Inspección omitida (--skip-inspection)")
+            elif args.resume and checkpoint is not None and checkpoint.load() is not None:
+                # El import ya se envió en la corrida anterior: la inspección había pasado
+                log("Inspección omitida: se reanuda un import ya enviado (--resume)")
             else:
-                names = ", ".join(script[1] for script in db_scripts)
-                log(
-                    f"Adjuntando {len(db_scripts)} database scripts desde "
-                    f"{db_scripts_dir}: {names}"
+                # Con APPIAN_DEADLINE la inspección deja tiempo para subir y esperar el import
+                inspect_package(
+                    args.base_url,
+                    args.api_key,
+                    Path(args.package_path),
+                    upload=upload,
+                    reserve_s=phase_reserve(sum(att.size for att in upload.attachments)),
+                )
+            _run_import(args, upload, ledger, checkpoint)
+        finally:
+            upload.release_store()
+
+
+def main():
+    p = _build_parser()
+    args = p.parse_args()
+
+    if args.cmd == "watch":
+        from async_http import run_sync
+        from watch import parse_target, watch_async
+
+        try:
+            targets = [parse_target(spec) for spec in args.targets]
+        except ValueError as e:
+            p.error(str(e))
+        base_urls_file = Path(args.base_urls_file).resolve() if args.base_urls_file else None
+        sys.exit(
+            run_sync(
+                watch_async(
+                    targets,
+                    base_urls_file,
+                    interval_s=args.interval,
+                    max_wait_s=args.max_wait,
                 )
-        result = import_package(
-            base_url=args.base_url,
-            api_key=args.api_key,
-            package_path=Path(args.package_path),
-            customization_path=customization,
-            admin_settings_path=admin_settings,
-            plugins_zip=plugins,
-            data_source=data_source or None,
-            db_scripts=db_scripts or None,
-            name=name or None,
-            description=args.description,
-        )
-        result = result or {}
-        if args.json_output:
-            out_path = Path(args.json_output)
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-            payload = json.dumps(
-                {
-                    "status": result.get("status", ""),
-                    "uuid": result.get("uuid", ""),
-                }
             )
-            out_path.write_text(payload, encoding="utf-8")
-        log(
-            "Import finalizado: "
-            f"status={result.get('status', '')} "
-            f"uuid={result.get('uuid', '')}"
         )
+    elif args.cmd == "serve":
+        from service import serve
+
+        serve(
+            {"promote": run_command},
+            Path(args.socket).resolve() if args.socket else None,
+            args.port or 0,
+            args.workers,
+        )
+        return
+    if os.environ.get("APPIAN_SERVICE"):
+        from service import submit
+
+        # Mismos argumentos y salidas; el servicio corre el job con conexiones ya abiertas
+        code = submit("promote", args)
+        if code is not None:
+            sys.exit(code)
+    run_command(args)
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "promote")
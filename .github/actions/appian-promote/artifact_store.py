@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Content-addressed artifact store shared by jobs on the same runner.
+
+Objects live under ``<root>/objects/<aa>/<sha256>`` and are read-only, so
+identical files (e.g. the same plug-ins ZIP exported for several apps) are
+stored once. By default objects and workspace files never share an inode: the
+bytes are reflinked (copy-on-write on btrfs/xfs) or copied, so editing a
+workspace file in place cannot alter the store. With
+``APPIAN_ARTIFACT_STORE_LINK=hardlink`` they are hardlinked instead (no copy
+on ext4), which leaves the linked workspace files read-only too.
+
+``index.json`` tracks size and last use for LRU eviction beyond the size cap.
+Index mutations and renames into ``objects/`` happen under an exclusive
+``flock`` on ``<root>/.lock``; copies are made in ``tmp/`` outside it, so one
+job's multi-GB copy does not hold up the others. Readers ``pin`` an object (a
+hardlink under ``pins/``) so eviction cannot pull it from under them.
+"""
+
+import contextlib
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+from utils import log
+
+CHUNK_SIZE = 1024 * 1024
+# ioctl FICLONE (Linux): copia copy-on-write en btrfs/xfs
+_FICLONE = 0x40049409
+# Pins de procesos que murieron sin soltarlos
+_PIN_STALE_S = 24 * 3600
+
+
+class StoredObject(NamedTuple):
+    sha256: str
+    size: int
+    path: Path
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(src: Path, dest: Path) -> None:
+    if fcntl is None:
+        raise OSError(errno.ENOTSUP, "reflink no soportado")
+    with src.open("rb") as fin, dest.open("wb") as fout:
+        fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+
+
+def _clone(src: Path, dest: Path) -> None:
+    """Write ``src`` to a new inode at ``dest``: reflink when possible, else a copy."""
+    dest.unlink(missing_ok=True)
+    try:
+        _reflink(src, dest)
+    except OSError:
+        dest.unlink(missing_ok=True)
+        shutil.copyfile(src, dest)
+
+
+def _link_or_clone(src: Path, dest: Path, hardlink: bool) -> None:
+    if hardlink:
+        try:
+            dest.unlink(missing_ok=True)
+            os.link(src, dest)
+            return
+        except OSError:
+            # Otro filesystem (EXDEV) o sin hardlinks: se copia
+            pass
+    _clone(src, dest)
+
+
+class ArtifactStore:
+    """SHA-256 keyed object store with LRU eviction."""
+
+    def __init__(self, root: Path, max_bytes: int, hardlink: bool = False) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hardlink = hardlink
+        self.objects_dir = root / "objects"
+        self.tmp_dir = root / "tmp"
+        self.pins_dir = root / "pins"
+        self._index_path = root / "index.json"
+        self._lock_path = root / ".lock"
+        for directory in (self.objects_dir, self.tmp_dir, self.pins_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["ArtifactStore"]:
+        """Store at ``APPIAN_ARTIFACT_STORE`` (opt-in), capped by ``_MAX_MB`` (default 5120).
+
+        ``APPIAN_ARTIFACT_STORE_LINK``: ``copy`` (default; reflink when possible)
+        or ``hardlink``.
+        """
+        root = os.environ.get("APPIAN_ARTIFACT_STORE", "")
+        if not root:
+            return None
+        max_mb = int(os.environ.get("APPIAN_ARTIFACT_STORE_MAX_MB", "5120"))
+        mode = os.environ.get("APPIAN_ARTIFACT_STORE_LINK", "copy").strip().lower() or "copy"
+        if mode not in ("copy", "hardlink"):
+            raise RuntimeError(
+                f"APPIAN_ARTIFACT_STORE_LINK inválido: {mode} (use copy o hardlink)"
+            )
+        return cls(Path(root).resolve(), max_mb * 1024 * 1024, hardlink=mode == "hardlink")
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256
+
+    @staticmethod
+    def _scratch_name(sha256: str) -> str:
+        # La hora va en el nombre: un pin comparte el mtime (viejo) del objeto
+        return f"{sha256}.{os.getpid()}.{int(time.time())}.{uuid.uuid4().hex[:8]}"
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock_path.open("a+") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            data = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save_index(self, index: Dict[str, dict]) -> None:
+        fd, tmp = tempfile.mkstemp(prefix=".index-", dir=str(self.root))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(index, fh)
+            os.replace(tmp, self._index_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _touch(self, index: Dict[str, dict], sha256: str, size: int) -> None:
+        index[sha256] = {"size": size, "last_used": time.time()}
+
+    def get(self, sha256: str) -> Optional[StoredObject]:
+        """Return the object for ``sha256`` (marking it as recently used), if present.
+
+        The path may be evicted by another job right after; use ``pin`` to read it.
+        """
+        obj = self.object_path(sha256)
+        with self._locked():
+            if not obj.exists():
+                return None
+            index = self._load_index()
+            size = obj.stat().st_size
+            self._touch(index, sha256, size)
+            self._save_index(index)
+        return StoredObject(sha256, size, obj)
+
+    def pin(self, sha256: str) -> Optional[Path]:
+        """Hardlink the object under ``pins/`` so eviction cannot remove its bytes.
+
+        Returns the pinned path (read-only, same content), or ``None`` when the
+        object is not in the store; release it with ``unpin``.
+        """
+        obj = self.object_path(sha256)
+        pinned = self.pins_dir / self._scratch_name(sha256)
+        with self._locked():
+            if not obj.exists():
+                return None
+            os.link(obj, pinned)
+            index = self._load_index()
+            self._touch(index, sha256, obj.stat().st_size)
+            self._save_index(index)
+        return pinned
+
+    def unpin(self, pinned: Path) -> None:
+        pinned.unlink(missing_ok=True)
+
+    def put(self, path: Path, sha256: Optional[str] = None) -> StoredObject:
+        """Add ``path`` to the store (copy, or hardlink in ``hardlink`` mode).
+
+        ``sha256`` should come from whoever produced the file (download stream,
+        prepared upload) so it is not read again. Content already stored only
+        counts as a use of the existing object. The copy goes to ``tmp/``
+        before taking the lock, which then only covers the rename and the index.
+        """
+        sha256 = sha256 or file_sha256(path)
+        obj = self.object_path(sha256)
+        if obj.exists():
+            stored = self.get(sha256)
+            if stored is not None:
+                return stored
+        tmp = self.tmp_dir / self._scratch_name(sha256)
+        try:
+            _link_or_clone(path, tmp, self.hardlink)
+            with self._locked():
+                index = self._load_index()
+                if not obj.exists():
+                    obj.parent.mkdir(parents=True, exist_ok=True)
+                    # Objetos inmutables: nadie debe editar un archivo compartido in-place
+                    tmp.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                    os.replace(tmp, obj)
+                size = obj.stat().st_size
+                self._touch(index, sha256, size)
+                evicted = self._evict(index, keep={sha256})
+                self._save_index(index)
+        finally:
+            tmp.unlink(missing_ok=True)
+        if evicted:
+            log(f"store.evicted={len(evicted)} root={self.root}")
+        return StoredObject(sha256, size, obj)
+
+    def materialize(self, sha256: str, dest: Path) -> Path:
+        """Place the object ``sha256`` at ``dest``.
+
+        A writable copy (reflink or copy) by default; in ``hardlink`` mode a
+        read-only hardlink. The object stays pinned while it is copied.
+        """
+        pinned = self.pin(sha256)
+        if pinned is None:
+            raise FileNotFoundError(f"Objeto {sha256} no existe en el store {self.root}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.store")
+        try:
+            _link_or_clone(pinned, tmp, self.hardlink)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self.unpin(pinned)
+        return dest
+
+    def _evict(self, index: Dict[str, dict], keep: set) -> List[str]:
+        """Drop least recently used objects until the store fits ``max_bytes``."""
+        stale = time.time() - _PIN_STALE_S
+        for leftover in [*self.pins_dir.iterdir(), *self.tmp_dir.iterdir()]:
+            parts = leftover.name.split(".")
+            if len(parts) == 4 and parts[2].isdigit() and int(parts[2]) < stale:
+                leftover.unlink(missing_ok=True)
+        for sha in [s for s in index if not self.object_path(s).exists()]:
+            index.pop(sha, None)
+        total = sum(int(meta.get("size") or 0) for meta in index.values())
+        evicted: List[str] = []
+        for sha, meta in sorted(index.items(), key=lambda kv: kv[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if sha in keep:
+                continue
+            self.object_path(sha).unlink(missing_ok=True)
+            total -= int(meta.get("size") or 0)
+            evicted.append(sha)
+        for sha in evicted:
+            index.pop(sha, None)
+        return evicted
@@ -0,0 +1,799 @@
+#!/usr/bin/env python3
+"""Minimal HTTP/1.1 client over asyncio streams (stdlib only).
+
+Supports keep-alive pooling per origin, streamed request bodies (bytes or any
+re-iterable with ``__len__`` such as ``upload.MultipartBody``), chunked and
+length-delimited responses, response streaming into a sink, redirects, and
+HTTP(S) proxies from the usual ``*_proxy`` variables. Timeouts apply to each
+I/O step (connect, write, read), matching the socket timeouts ``urlopen`` used;
+``total_timeout`` also bounds the whole exchange (uploads), and a streamed
+download with ``Content-Length`` is bounded by its size (see ``deadline``).
+Upload and download throughput are measured separately to size those bounds.
+Every exchange is cut at the operation deadline and paced by the per-host
+token bucket (see ``ratelimit``).
+"""
+
+import asyncio
+import atexit
+import base64
+import os
+import socket
+import ssl
+import threading
+import time
+import weakref
+from contextlib import suppress
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit, urlunsplit
+from urllib.request import getproxies, proxy_bypass
+
+from cassette import Cassette, cassette_from_env
+from circuit import CircuitBreaker, circuit_for
+from deadline import (
+    DOWNLOAD_THROUGHPUT,
+    MIN_SAMPLE_BYTES,
+    UPLOAD_THROUGHPUT,
+    download_timeout,
+    operation_deadline,
+)
+from errors import AppianError, AppianHTTPError, AppianNetworkError
+from metrics import observe_ratelimit_wait, observe_request
+from ratelimit import bucket_for, note_wait
+
+T = TypeVar("T")
+
+Body = Union[bytes, Iterable[bytes], None]
+Sink = Callable[[bytes], None]
+
+USER_AGENT = "appian-cicd-core"
+READ_CHUNK = 256 * 1024
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+# Conexiones ociosas que conservamos por origen
+MAX_IDLE_PER_ORIGIN = 4
+
+_NETWORK_ERRORS = (
+    OSError,
+    EOFError,
+    asyncio.IncompleteReadError,
+    asyncio.TimeoutError,
+    ssl.SSLError,
+)
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    url: str
+
+
+class _ProtocolError(EOFError):
+    """The peer sent something that is not HTTP/1.x or closed mid-message."""
+
+
+class _Connection:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        absolute_form: bool,
+        proxy_auth: Optional[str],
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        # Requests vía proxy HTTP sin túnel usan la URL absoluta en la request line
+        self.absolute_form = absolute_form
+        self.proxy_auth = proxy_auth
+        # True en cuanto el request actual entregó bytes al transporte
+        self.written = False
+
+    @property
+    def usable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self) -> None:
+        with suppress(Exception):
+            self.writer.close()
+
+
+def _ssl_context() -> ssl.SSLContext:
+    return ssl.create_default_context()
+
+
+def _proxy_for(parts: SplitResult) -> Optional[SplitResult]:
+    proxy = getproxies().get(parts.scheme)
+    if not proxy or proxy_bypass(parts.hostname or ""):
+        return None
+    return urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+def _proxy_auth(proxy: SplitResult) -> Optional[str]:
+    if not proxy.username:
+        return None
+    creds = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return "Basic " + base64.b64encode(creds.encode("utf-8")).decode("ascii")
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, (asyncio.TimeoutError, socket.timeout, TimeoutError))
+
+
+def _reason(exc: BaseException) -> str:
+    if _is_timeout(exc):
+        return "timed out"
+    return str(exc) or type(exc).__name__
+
+
+async def _within(aw: Awaitable[T], seconds: float, url: str) -> T:
+    """Await ``aw`` for at most ``seconds`` in total (``AppianNetworkError`` after that)."""
+    try:
+        return await asyncio.wait_for(aw, seconds)
+    except asyncio.TimeoutError as exc:
+        # Los timeouts por paso ya llegan como AppianNetworkError: este es el total
+        raise AppianNetworkError(
+            url, f"sin respuesta completa en {seconds:.0f}s", timeout=True
+        ) from exc
+
+
+def _send_buffer(writer: asyncio.StreamWriter) -> int:
+    sock = writer.get_extra_info("socket")
+    try:
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) if sock else 0
+    except OSError:
+        return 0
+
+
+def _body_length(body: Body) -> Optional[int]:
+    if body is None:
+        return None
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if hasattr(body, "__len__"):
+        return len(body)  # type: ignore[arg-type]
+    return None
+
+
+class HttpClient:
+    """Pooled HTTP/1.1 client bound to one event loop.
+
+    ``max_concurrency`` bounds in-flight requests across all origins
+    (``APPIAN_MAX_CONCURRENCY``, default 8). ``cassette`` (default: from
+    ``APPIAN_HTTP_MODE``) records or replays every exchange, see ``cassette``.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        limit = max_concurrency or int(os.environ.get("APPIAN_MAX_CONCURRENCY", "8"))
+        self._limit = asyncio.Semaphore(max(1, limit))
+        self._idle: Dict[Tuple[str, str, int], List[_Connection]] = {}
+        self._ssl: Optional[ssl.SSLContext] = None
+        self._cassette = cassette if cassette is not None else cassette_from_env()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        body: Body = None,
+        timeout: float = 60,
+        sink: Optional[Sink] = None,
+        max_redirects: int = 5,
+        total_timeout: Optional[float] = None,
+    ) -> HttpResponse:
+        """Send a request; raise ``AppianHTTPError`` for >= 400 answers.
+
+        With ``sink`` the body of a 2xx answer is handed over chunk by chunk
+        instead of being buffered (``HttpResponse.body`` is then empty).
+        ``timeout`` bounds each I/O step, ``total_timeout`` the whole exchange.
+        """
+        hdrs = dict(headers or {})
+        for _ in range(max_redirects + 1):
+            resp = await self._request_once(
+                method, url, hdrs, body, timeout, sink, total_timeout
+            )
+            location = resp.headers.get("location")
+            if resp.status not in REDIRECT_STATUSES or not location:
+                return resp
+            if resp.status == 303:
+                method, body = "GET", None
+            elif method not in ("GET", "HEAD"):
+                return resp
+            target = urljoin(url, location)
+            if urlsplit(target)[:2] != urlsplit(url)[:2]:
+                # Nunca reenviar la API key a otro origen (p. ej. URLs firmadas de storage)
+                hdrs = {k: v for k, v in hdrs.items() if k.lower() != "appian-api-key"}
+            url = target
+        raise AppianNetworkError(url, f"demasiados redirects (>{max_redirects})")
+
+    async def _request_once(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+        sink: Optional[Sink],
+        total_timeout: Optional[float] = None,
+    ) -> HttpResponse:
+        breaker = circuit_for(url)
+        probe = breaker.before_call()
+        try:
+            return await self._breaker_call(
+                breaker, method, url, headers, body, timeout, sink, total_timeout
+            )
+        finally:
+            if probe:
+                # Un probe cancelado (deadline, gather) o con un error ajeno a Appian no
+                # registró resultado: sin esto el circuito quedaría abierto para siempre
+                breaker.end_probe()
+
+    async def _breaker_call(
+        self,
+        breaker: CircuitBreaker,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+        sink: Optional[Sink],
+        total_timeout: Optional[float],
+    ) -> HttpResponse:
+        sent = _body_length(body) or 0
+        received = 0
+
+        def counting(chunk: bytes) -> None:
+            nonlocal received
+            received += len(chunk)
+            sink(chunk)  # type: ignore[misc]
+
+        deadline = operation_deadline()
+        what = f"{method} {urlsplit(url).path}"
+        bucket = bucket_for(url)
+        if bucket is not None:
+            # Fuera del semáforo: esperar un token no debe ocupar un slot de conexión
+            wait_s = bucket.reserve()
+            note_wait(bucket, wait_s, what)
+            observe_ratelimit_wait(bucket.host, wait_s)
+            if wait_s > 0:
+                await deadline.run(asyncio.sleep(wait_s), what)
+        async with self._limit:
+            # Ningún paso de I/O puede esperar más que lo que queda del deadline
+            timeout = deadline.clamp(timeout, what)
+            started = time.monotonic()
+            exchange = self._dispatch(
+                method, url, headers, body, timeout, counting if sink is not None else None
+            )
+            if total_timeout is not None:
+                exchange = _within(exchange, total_timeout, url)
+            try:
+                resp = await deadline.run(exchange, what)
+            except AppianError as exc:
+                observe_request(method, url, exc.cause, time.monotonic() - started, sent, received)
+                breaker.record(exc)
+                raise
+            received += len(resp.body)
+            elapsed = time.monotonic() - started
+            observe_request(method, url, str(resp.status), elapsed, sent, received)
+        if resp.status >= 400:
+            err = AppianHTTPError(url, resp.status, resp.body.decode("utf-8", "ignore"))
+            breaker.record(err)
+            raise err
+        breaker.record_success()
+        return resp
+
+    async def _dispatch(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+        sink: Optional[Sink],
+    ) -> HttpResponse:
+        cassette = self._cassette
+        if cassette is None:
+            return await self._exchange(method, url, headers, body, timeout, sink)
+        if cassette.replaying:
+            return await self._replay(cassette, method, url, headers, sink)
+        return await self._record(cassette, method, url, headers, body, timeout, sink)
+
+    async def _record(
+        self,
+        cassette: Cassette,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+        sink: Optional[Sink],
+    ) -> HttpResponse:
+        recorder = cassette.recorder()
+
+        def tee(chunk: bytes) -> None:
+            recorder.write(chunk)
+            sink(chunk)  # type: ignore[misc]
+
+        started = time.monotonic()
+        try:
+            resp = await self._exchange(
+                method, url, headers, body, timeout, tee if sink is not None else None
+            )
+        except AppianNetworkError as exc:
+            recorder.discard()
+            error = {"reason": str(exc.reason), "timeout": exc.timeout, "sent": exc.ambiguous}
+            cassette.record(method, url, headers, time.monotonic() - started, error=error)
+            raise
+        except BaseException:
+            recorder.discard()
+            raise
+        elapsed = time.monotonic() - started
+        if resp.body:
+            # Sin sink (o respuesta no 2xx) el cuerpo llegó en memoria, no por tee
+            recorder.write(resp.body)
+        cassette.record(
+            method, url, headers, elapsed, resp.status, resp.headers, recorder.finish()
+        )
+        return resp
+
+    async def _replay(
+        self,
+        cassette: Cassette,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        sink: Optional[Sink],
+    ) -> HttpResponse:
+        entry = cassette.next(method, url, headers)
+        await asyncio.sleep(cassette.delay(entry))
+        error = entry.get("error")
+        if error:
+            raise AppianNetworkError(
+                url,
+                error.get("reason", ""),
+                timeout=bool(error.get("timeout")),
+                sent=bool(error.get("sent", True)),
+            )
+        status = int(entry["status"])
+        streamed = sink is not None and 200 <= status < 300
+        data = bytearray()
+        for chunk in cassette.body_chunks(entry, READ_CHUNK):
+            if streamed:
+                sink(chunk)
+            else:
+                data.extend(chunk)
+        return HttpResponse(status, dict(entry.get("response_headers") or {}), bytes(data), url)
+
+    async def _exchange(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+        sink: Optional[Sink],
+    ) -> HttpResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise AppianNetworkError(url, "URL no soportada", sent=False)
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname.lower(), parts.port or default_port)
+        conn = self._checkout(key)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = await self._connect(url, parts, key, timeout)
+            conn.written = False
+            try:
+                await self._send(conn, method, parts, headers, body, timeout)
+                status, resp_headers, keep_alive = await self._read_head(conn, timeout)
+            except asyncio.CancelledError:
+                conn.close()
+                raise
+            except _NETWORK_ERRORS as exc:
+                conn.close()
+                if (
+                    reused
+                    and not _is_timeout(exc)
+                    and (not conn.written or method in ("GET", "HEAD"))
+                ):
+                    # El servidor cerró una conexión keep-alive ociosa: reintentar con una nueva.
+                    # Un POST ya enviado no: pudo haberse aceptado (lo reconcilia idempotency)
+                    reused, conn = False, None
+                    continue
+                raise AppianNetworkError(
+                    url, _reason(exc), timeout=_is_timeout(exc), sent=conn.written
+                ) from exc
+            except Exception:
+                # Un error del cuerpo iterable o de codificación deja el stream a medias
+                conn.close()
+                raise
+            break
+        streamed = sink is not None and 200 <= status < 300
+        length = resp_headers.get("content-length", "")
+        size = int(length) if length.isdigit() else 0
+        try:
+            started = time.monotonic()
+            reading = self._read_body(
+                conn, method, status, resp_headers, timeout, sink if streamed else None
+            )
+            if streamed and size >= MIN_SAMPLE_BYTES:
+                # Una descarga lenta pero viva no se corta por paso: la acota su tamaño
+                reading = _within(reading, download_timeout(size), url)
+            data, eof_delimited = await reading
+            if size and method != "HEAD" and status not in (204, 304):
+                DOWNLOAD_THROUGHPUT.observe(size, time.monotonic() - started)
+        except asyncio.CancelledError:
+            conn.close()
+            raise
+        except _NETWORK_ERRORS as exc:
+            conn.close()
+            raise AppianNetworkError(url, _reason(exc), timeout=_is_timeout(exc)) from exc
+        except Exception:
+            conn.close()
+            raise
+        if keep_alive and not eof_delimited:
+            self._checkin(key, conn)
+        else:
+            conn.close()
+        return HttpResponse(status, resp_headers, data, url)
+
+    def _checkout(self, key: Tuple[str, str, int]) -> Optional[_Connection]:
+        idle = self._idle.get(key) or []
+        while idle:
+            conn = idle.pop()
+            if conn.usable:
+                return conn
+            conn.close()
+        return None
+
+    def _checkin(self, key: Tuple[str, str, int], conn: _Connection) -> None:
+        idle = self._idle.setdefault(key, [])
+        if len(idle) >= MAX_IDLE_PER_ORIGIN or not conn.usable:
+            conn.close()
+            return
+        idle.append(conn)
+
+    async def _connect(
+        self,
+        url: str,
+        parts: SplitResult,
+        key: Tuple[str, str, int],
+        timeout: float,
+    ) -> _Connection:
+        _, host, port = key
+        tls = parts.scheme == "https"
+        if tls and self._ssl is None:
+            self._ssl = _ssl_context()
+        proxy = _proxy_for(parts)
+        try:
+            if proxy is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(
+                        host,
+                        port,
+                        ssl=self._ssl if tls else None,
+                        server_hostname=host if tls else None,
+                        limit=READ_CHUNK,
+                    ),
+                    timeout,
+                )
+                return _Connection(reader, writer, False, None)
+            auth = _proxy_auth(proxy)
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    proxy.hostname,
+                    proxy.port or 8080,
+                    limit=READ_CHUNK,
+                ),
+                timeout,
+            )
+            if not tls:
+                return _Connection(reader, writer, True, auth)
+            await self._tunnel(reader, writer, host, port, auth, timeout)
+            if not hasattr(writer, "start_tls"):
+                writer.close()
+                raise OSError("túnel HTTPS vía proxy requiere Python 3.11+")
+            await asyncio.wait_for(
+                writer.start_tls(self._ssl, server_hostname=host),  # type: ignore[attr-defined]
+                timeout,
+            )
+            return _Connection(reader, writer, False, None)
+        except asyncio.CancelledError:
+            raise
+        except _NETWORK_ERRORS as exc:
+            # Nada llegó al servidor: el request es seguro de reintentar
+            raise AppianNetworkError(
+                url,
+                _reason(exc),
+                timeout=_is_timeout(exc),
+                sent=False,
+            ) from exc
+
+    async def _tunnel(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        host: str,
+        port: int,
+        auth: Optional[str],
+        timeout: float,
+    ) -> None:
+        lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+        if auth:
+            lines.append(f"Proxy-Authorization: {auth}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await asyncio.wait_for(writer.drain(), timeout)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode("latin-1").split(None, 2)
+        if len(fields) < 2 or not fields[1].startswith("2"):
+            writer.close()
+            raise OSError(f"proxy rechazó CONNECT: {status_line.decode('latin-1').strip()}")
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+    async def _send(
+        self,
+        conn: _Connection,
+        method: str,
+        parts: SplitResult,
+        headers: Dict[str, str],
+        body: Body,
+        timeout: float,
+    ) -> None:
+        if conn.absolute_form:
+            target = urlunsplit((parts.scheme, parts.netloc, parts.path or "/", parts.query, ""))
+        else:
+            target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host = parts.hostname or ""
+        if parts.port:
+            host = f"{host}:{parts.port}"
+        merged = {
+            "Host": host,
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+        }
+        lowered = {k.lower() for k in headers}
+        merged = {k: v for k, v in merged.items() if k.lower() not in lowered}
+        merged.update(headers)
+        if conn.proxy_auth:
+            merged["Proxy-Authorization"] = conn.proxy_auth
+        length = _body_length(body)
+        chunked = body is not None and length is None
+        if body is None and method in ("POST", "PUT", "PATCH"):
+            merged["Content-Length"] = "0"
+        elif length is not None:
+            merged["Content-Length"] = str(length)
+        elif chunked:
+            merged["Transfer-Encoding"] = "chunked"
+        head = f"{method} {target} HTTP/1.1\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in merged.items()) + "\r\n"
+        writer = conn.writer
+        conn.written = True
+        started = time.monotonic()
+        writer.write(head.encode("latin-1"))
+        if isinstance(body, (bytes, bytearray)):
+            writer.write(body)
+        elif body is not None:
+            for chunk in body:
+                if not chunk:
+                    continue
+                if chunked:
+                    writer.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                else:
+                    writer.write(chunk)
+                await asyncio.wait_for(writer.drain(), timeout)
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+        await asyncio.wait_for(writer.drain(), timeout)
+        if length:
+            # Solo el envío (la espera de la respuesta es procesamiento de Appian) y sin lo
+            # que todavía está en el buffer del socket: drain() vuelve antes de que salga
+            in_flight = _send_buffer(writer)
+            UPLOAD_THROUGHPUT.observe(length - in_flight, time.monotonic() - started)
+
+    async def _read_head(
+        self,
+        conn: _Connection,
+        timeout: float,
+    ) -> Tuple[int, Dict[str, str], bool]:
+        reader = conn.reader
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line:
+                raise _ProtocolError("conexión cerrada por el servidor antes de responder")
+            fields = line.decode("latin-1").split(None, 2)
+            if len(fields) < 2 or not fields[0].startswith("HTTP/") or not fields[1].isdigit():
+                raise _ProtocolError(f"respuesta HTTP inválida: {line[:80]!r}")
+            version, status = fields[0], int(fields[1])
+            headers: Dict[str, str] = {}
+            while True:
+                hline = await asyncio.wait_for(reader.readline(), timeout)
+                if hline in (b"\r\n", b"\n"):
+                    break
+                if not hline:
+                    raise _ProtocolError("cabeceras HTTP truncadas")
+                name, _, value = hline.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                value = value.strip()
+                headers[name] = f"{headers[name]}, {value}" if name in headers else value
+            if 100 <= status < 200:
+                # 100 Continue / 103 Early Hints: esperar la respuesta final
+                continue
+            connection = headers.get("connection", "").lower()
+            if version == "HTTP/1.0":
+                keep_alive = "keep-alive" in connection
+            else:
+                keep_alive = "close" not in connection
+            return status, headers, keep_alive
+
+    async def _read_body(
+        self,
+        conn: _Connection,
+        method: str,
+        status: int,
+        headers: Dict[str, str],
+        timeout: float,
+        sink: Optional[Sink],
+    ) -> Tuple[bytes, bool]:
+        """Return (body, eof_delimited); with a sink the body is streamed out."""
+        if method == "HEAD" or status in (204, 304):
+            return b"", False
+        reader = conn.reader
+        buf = bytearray()
+
+        def emit(chunk: bytes) -> None:
+            if sink is not None:
+                sink(chunk)
+            else:
+                buf.extend(chunk)
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await asyncio.wait_for(reader.readline(), timeout)
+                if not size_line:
+                    raise _ProtocolError("cuerpo chunked truncado")
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailers opcionales hasta línea vacía
+                    while True:
+                        trailer = await asyncio.wait_for(reader.readline(), timeout)
+                        if trailer in (b"\r\n", b"\n", b""):
+                            break
+                    return bytes(buf), False
+                remaining = size
+                while remaining:
+                    chunk = await asyncio.wait_for(
+                        reader.readexactly(min(remaining, READ_CHUNK)),
+                        timeout,
+                    )
+                    remaining -= len(chunk)
+                    emit(chunk)
+                await asyncio.wait_for(reader.readline(), timeout)
+        length = headers.get("content-length")
+        if length is not None:
+            remaining = int(length)
+            while remaining:
+                chunk = await asyncio.wait_for(
+                    reader.readexactly(min(remaining, READ_CHUNK)),
+                    timeout,
+                )
+                remaining -= len(chunk)
+                emit(chunk)
+            return bytes(buf), False
+        while True:
+            chunk = await asyncio.wait_for(reader.read(READ_CHUNK), timeout)
+            if not chunk:
+                return bytes(buf), True
+            emit(chunk)
+
+    def idle_connections(self) -> Dict[str, int]:
+        """Pooled idle connections per origin (``scheme://host:port``)."""
+        return {
+            f"{scheme}://{host}:{port}": len(idle)
+            for (scheme, host, port), idle in list(self._idle.items())
+            if idle
+        }
+
+    async def aclose(self) -> None:
+        for idle in self._idle.values():
+            for conn in idle:
+                conn.close()
+        self._idle.clear()
+
+
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HttpClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def default_client() -> HttpClient:
+    """Return the shared client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        client = HttpClient()
+        _CLIENTS[loop] = client
+    return client
+
+
+def warm_connections() -> Dict[str, int]:
+    """Idle pooled connections per origin across the clients of every loop."""
+    totals: Dict[str, int] = {}
+    for client in list(_CLIENTS.values()):
+        for origin, count in client.idle_connections().items():
+            totals[origin] = totals.get(origin, 0) + count
+    return totals
+
+
+async def gather_all(*aws: Coroutine[Any, Any, T]) -> List[T]:
+    """Like ``asyncio.gather`` but cancels the siblings as soon as one fails."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+_LOCAL = threading.local()
+
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_LOCAL, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _LOCAL.loop = loop
+        if threading.current_thread() is threading.main_thread():
+            atexit.register(_close_loop, loop)
+    return loop
+
+
+def _close_loop(loop: asyncio.AbstractEventLoop) -> None:
+    if loop.is_closed():
+        return
+    client = _CLIENTS.get(loop)
+    with suppress(Exception):
+        if client is not None:
+            loop.run_until_complete(client.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run ``coro`` to completion on this thread's persistent event loop.
+
+    The loop (and its connection pool) survives between calls so consecutive
+    sync helpers reuse warm connections. Ctrl-C/SIGTERM cancel the coroutine
+    and let its cleanup run before propagating.
+    """
+    loop = _thread_loop()
+    task = loop.create_task(coro)
+    try:
+        return loop.run_until_complete(task)
+    except BaseException:
+        if not task.done():
+            task.cancel()
+            with suppress(BaseException):
+                loop.run_until_complete(task)
+        raise
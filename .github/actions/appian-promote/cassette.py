@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Record/replay of raw HTTP exchanges for reproducible benchmarks.
+
+``APPIAN_HTTP_MODE=record`` appends every exchange made by ``HttpClient``
+(one request on the wire: no redirect following, errors included) and its
+latency to the JSON-lines cassette at ``APPIAN_HTTP_CASSETTE``; delete the
+file to start a new recording. ``replay`` answers from that file without
+touching the network, sleeping the recorded latency times
+``APPIAN_HTTP_LATENCY_SCALE`` (0 disables sleeps).
+
+API keys, auth headers, cookies and signed query parameters are scrubbed
+before anything is written, including the query of URLs inside JSON response
+bodies (export results carry signed download links). Exchanges are matched by
+method and scrubbed path+query in recording order, so the same cassette
+replays against any base URL and repeated polls return the recorded sequence
+of statuses. Bodies
+above ``INLINE_MAX`` go to content-addressed files in ``<cassette>.blobs``.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+MODES = ("live", "record", "replay")
+CASSETTE_VERSION = 1
+INLINE_MAX = 64 * 1024
+REDACTED = "<REDACTED>"
+
+_SECRET_HEADERS = frozenset(
+    {"appian-api-key", "authorization", "proxy-authorization", "cookie", "set-cookie"}
+)
+_SECRET_PARAM = re.compile(r"(sig|signature|token|key|credential|password|secret)", re.I)
+
+
+def scrub_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    return {k: (REDACTED if k.lower() in _SECRET_HEADERS else v) for k, v in headers.items()}
+
+
+def _scrub_query(query: str) -> List[Tuple[str, str]]:
+    return [
+        (k, REDACTED if _SECRET_PARAM.search(k) else v)
+        for k, v in parse_qsl(query, keep_blank_values=True)
+    ]
+
+
+def scrub_url(url: str) -> str:
+    """``url`` with secret query values scrubbed; unchanged when it has none."""
+    parts = urlsplit(url)
+    if not any(_SECRET_PARAM.search(k) for k, _ in parse_qsl(parts.query)):
+        return url
+    return urlunsplit(parts._replace(query=urlencode(_scrub_query(parts.query))))
+
+
+def _scrub_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _scrub_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub_value(v) for v in value]
+    if isinstance(value, str) and value.startswith(("http://", "https://")) and "?" in value:
+        return scrub_url(value)
+    return value
+
+
+def scrub_json_body(data: bytes) -> bytes:
+    """Scrub URL-valued strings of a JSON body; anything else is returned as is.
+
+    Replay still matches: the download request for a scrubbed URL has the same
+    ``request_key`` as the recorded signed one.
+    """
+    try:
+        original = json.loads(data)
+    except ValueError:
+        return data
+    scrubbed = _scrub_value(original)
+    return data if scrubbed == original else json.dumps(scrubbed).encode("utf-8")
+
+
+def _is_json(headers: Dict[str, str]) -> bool:
+    content_type = next((v for k, v in headers.items() if k.lower() == "content-type"), "")
+    return "json" in content_type.lower()
+
+
+def request_key(method: str, url: str, headers: Optional[Dict[str, str]] = None) -> str:
+    """``METHOD /path?query [action]`` with secret query values scrubbed (host ignored).
+
+    ``Action-Type`` is part of the key: export and import POST the same URL.
+    """
+    parts = urlsplit(url)
+    query = _scrub_query(parts.query)
+    target = parts.path or "/"
+    if query:
+        target += "?" + urlencode(query)
+    action = next((v for k, v in (headers or {}).items() if k.lower() == "action-type"), "")
+    return f"{method.upper()} {target}" + (f" [{action}]" if action else "")
+
+
+class BodyRecorder:
+    """Collect a response body as it streams; spill to a blob past ``INLINE_MAX``."""
+
+    def __init__(self, blobs_dir: Path) -> None:
+        self._blobs_dir = blobs_dir
+        self._buffer = bytearray()
+        self._digest = hashlib.sha256()
+        self._fh = None
+        self._tmp: Optional[str] = None
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if self._fh is None:
+            self._buffer.extend(chunk)
+            if len(self._buffer) <= INLINE_MAX:
+                return
+            self._blobs_dir.mkdir(parents=True, exist_ok=True)
+            fd, self._tmp = tempfile.mkstemp(prefix=".blob-", dir=str(self._blobs_dir))
+            self._fh = os.fdopen(fd, "wb")
+            chunk, self._buffer = bytes(self._buffer), bytearray()
+        self._fh.write(chunk)
+
+    def finish(self) -> dict:
+        """Return the cassette fields describing the body."""
+        if self._fh is None:
+            return {"body_b64": base64.b64encode(bytes(self._buffer)).decode("ascii")}
+        self._fh.close()
+        sha = self._digest.hexdigest()
+        os.replace(self._tmp, self._blobs_dir / sha)
+        return {"body_blob": sha, "body_size": self.size}
+
+    def discard(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            Path(self._tmp).unlink(missing_ok=True)
+
+
+class Cassette:
+    """One cassette file opened for recording or replay."""
+
+    def __init__(self, path: Path, mode: str, latency_scale: float = 1.0) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Modo de cassette inválido: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = max(0.0, latency_scale)
+        self.blobs_dir = path.with_name(path.name + ".blobs")
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[dict]] = {}
+        if mode == "replay":
+            if not path.exists():
+                raise FileNotFoundError(f"No existe el cassette HTTP: {path}")
+            for entry in self._read_entries():
+                self._queues.setdefault(entry["key"], deque()).append(entry)
+        elif not path.exists():
+            # Se agrega al final: export y promote (procesos distintos) graban en el mismo archivo
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({"version": CASSETTE_VERSION}) + "\n", encoding="utf-8")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _read_entries(self) -> List[dict]:
+        entries: List[dict] = []
+        with self.path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "key" in record:
+                    entries.append(record)
+        return entries
+
+    def recorder(self) -> BodyRecorder:
+        return BodyRecorder(self.blobs_dir)
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        elapsed_s: float,
+        status: Optional[int] = None,
+        resp_headers: Optional[Dict[str, str]] = None,
+        body: Optional[dict] = None,
+        error: Optional[dict] = None,
+    ) -> None:
+        entry: dict = {
+            "key": request_key(method, url, headers),
+            "method": method.upper(),
+            "headers": scrub_headers(headers),
+            "elapsed_s": round(elapsed_s, 6),
+        }
+        if error is not None:
+            entry["error"] = error
+        else:
+            entry["status"] = status
+            entry["response_headers"] = scrub_headers(resp_headers or {})
+            entry.update(body or {})
+        with self._lock:
+            if _is_json(resp_headers or {}):
+                self._scrub_body(entry)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+
+    def _scrub_body(self, entry: dict) -> None:
+        """Scrub the JSON body of ``entry`` in place (inline or blob)."""
+        if "body_blob" not in entry:
+            data = base64.b64decode(entry.get("body_b64") or "")
+            entry["body_b64"] = base64.b64encode(scrub_json_body(data)).decode("ascii")
+            return
+        blob = self.blobs_dir / entry["body_blob"]
+        data = blob.read_bytes()
+        scrubbed = scrub_json_body(data)
+        if scrubbed is data:
+            return
+        recorder = self.recorder()
+        recorder.write(scrubbed)
+        entry.update(recorder.finish())
+        # El blob original tiene las URLs firmadas: no debe quedar en disco
+        blob.unlink(missing_ok=True)
+
+    def next(self, method: str, url: str, headers: Dict[str, str]) -> dict:
+        """Pop the next recorded exchange for this request."""
+        key = request_key(method, url, headers)
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise RuntimeError(
+                    f"Cassette {self.path} no tiene (más) respuestas grabadas para '{key}'"
+                )
+            return queue.popleft()
+
+    def body_chunks(self, entry: dict, chunk_size: int) -> Iterator[bytes]:
+        """Yield the recorded body; blobs are read from disk piece by piece."""
+        if "body_blob" not in entry:
+            data = base64.b64decode(entry.get("body_b64") or "")
+            if data:
+                yield data
+            return
+        with (self.blobs_dir / entry["body_blob"]).open("rb") as fh:
+            yield from iter(lambda: fh.read(chunk_size), b"")
+
+    def delay(self, entry: dict) -> float:
+        return float(entry.get("elapsed_s") or 0.0) * self.latency_scale
+
+
+_ACTIVE: Dict[Tuple[str, str], Cassette] = {}
+_ACTIVE_LOCK = threading.Lock()
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """Process-wide cassette from ``APPIAN_HTTP_MODE``/``APPIAN_HTTP_CASSETTE``."""
+    mode = os.environ.get("APPIAN_HTTP_MODE", "live").strip().lower() or "live"
+    if mode not in MODES:
+        raise RuntimeError(f"APPIAN_HTTP_MODE inválido '{mode}': use {'|'.join(MODES)}")
+    if mode == "live":
+        return None
+    raw = os.environ.get("APPIAN_HTTP_CASSETTE", "")
+    if not raw:
+        raise RuntimeError(f"APPIAN_HTTP_MODE={mode} requiere APPIAN_HTTP_CASSETTE")
+    path = str(Path(raw).resolve())
+    with _ACTIVE_LOCK:
+        # Un solo objeto por proceso: varios event loops comparten la misma grabación
+        cassette = _ACTIVE.get((mode, path))
+        if cassette is None:
+            scale = float(os.environ.get("APPIAN_HTTP_LATENCY_SCALE", "1"))
+            cassette = Cassette(Path(path), mode, scale)
+            _ACTIVE[(mode, path)] = cassette
+        return cassette
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Crash-safe checkpoints of submitted export/import deployments.
+
+A checkpoint is written (atomically) just before the POST, carrying the
+idempotency marker, and again right after it with the deployment UUID and
+status URL. If the runner dies, a re-run with ``--resume`` reattaches to that
+deployment (by UUID, or by marker when the POST answer was lost) instead of
+submitting a new one. The checkpoint is removed once the flow finishes or
+the deployment reaches a failed terminal status.
+
+Checkpoints live in ``--checkpoint-dir``/``APPIAN_CHECKPOINT_DIR`` (default
+``$RUNNER_TEMP/appian-checkpoints``), one file per operation, environment
+and resource; point it at a persistent directory for re-runs to find them.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from engine import AppianEngine
+from errors import AppianHTTPError
+from utils import log
+
+CHECKPOINT_VERSION = 1
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip()) or "_"
+
+
+class Checkpoint:
+    """Checkpoint file of one operation (``export``/``import``) on one environment."""
+
+    def __init__(self, directory: Path, operation: str, base_url: str, key: str) -> None:
+        self.operation = operation
+        self.env = urlsplit(base_url).netloc or base_url
+        self.key = key
+        self.path = directory / f"{operation}__{_slug(self.env)}__{_slug(key)}.json"
+        self.data: dict = {}
+
+    def load(self) -> Optional[dict]:
+        """Return the saved checkpoint, or ``None`` when there is none."""
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Checkpoint ilegible: {self.path}: {e}") from e
+        if not isinstance(data, dict) or data.get("operation") != self.operation:
+            raise RuntimeError(f"Checkpoint inválido: {self.path}")
+        return data
+
+    def save(self, **fields: object) -> None:
+        """Merge ``fields`` into the checkpoint and write it atomically."""
+        if not self.data:
+            self.data = {
+                "version": CHECKPOINT_VERSION,
+                "operation": self.operation,
+                "env": self.env,
+                "key": self.key,
+            }
+        self.data.update(fields)
+        self.data["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".checkpoint-", dir=str(self.path.parent))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(self.data, fh, indent=2)
+                fh.write("\n")
+                fh.flush()
+                # Debe sobrevivir a que maten el runner justo después del POST
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        log(
+            f"checkpoint=SAVED {self.operation} state={self.data.get('state')} "
+            f"uuid={self.data.get('uuid') or '-'} path={self.path}"
+        )
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.data = {}
+
+    def resumable(self, resume: bool) -> Optional[dict]:
+        """The saved checkpoint when ``resume`` is set; otherwise only warn about it."""
+        saved = self.load()
+        if saved is None:
+            if resume:
+                log(f"checkpoint=NONE {self.operation}: no hay nada que reanudar en {self.path}")
+            return None
+        if not resume:
+            log(
+                f"checkpoint=FOUND {self.operation} uuid={saved.get('uuid') or '-'} "
+                f"state={saved.get('state')}: se inicia uno nuevo (use --resume para reanudar)"
+            )
+            return None
+        self.data = saved
+        return saved
+
+
+def check_artifacts(saved: dict, artifacts: Dict[str, str]) -> None:
+    """Refuse to resume an import submitted with different files."""
+    recorded = saved.get("artifacts") or {}
+    changed = sorted(
+        name
+        for name in set(recorded) | set(artifacts)
+        if recorded.get(name) != artifacts.get(name)
+    )
+    if changed:
+        raise RuntimeError(
+            f"El checkpoint {saved.get('uuid') or saved.get('marker')} se creó con otros "
+            f"artifacts ({', '.join(changed)}); no se puede reanudar. Borre el checkpoint "
+            "o ejecute sin --resume"
+        )
+
+
+async def reattach(engine: AppianEngine, saved: dict) -> Optional[dict]:
+    """Return ``{"uuid", "url"}`` of the checkpointed deployment, or ``None`` if gone.
+
+    Without a UUID (runner died before the POST answered) the deployment is
+    looked up by the idempotency marker; ``None`` then means it was never created.
+    """
+    dep_uuid = saved.get("uuid")
+    if not dep_uuid:
+        marker = saved.get("marker")
+        found = await engine.find_deployment(marker) if marker else None
+        if found is None:
+            log(f"checkpoint=NOT_SUBMITTED marker={marker}: el POST no llegó a Appian")
+            return None
+        dep_uuid = found["uuid"]
+        saved = dict(saved, uuid=dep_uuid, url=found.get("url"))
+    try:
+        status = await engine.get_deployment(dep_uuid, saved.get("url"))
+    except AppianHTTPError as exc:
+        if exc.status != 404:
+            raise
+        log(f"checkpoint=STALE uuid={dep_uuid}: Appian ya no conoce el deployment")
+        return None
+    log(
+        f"checkpoint=RESUME {saved.get('operation')} uuid={dep_uuid} "
+        f"status={str(status.get('status', '')).upper()}"
+    )
+    return {"uuid": dep_uuid, "url": saved.get("url"), "marker": saved.get("marker")}
+
+
+def checkpoint_dir_from(arg: str) -> Optional[Path]:
+    """``--checkpoint-dir``, ``APPIAN_CHECKPOINT_DIR`` or ``$RUNNER_TEMP/appian-checkpoints``."""
+    value = arg or os.environ.get("APPIAN_CHECKPOINT_DIR", "")
+    if not value and os.environ.get("RUNNER_TEMP"):
+        value = os.path.join(os.environ["RUNNER_TEMP"], "appian-checkpoints")
+    return Path(value).resolve() if value else None
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Per-host circuit breaker shared by every Appian call in the process."""
+
+import os
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+from errors import AppianError, AppianHTTPError, AppianNetworkError, CircuitOpenError
+
+
+class CircuitBreaker:
+    """Open the circuit after ``threshold`` consecutive failures for ``cooldown_s``.
+
+    Once the cooldown elapses a single probe call is let through (half-open); its
+    outcome closes the circuit again or re-opens it for another cooldown.
+    """
+
+    def __init__(self, host: str, threshold: int, cooldown_s: float) -> None:
+        self.host = host
+        self.threshold = max(1, threshold)
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at: float = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.threshold
+
+    def before_call(self) -> bool:
+        """Raise ``CircuitOpenError`` while the host is considered down.
+
+        Returns ``True`` when this call is the half-open probe: the caller must
+        call ``end_probe`` once it finishes, however it finishes.
+        """
+        with self._lock:
+            if not self.is_open:
+                return False
+            remaining = self.opened_at + self.cooldown_s - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(self.host, max(remaining, 0.0))
+            self._probing = True
+            return True
+
+    def end_probe(self) -> None:
+        """Let the next call probe again if this probe ended without an outcome."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.is_open:
+                self.opened_at = time.monotonic()
+
+    def record(self, exc: AppianError) -> None:
+        """Account for ``exc``: only outages count, API-level errors prove the host is up."""
+        if isinstance(exc, AppianNetworkError):
+            self.record_failure()
+        elif isinstance(exc, AppianHTTPError) and exc.unavailable:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def circuit_for(url: str) -> CircuitBreaker:
+    """Return the process-wide breaker for the host of ``url``."""
+    host = urlsplit(url).netloc.lower() or url
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                threshold=int(os.environ.get("APPIAN_CIRCUIT_FAILURE_THRESHOLD", "5")),
+                cooldown_s=float(os.environ.get("APPIAN_CIRCUIT_COOLDOWN", "60")),
+            )
+            _BREAKERS[host] = breaker
+        return breaker
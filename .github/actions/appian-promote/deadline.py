@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""End-to-end deadline per CLI run and size-scaled transfer timeouts.
+
+``APPIAN_DEADLINE`` (seconds, counted from process start) bounds the whole
+operation: every HTTP exchange is cut at the remaining budget and polling
+phases get ``min(max wait, remaining - reserve)``, where the reserve keeps
+time for the phases that still follow. Time spent waiting in the client-side
+deployment queue is excluded, only for the context that waited (each app of a
+``release`` runs in its own task). Unset, only the per-phase max waits
+apply, as before.
+
+Transfers have two bounds. Each I/O step may stall for at most a fixed wait
+(the 300s/600s the import/inspection POSTs always had, 180s for downloads),
+and the whole exchange gets ``floor + safety x size / throughput``. Upload and
+download throughput are estimated separately, seeded by
+``APPIAN_THROUGHPUT_BPS`` and refined from the transfers ``HttpClient``
+measures; until a direction has a measurement its whole-exchange bound uses a
+quarter of the seed, so a slow uplink is not cut short by a guess. Stdlib
+only: ``async_http`` imports this module.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, Tuple, TypeVar
+
+from logger import log as _log
+
+T = TypeVar("T")
+
+# Arranque del proceso: la verificación y el hashing previos también consumen el deadline
+_PROCESS_START = time.monotonic()
+
+# Pisos de los POST con paquete: Appian procesa antes de responder (los valores fijos de antes)
+IMPORT_POST_FLOOR_S = 300.0
+INSPECTION_POST_FLOOR_S = 600.0
+# Espera máxima por paso de las descargas (el timeout fijo de antes)
+DOWNLOAD_FLOOR_S = 180.0
+# Sin medición propia el tope total usa una fracción de la semilla: cortar un upload sano
+# (y volver a subirlo entero) cuesta más que esperar de más
+UNMEASURED_FRACTION = 0.25
+# Transferencias más chicas no dicen nada del ancho de banda (domina la latencia)
+MIN_SAMPLE_BYTES = 64 * 1024
+DEFAULT_THROUGHPUT_BPS = 1024 * 1024
+
+
+class ThroughputEstimator:
+    """Exponentially weighted bytes/second of the transfers seen so far (one direction)."""
+
+    def __init__(self, direction: str, seed_bps: float, alpha: float = 0.3) -> None:
+        self.direction = direction
+        self.bps = max(1.0, seed_bps)
+        self.alpha = alpha
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, size: int, elapsed_s: float) -> None:
+        if size < MIN_SAMPLE_BYTES or elapsed_s <= 0:
+            return
+        rate = size / elapsed_s
+        with self._lock:
+            # La primera medición reemplaza la semilla: es una suposición, no un dato
+            if self.samples:
+                rate = self.alpha * rate + (1 - self.alpha) * self.bps
+            self.bps = rate
+            self.samples += 1
+
+    def bound_bps(self) -> float:
+        """Rate for whole-exchange bounds: the measurement, else a fraction of the seed."""
+        return self.bps if self.samples else self.bps * UNMEASURED_FRACTION
+
+    def seconds_for(self, size: int) -> float:
+        return size / self.bound_bps()
+
+    def describe(self) -> str:
+        source = "medido" if self.samples else f"semilla x{UNMEASURED_FRACTION:g}"
+        return f"{self.direction}={self.bound_bps() / 1024:.0f}KiB/s ({source})"
+
+
+_SEED_BPS = float(os.environ.get("APPIAN_THROUGHPUT_BPS", str(DEFAULT_THROUGHPUT_BPS)))
+UPLOAD_THROUGHPUT = ThroughputEstimator("upload", _SEED_BPS)
+DOWNLOAD_THROUGHPUT = ThroughputEstimator("download", _SEED_BPS)
+
+
+def _scaled(size: int, floor_s: float, estimator: ThroughputEstimator) -> float:
+    safety = float(os.environ.get("APPIAN_TIMEOUT_SAFETY", "2"))
+    return floor_s + max(1.0, safety) * estimator.seconds_for(size)
+
+
+def _log_timeout(
+    label: str, total: float, stall: float, size: int, est: ThroughputEstimator
+) -> None:
+    deadline = operation_deadline()
+    _log(
+        f"timeout.{label}={total:.0f}s stall={stall:.0f}s size={size}B {est.describe()}"
+        + (f" budget.remaining={deadline.remaining():.0f}s" if deadline.bounded else "")
+    )
+
+
+def upload_timeouts(size: int, label: str, floor_s: float) -> Tuple[float, float]:
+    """(per-step stall timeout, whole-exchange timeout) for a ``size``-byte upload.
+
+    The stall bound is ``floor_s``; the whole exchange gets floor + safety x
+    upload time. Both are clamped to the remaining deadline; logs
+    ``timeout.<label>=<s> stall=<s>``.
+    """
+    deadline = operation_deadline()
+    stall = deadline.clamp(floor_s, label)
+    total = deadline.clamp(_scaled(size, floor_s, UPLOAD_THROUGHPUT), label)
+    _log_timeout(label, total, stall, size, UPLOAD_THROUGHPUT)
+    return stall, total
+
+
+def download_timeout(size: int, label: str = "download") -> float:
+    """Whole-body bound for a ``size``-byte download (``Content-Length`` or an estimate)."""
+    deadline = operation_deadline()
+    total = deadline.clamp(_scaled(size, DOWNLOAD_FLOOR_S, DOWNLOAD_THROUGHPUT), label)
+    _log_timeout(label, total, DOWNLOAD_FLOOR_S, size, DOWNLOAD_THROUGHPUT)
+    return total
+
+
+class Deadline:
+    """Time budget of one operation, shared by every phase and request."""
+
+    def __init__(
+        self,
+        total_s: Optional[float],
+        started: Optional[float] = None,
+        min_phase_s: float = 120.0,
+    ) -> None:
+        self.total_s = total_s if total_s and total_s > 0 else None
+        self.started = time.monotonic() if started is None else started
+        self.min_phase_s = max(0.0, min_phase_s)
+        # Por contexto: las tasks de release copian el contexto, así la espera de una app
+        # no alarga el presupuesto de las demás
+        self._excluded: ContextVar[float] = ContextVar("appian_deadline_excluded", default=0.0)
+
+    @property
+    def bounded(self) -> bool:
+        return self.total_s is not None
+
+    def remaining(self) -> float:
+        if self.total_s is None:
+            return math.inf
+        return self.total_s - (time.monotonic() - self.started - self._excluded.get())
+
+    def check(self, what: str) -> None:
+        """Raise ``RuntimeError`` if the budget is spent before ``what``."""
+        if self.remaining() <= 0:
+            raise RuntimeError(
+                f"Deadline de la operación agotado ({self.total_s:.0f}s, APPIAN_DEADLINE) "
+                f"antes de {what}"
+            )
+
+    def clamp(self, timeout: float, what: str) -> float:
+        self.check(what)
+        return min(timeout, self.remaining())
+
+    async def run(self, aw: Awaitable[T], what: str) -> T:
+        """Await ``aw`` but cancel it when the budget runs out."""
+        if self.total_s is None:
+            return await aw
+        self.check(what)
+        try:
+            return await asyncio.wait_for(aw, self.remaining())
+        except asyncio.TimeoutError:
+            # Los timeouts de I/O llegan como AppianNetworkError: este solo puede ser el deadline
+            self.check(what)
+            raise
+
+    def grant(self, phase: str, want_s: float, reserve_s: float = 0.0) -> float:
+        """Seconds ``phase`` may wait: ``want_s`` minus what later phases need.
+
+        When the reserve cannot be honoured the phase still gets whatever is
+        left; logs ``budget.<phase> granted= remaining= reserve=``.
+        """
+        if self.total_s is None:
+            return want_s
+        self.check(phase)
+        remaining = self.remaining()
+        granted = min(want_s, remaining - reserve_s)
+        if granted <= 0:
+            granted = min(want_s, remaining)
+            _log(
+                f"budget.{phase}=TIGHT quedan {remaining:.0f}s y las fases siguientes "
+                f"necesitarían {reserve_s:.0f}s"
+            )
+        _log(
+            f"budget.{phase} granted={granted:.0f}s remaining={remaining:.0f}s "
+            f"reserve={reserve_s:.0f}s"
+        )
+        return granted
+
+    def exclude(self, seconds: float, what: str) -> None:
+        """Do not charge ``seconds`` spent on ``what`` (e.g. a client-side queue).
+
+        Only the current context (task) gets the time back; the deadline itself
+        is shared, so moving ``started`` would credit every concurrent app.
+        """
+        if self.total_s is not None and seconds > 0:
+            self._excluded.set(self._excluded.get() + seconds)
+            if seconds >= 1:
+                _log(f"budget.excluded={seconds:.0f}s ({what}) remaining={self.remaining():.0f}s")
+
+    def report(self, phase: str) -> None:
+        if self.total_s is not None:
+            _log(f"budget.{phase} remaining={self.remaining():.0f}s of={self.total_s:.0f}s")
+
+
+_DEADLINE: Optional[Deadline] = None
+_DEADLINE_LOCK = threading.Lock()
+# Deadline propio de cada job del modo servicio (el proceso vive más que cualquier operación)
+_JOB_DEADLINE: ContextVar[Optional[Deadline]] = ContextVar("appian_job_deadline", default=None)
+
+
+def operation_deadline() -> Deadline:
+    """Return the process-wide deadline (``APPIAN_DEADLINE``; unset = unbounded)."""
+    job = _JOB_DEADLINE.get()
+    if job is not None:
+        return job
+    global _DEADLINE
+    with _DEADLINE_LOCK:
+        if _DEADLINE is None:
+            _DEADLINE = Deadline(
+                float(os.environ.get("APPIAN_DEADLINE", "0") or 0),
+                started=_PROCESS_START,
+                min_phase_s=float(os.environ.get("APPIAN_DEADLINE_MIN_PHASE", "120")),
+            )
+        return _DEADLINE
+
+
+def start_job_deadline(total_s: float) -> Deadline:
+    """Give the current context (one service job) its own deadline, counted from now."""
+    deadline = Deadline(
+        total_s,
+        min_phase_s=float(os.environ.get("APPIAN_DEADLINE_MIN_PHASE", "120")),
+    )
+    _JOB_DEADLINE.set(deadline)
+    return deadline
+
+
+def phase_reserve(upload_bytes: int = 0, download_bytes: int = 0) -> float:
+    """Seconds to keep for a later phase that moves ``upload_bytes``/``download_bytes``."""
+    deadline = operation_deadline()
+    reserve = deadline.min_phase_s
+    if upload_bytes:
+        reserve += _scaled(upload_bytes, IMPORT_POST_FLOOR_S, UPLOAD_THROUGHPUT)
+    if download_bytes:
+        # Sin el piso: las descargas esperan por paso, no 180s por archivo
+        reserve += _scaled(download_bytes, 0.0, DOWNLOAD_THROUGHPUT)
+    return reserve
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Single-pass parser of Appian deployment logs into per-object events.
+
+The body of ``/deployments/{uuid}/log`` is fed chunk by chunk as it streams
+in; memory stays bounded by the longest line, the failures kept (at most
+``MAX_FAILURES``) and the tail kept for the job log. Appian writes object
+results either on one line (``Interface "Foo" (_a-0000e...) failed: APNX-...``)
+or as ``Key: value`` blocks (``Object Name:``, ``Object UUID:``, ``Status:``);
+both yield one event per object. Lines without an object UUID that carry an
+``APNX`` code (or are indented under it) are attached to the preceding failure.
+"""
+
+import codecs
+import re
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+MAX_FAILURES = 1000
+TAIL_LINES = 200
+
+_UUID = re.compile(
+    r"(?:_[a-z]-)?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?:_\d+)?"
+    r"|\bSYSTEM_[A-Z0-9_]+\b",
+    re.IGNORECASE,
+)
+_APNX = re.compile(r"\bAPNX-\d+-\d+-\d+\b")
+# "imported successfully with 0 errors" no es una falla: se descarta antes de clasificar
+_NO_ERRORS = re.compile(r"\b(?:0|no|zero|without)\s+(?:errors?|failures?)\b", re.I)
+# Orden importa: "not imported" y "imported with errors" son fallas, no importaciones
+_OUTCOMES = (
+    (
+        "FAILED",
+        re.compile(
+            r"\b(fail(ed|ure|s)?|not imported|could not|with (\d+ )?errors?"
+            r"|[1-9]\d* errors?|APNX-\d+-\d+-\d+)\b|^\s*errors?\s*$",
+            re.I,
+        ),
+    ),
+    ("SKIPPED", re.compile(r"\b(skipped|unchanged|not changed|no changes)\b", re.I)),
+    ("IMPORTED", re.compile(r"\b(imported|created|updated|succeeded|success(ful)?)\b", re.I)),
+)
+_QUOTED = re.compile(r"(?P<type>[A-Z][A-Za-z ]{1,40}?)\s*:?\s*[\"“'](?P<name>[^\"”']+)[\"”']")
+_PAREN = re.compile(r"(?P<type>[A-Z][A-Za-z ]{1,40}?)\s*:\s*(?P<name>[^():]+?)\s*\(")
+_FIELD = re.compile(
+    r"^\s*(?:object\s+)?(?P<key>name|uuid|type|status|result|error|problem)\s*:"
+    r"\s*(?P<value>.*?)\s*$",
+    re.IGNORECASE,
+)
+
+
+class LogEvent(NamedTuple):
+    uuid: str
+    name: str
+    type: str
+    outcome: str
+    message: str
+    code: str
+
+
+def _outcome(text: str) -> str:
+    text = _NO_ERRORS.sub("", text)
+    for outcome, pattern in _OUTCOMES:
+        if pattern.search(text):
+            return outcome
+    return ""
+
+
+class DeploymentLogParser:
+    """Incremental parser: ``feed`` byte chunks, then ``close`` and ``report``."""
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self._block: Dict[str, str] = {}
+        self._last_failure: Optional[str] = None
+        self.lines = 0
+        self.counts: Dict[str, int] = {"IMPORTED": 0, "FAILED": 0, "SKIPPED": 0}
+        self.failures: Dict[str, dict] = {}
+        self.dropped_failures = 0
+        self.codes: Dict[str, int] = {}
+        self.tail: Deque[str] = deque(maxlen=TAIL_LINES)
+
+    def feed(self, chunk: bytes) -> None:
+        self._pending += self._decoder.decode(chunk)
+        *complete, self._pending = self._pending.split("\n")
+        for line in complete:
+            self._line(line.rstrip("\r"))
+
+    def close(self) -> None:
+        self._pending += self._decoder.decode(b"", final=True)
+        if self._pending:
+            self._line(self._pending.rstrip("\r"))
+            self._pending = ""
+        self._flush_block()
+
+    # --- Parsing ---------------------------------------------------------
+
+    def _line(self, line: str) -> None:
+        self.lines += 1
+        self.tail.append(line)
+        for code in _APNX.findall(line):
+            self.codes[code] = self.codes.get(code, 0) + 1
+        if not line.strip():
+            self._flush_block()
+            return
+        field = _FIELD.match(line)
+        if field:
+            key = field.group("key").lower()
+            key = {"result": "status", "problem": "error"}.get(key, key)
+            if key in self._block and key in ("name", "uuid"):
+                # Empieza el bloque del siguiente objeto sin línea en blanco de por medio
+                self._flush_block()
+            self._block[key] = field.group("value")
+            return
+        found = _UUID.search(line)
+        if found is None:
+            self._continuation(line)
+            return
+        outcome = _outcome(line[found.end():]) or _outcome(line)
+        if not outcome:
+            return
+        named = _QUOTED.search(line, 0, found.start()) or _PAREN.search(line, 0, found.end())
+        code = _APNX.search(line)
+        self._emit(
+            LogEvent(
+                found.group(0),
+                named.group("name").strip() if named else "",
+                named.group("type").strip() if named else "",
+                outcome,
+                line.strip(),
+                code.group(0) if code else "",
+            )
+        )
+
+    def _continuation(self, line: str) -> None:
+        failure = self.failures.get(self._last_failure or "")
+        if failure is None:
+            return
+        code = _APNX.search(line)
+        if code and not failure["code"]:
+            failure["code"] = code.group(0)
+        # Solo detalle del objeto anterior: con código APNX o indentado bajo su línea
+        if code or (line[:1].isspace() and _outcome(line) == "FAILED"):
+            failure["message"] = f"{failure['message']} | {line.strip()}"[:2000]
+
+    def _flush_block(self) -> None:
+        block, self._block = self._block, {}
+        if not block.get("uuid"):
+            return
+        status = block.get("status", "")
+        error = block.get("error", "")
+        outcome = _outcome(status) or ("FAILED" if error else "")
+        if not outcome:
+            return
+        code = _APNX.search(f"{status} {error}")
+        self._emit(
+            LogEvent(
+                block["uuid"],
+                block.get("name", ""),
+                block.get("type", ""),
+                outcome,
+                error or status,
+                code.group(0) if code else "",
+            )
+        )
+
+    def _emit(self, event: LogEvent) -> None:
+        self._last_failure = None
+        if event.outcome != "FAILED":
+            self.counts[event.outcome] += 1
+            return
+        known = self.failures.get(event.uuid)
+        if known is not None:
+            # El mismo objeto reportado en varias líneas: se completa, no se cuenta de nuevo
+            known["code"] = known["code"] or event.code
+            known["name"] = known["name"] or event.name
+            known["type"] = known["type"] or event.type
+        elif len(self.failures) >= MAX_FAILURES:
+            self.counts["FAILED"] += 1
+            self.dropped_failures += 1
+            return
+        else:
+            self.counts["FAILED"] += 1
+            self.failures[event.uuid] = event._asdict()
+        self._last_failure = event.uuid
+
+    # --- Result ----------------------------------------------------------
+
+    def report(self, summary_objects: Optional[dict] = None) -> dict:
+        """Counts, failures and APNX codes; compared with ``summary.objects`` if given."""
+        counts = {key.lower(): value for key, value in self.counts.items()}
+        result: Dict[str, object] = {
+            "lines": self.lines,
+            "counts": counts,
+            "failures": list(self.failures.values()),
+            "droppedFailures": self.dropped_failures,
+            "apnxCodes": dict(sorted(self.codes.items(), key=lambda kv: -kv[1])),
+        }
+        if summary_objects:
+            expected = {
+                key: summary_objects.get(key)
+                for key in ("imported", "failed", "skipped")
+                if isinstance(summary_objects.get(key), int)
+            }
+            mismatches: List[str] = [
+                f"{key}: log={counts[key]} summary={value}"
+                for key, value in expected.items()
+                if counts[key] != value
+            ]
+            result["summaryObjects"] = expected
+            result["matchesSummary"] = not mismatches
+            result["mismatches"] = mismatches
+        return result
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Client-side queue that serializes imports into the same target environment.
+
+Appian queues concurrent imports internally, so pollers of several workflows
+promoting into one tenant time out while merely waiting in line. Taking a
+slot per environment before the POST keeps that wait on our side, where it
+is bounded by ``APPIAN_QUEUE_MAX_WAIT`` instead of ``APPIAN_PROMOTE_MAX_WAIT``
+and excluded from the operation deadline.
+
+Waiters are ordered by lane (``hotfix`` before ``routine``) and then by
+arrival. Backends (``APPIAN_QUEUE_BACKEND``):
+
+- ``file`` (default): tickets plus an ``flock``-held slot under
+  ``--queue-dir``/``APPIAN_QUEUE_DIR``, shared by every job on the runner (or
+  on a shared mount). A crashed holder releases the slot with its process;
+  tickets without heartbeat for ``APPIAN_QUEUE_STALE`` seconds are dropped.
+- ``local``: in-process stand-in for tests and single-process callers.
+- ``<module>:<factory>``: any ``QueueBackend`` built as ``factory(directory)``.
+"""
+
+import abc
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, AsyncIterator, Dict, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+from deadline import operation_deadline
+from metrics import observe_queue_wait
+from utils import log
+
+# Menor número = se atiende antes
+LANES = {"hotfix": 0, "routine": 1}
+DEFAULT_LANE = "routine"
+# Cada cuántos segundos se repite queue=WAITING mientras se espera
+_REPORT_EVERY_S = 60.0
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip()) or "_"
+
+
+class Ticket(NamedTuple):
+    id: str
+    env: str
+    lane: str
+    enqueued_ns: int
+    holder: str
+
+    @property
+    def priority(self) -> int:
+        return LANES[self.lane]
+
+    @property
+    def order(self) -> str:
+        # Orden lexicográfico == (lane, llegada, id): sirve también como nombre de archivo
+        return f"{self.priority}-{self.enqueued_ns:020d}-{self.id}"
+
+
+class QueueStatus(NamedTuple):
+    acquired: bool
+    ahead: int
+    holder: str
+
+
+class QueueBackend(abc.ABC):
+    """Storage of tickets and the slot of each environment.
+
+    A subclass missing any of the methods below cannot be instantiated, so a
+    ``module:factory`` backend fails when it is built, not on its first import.
+    """
+
+    name = "abstract"
+
+    @abc.abstractmethod
+    def enqueue(self, ticket: Ticket) -> None:
+        """Join the line of ``ticket.env``."""
+
+    @abc.abstractmethod
+    def try_acquire(self, ticket: Ticket) -> QueueStatus:
+        """Heartbeat ``ticket``; take the slot if it is first in line and free."""
+
+    @abc.abstractmethod
+    def release(self, ticket: Ticket) -> None:
+        """Free the slot held by ``ticket``."""
+
+    @abc.abstractmethod
+    def withdraw(self, ticket: Ticket) -> None:
+        """Leave the line without having acquired the slot."""
+
+
+class LocalQueueBackend(QueueBackend):
+    """In-process queue: serializes coroutines/threads of one process only."""
+
+    name = "local"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waiting: Dict[str, List[Ticket]] = {}
+        self._holders: Dict[str, Ticket] = {}
+
+    def enqueue(self, ticket: Ticket) -> None:
+        with self._lock:
+            line = self._waiting.setdefault(ticket.env, [])
+            line.append(ticket)
+            line.sort(key=lambda t: t.order)
+
+    def try_acquire(self, ticket: Ticket) -> QueueStatus:
+        with self._lock:
+            line = self._waiting.get(ticket.env, [])
+            holder = self._holders.get(ticket.env)
+            ahead = line.index(ticket)
+            if ahead == 0 and holder is None:
+                line.pop(0)
+                self._holders[ticket.env] = ticket
+                return QueueStatus(True, 0, ticket.holder)
+            return QueueStatus(False, ahead, holder.holder if holder else "")
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if self._holders.get(ticket.env) == ticket:
+                del self._holders[ticket.env]
+
+    def withdraw(self, ticket: Ticket) -> None:
+        with self._lock:
+            line = self._waiting.get(ticket.env, [])
+            if ticket in line:
+                line.remove(ticket)
+
+
+class FileQueueBackend(QueueBackend):
+    """Tickets and ``flock`` slot under ``<directory>/<env>/``."""
+
+    name = "file"
+
+    def __init__(self, directory: Path, stale_s: float = 120.0) -> None:
+        if fcntl is None:
+            raise RuntimeError("La cola de deployments 'file' requiere fcntl (runner Linux/macOS)")
+        self.directory = directory
+        self.stale_s = stale_s
+        self._slots: Dict[str, IO[str]] = {}
+
+    def _env_dir(self, env: str) -> Path:
+        return self.directory / _slug(env)
+
+    def _ticket_path(self, ticket: Ticket) -> Path:
+        return self._env_dir(ticket.env) / "tickets" / f"{ticket.order}.json"
+
+    def enqueue(self, ticket: Ticket) -> None:
+        path = self._ticket_path(ticket)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(ticket._asdict()), encoding="utf-8")
+
+    def _live_tickets(self, ticket: Ticket) -> List[Path]:
+        now = time.time()
+        live: List[Path] = []
+        for path in sorted(self._ticket_path(ticket).parent.glob("*.json")):
+            try:
+                idle = now - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if idle > self.stale_s and path.name != self._ticket_path(ticket).name:
+                # Su dueño murió sin retirarse: no debe bloquear la fila
+                log(f"queue=STALE_TICKET env={ticket.env} ticket={path.stem} idle={idle:.0f}s")
+                path.unlink(missing_ok=True)
+                continue
+            live.append(path)
+        return live
+
+    def _holder(self, env: str) -> str:
+        try:
+            return json.loads((self._env_dir(env) / "holder.json").read_text("utf-8"))["holder"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return ""
+
+    def try_acquire(self, ticket: Ticket) -> QueueStatus:
+        mine = self._ticket_path(ticket)
+        if not mine.exists():
+            # Lo podó otro waiter tras una pausa larga (p. ej. runner suspendido)
+            self.enqueue(ticket)
+        os.utime(mine)
+        names = [path.name for path in self._live_tickets(ticket)]
+        ahead = names.index(mine.name)
+        if ahead:
+            return QueueStatus(False, ahead, self._holder(ticket.env))
+        slot = (self._env_dir(ticket.env) / "slot.lock").open("a+")
+        try:
+            fcntl.flock(slot.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            slot.close()
+            return QueueStatus(False, 0, self._holder(ticket.env))
+        # El flock se libera solo si el proceso muere: el slot nunca queda huérfano
+        self._slots[ticket.id] = slot
+        (self._env_dir(ticket.env) / "holder.json").write_text(
+            json.dumps(ticket._asdict()), encoding="utf-8"
+        )
+        mine.unlink(missing_ok=True)
+        return QueueStatus(True, 0, ticket.holder)
+
+    def release(self, ticket: Ticket) -> None:
+        slot = self._slots.pop(ticket.id, None)
+        if slot is None:
+            return
+        (self._env_dir(ticket.env) / "holder.json").unlink(missing_ok=True)
+        fcntl.flock(slot.fileno(), fcntl.LOCK_UN)
+        slot.close()
+
+    def withdraw(self, ticket: Ticket) -> None:
+        self._ticket_path(ticket).unlink(missing_ok=True)
+
+
+class DeploymentQueue:
+    """Slot of one target environment, requested in one lane."""
+
+    def __init__(
+        self,
+        backend: QueueBackend,
+        env: str,
+        lane: str = DEFAULT_LANE,
+        poll_s: float = 5.0,
+        max_wait_s: float = 3600.0,
+    ) -> None:
+        if lane not in LANES:
+            raise RuntimeError(f"Lane de cola inválido: {lane} (use {', '.join(LANES)})")
+        self.backend = backend
+        self.env = env
+        self.lane = lane
+        self.poll_s = poll_s
+        self.max_wait_s = max_wait_s
+
+    @contextlib.asynccontextmanager
+    async def slot(self, label: str) -> AsyncIterator[float]:
+        """Wait for the environment's slot, hold it for the block; yields the wait."""
+        ticket = Ticket(
+            uuid.uuid4().hex[:12],
+            self.env,
+            self.lane,
+            time.time_ns(),
+            f"{socket.gethostname()}:{os.getpid()} {label}",
+        )
+        started = time.monotonic()
+        self.backend.enqueue(ticket)
+        acquired = False
+        try:
+            reported = -_REPORT_EVERY_S
+            while True:
+                state = self.backend.try_acquire(ticket)
+                waited = time.monotonic() - started
+                if state.acquired:
+                    acquired = True
+                    break
+                if waited > self.max_wait_s:
+                    raise RuntimeError(
+                        f"Timeout esperando turno en la cola de deployments de {self.env} "
+                        f"({self.max_wait_s:.0f}s, APPIAN_QUEUE_MAX_WAIT)"
+                    )
+                if waited - reported >= _REPORT_EVERY_S:
+                    reported = waited
+                    log(
+                        f"queue=WAITING env={self.env} lane={self.lane} ahead={state.ahead} "
+                        f"holder={state.holder or '-'} waited={waited:.0f}s"
+                    )
+                await asyncio.sleep(self.poll_s)
+        finally:
+            if not acquired:
+                self.backend.withdraw(ticket)
+        observe_queue_wait(self.env, self.lane, waited)
+        # La espera en fila no es tiempo de Appian: no consume el deadline de la operación
+        operation_deadline().exclude(waited, "queue")
+        log(
+            f"queue=ACQUIRED env={self.env} lane={self.lane} waited={waited:.0f}s "
+            f"backend={self.backend.name}"
+        )
+        held_from = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.backend.release(ticket)
+            log(f"queue=RELEASED env={self.env} held={time.monotonic() - held_from:.0f}s")
+
+
+_LOCAL = LocalQueueBackend()
+
+
+def backend_from(directory: Optional[Path]) -> Optional[QueueBackend]:
+    """Backend named by ``APPIAN_QUEUE_BACKEND``; ``None`` when the queue is off."""
+    name = os.environ.get("APPIAN_QUEUE_BACKEND", "") or "file"
+    if name == "local":
+        return _LOCAL
+    if name == "file":
+        if directory is None:
+            return None
+        return FileQueueBackend(directory, float(os.environ.get("APPIAN_QUEUE_STALE", "120")))
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise RuntimeError(
+            f"APPIAN_QUEUE_BACKEND inválido: {name} (use file, local o modulo:factory)"
+        )
+    factory = getattr(importlib.import_module(module_name), attr)
+    try:
+        backend = factory(directory)
+    except TypeError as exc:
+        # Incluye una subclase que no implementa todos los métodos abstractos
+        raise RuntimeError(f"{name} no pudo construir el backend: {exc}") from exc
+    if not isinstance(backend, QueueBackend):
+        raise RuntimeError(f"{name} no devolvió un QueueBackend")
+    return backend
+
+
+def deployment_queue_from(arg_dir: str, env: str, lane: str) -> Optional[DeploymentQueue]:
+    """Queue for ``env`` from ``--queue-dir``/``APPIAN_QUEUE_DIR`` and the backend env vars."""
+    value = arg_dir or os.environ.get("APPIAN_QUEUE_DIR", "")
+    backend = backend_from(Path(value).resolve() if value else None)
+    if backend is None:
+        return None
+    return DeploymentQueue(
+        backend,
+        env,
+        lane or os.environ.get("APPIAN_QUEUE_LANE", "") or DEFAULT_LANE,
+        float(os.environ.get("APPIAN_QUEUE_POLL_INTERVAL", "5")),
+        float(os.environ.get("APPIAN_QUEUE_MAX_WAIT", "3600")),
+    )
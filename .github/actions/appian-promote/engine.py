@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""Async primitives for Appian Deployment Management v2.
+
+``AppianEngine`` wraps one environment (base URL + API key) and exposes the
+building blocks of every flow: export start, inspection, import, status
+polling, deployment logs and streamed downloads. All calls share the loop's
+pooled ``HttpClient``, so concurrency is bounded by ``APPIAN_MAX_CONCURRENCY``
+and cancelling a task aborts its in-flight request cleanly.
+"""
+
+import asyncio
+import codecs
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from async_http import Body, HttpClient, HttpResponse, default_client
+from deadline import (
+    IMPORT_POST_FLOOR_S,
+    INSPECTION_POST_FLOOR_S,
+    operation_deadline,
+    upload_timeouts,
+)
+from errors import AppianError, AppianHTTPError
+from idempotency import _deployment_items, new_marker, submit_idempotent, tag_description
+from integrity import CHUNK_BYTES, StreamHasher
+from logger import log_status, log_status_done
+from metrics import count_final_status, count_poll
+from poll_schedule import PollSchedule
+from retry import RetryPolicy
+from upload import MultipartBody, PreparedUpload
+from utils import log
+
+API_PATH = "/suite/deployment-management/v2"
+
+
+class Download(NamedTuple):
+    path: Path
+    size: int
+    sha256: str
+    headers: Dict[str, str]
+    chunks: List[str]
+    chunk_bytes: int = CHUNK_BYTES
+
+
+def _decode_json(resp: HttpResponse) -> dict:
+    try:
+        return json.loads(resp.body.decode("utf-8"))
+    except ValueError as e:
+        raise RuntimeError(f"Respuesta no JSON de {resp.url}: {resp.body[:200]!r}") from e
+
+
+class _ItemStream:
+    """Incremental parser of a JSON list (bare or under ``key``), fed chunk by chunk.
+
+    Each element is decoded as soon as its bytes arrive and handed to
+    ``visit``; once ``visit`` returns True the rest of the body is drained
+    without being parsed. ``envelope()`` is the surrounding object with the
+    list left empty (paging fields such as ``totalCount``).
+    """
+
+    _SKIP = " \t\r\n,"
+
+    def __init__(self, key: str, visit: Callable[[dict], bool]) -> None:
+        self._start = re.compile(r'^\s*\[|"%s"\s*:\s*\[' % re.escape(key))
+        self._visit = visit
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._head: Optional[str] = None
+        self._tail: List[str] = []
+        self._open = False
+        self.items = 0
+        self.stopped = False
+
+    def feed(self, chunk: bytes) -> None:
+        if self.stopped:
+            return
+        text = self._decoder.decode(chunk)
+        if self._head is not None and not self._open:
+            self._tail.append(text)
+            return
+        self._buf += text
+        if self._head is None:
+            found = self._start.search(self._buf)
+            if found is None:
+                return
+            self._head, self._buf = self._buf[: found.end()], self._buf[found.end():]
+            self._open = True
+        self._drain()
+
+    def _drain(self) -> None:
+        buf, pos = self._buf, 0
+        while True:
+            while pos < len(buf) and buf[pos] in self._SKIP:
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                self._open = False
+                self._tail.append(buf[pos:])
+                pos = len(buf)
+                break
+            try:
+                item, end = self._json.raw_decode(buf, pos)
+            except ValueError:
+                break  # Elemento incompleto: espera el próximo chunk
+            pos = end
+            if not isinstance(item, dict):
+                continue
+            self.items += 1
+            if self._visit(item):
+                self.stopped = True
+                break
+        self._buf = buf[pos:]
+
+    def envelope(self) -> dict:
+        """Top-level object around the list (``{}`` for a bare list or after a stop)."""
+        if self.stopped:
+            return {}
+        if self._head is None or self._open or self._buf.strip():
+            raise RuntimeError(f"Listado JSON incompleto o inválido: {self._buf[:200]!r}")
+        try:
+            data = json.loads(self._head + "".join(self._tail) + self._decoder.decode(b"", True))
+        except ValueError as e:
+            raise RuntimeError(f"Listado JSON inválido: {self._head[:200]!r}") from e
+        return data if isinstance(data, dict) else {}
+
+
+class AppianEngine:
+    """Async client for one Appian environment."""
+
+    def __init__(self, base_url: str, api_key: str, client: Optional[HttpClient] = None) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._client = client
+
+    @property
+    def client(self) -> HttpClient:
+        # Se resuelve al primer uso: el pool pertenece al event loop en ejecución
+        if self._client is None:
+            self._client = default_client()
+        return self._client
+
+    def api_url(self, path: str) -> str:
+        return f"{self.base_url}{API_PATH}/{path.lstrip('/')}"
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        accept: Optional[str] = "application/json",
+        body: Body = None,
+        content_type: Optional[str] = None,
+        action_type: Optional[str] = None,
+        timeout: float = 60,
+        sink: Optional[Callable[[bytes], None]] = None,
+        total_timeout: Optional[float] = None,
+    ) -> HttpResponse:
+        headers = {"appian-api-key": self.api_key}
+        if accept:
+            headers["Accept"] = accept
+        if content_type:
+            headers["Content-Type"] = content_type
+        if action_type:
+            headers["Action-Type"] = action_type
+        return await self.client.request(
+            method, url, headers, body, timeout=timeout, sink=sink, total_timeout=total_timeout
+        )
+
+    # --- Deployments -----------------------------------------------------
+
+    async def find_deployment(self, marker: str) -> Optional[dict]:
+        """Return the deployment whose name/description carries ``marker``, if any.
+
+        Returns ``None`` when nothing matches or the tenant does not expose the
+        deployments listing (404/405).
+        """
+        try:
+            resp = await self.request("GET", self.api_url("deployments"))
+        except AppianHTTPError as exc:
+            if exc.status in (400, 404, 405, 501):
+                log(f"deploy.lookup=UNSUPPORTED (HTTP {exc.status}); no se puede reconciliar")
+                return None
+            raise
+        for item in _deployment_items(_decode_json(resp)):
+            text = f"{item.get('name') or ''} {item.get('description') or ''}"
+            if marker in text and item.get("uuid"):
+                return item
+        return None
+
+    async def _submit_deployment(
+        self,
+        body: MultipartBody,
+        action_type: str,
+        marker: str,
+        policy: RetryPolicy,
+        label: str,
+        timeout: float,
+        total_timeout: Optional[float] = None,
+    ) -> dict:
+        async def _submit() -> dict:
+            resp = await self.request(
+                "POST",
+                self.api_url("deployments"),
+                body=body,
+                content_type=body.content_type,
+                action_type=action_type,
+                timeout=timeout,
+                total_timeout=total_timeout,
+            )
+            return _decode_json(resp)
+
+        return await submit_idempotent(_submit, lambda: self.find_deployment(marker), policy, label)
+
+    async def start_export(
+        self,
+        kind: str,
+        resource_id: str,
+        policy: RetryPolicy,
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        marker: Optional[str] = None,
+    ) -> dict:
+        """Kick off an export deployment and return its metadata."""
+        # Appian API expects exportType values: "application" or "package".
+        export_type = "application" if kind.lower() in ("app", "application") else kind
+        payload: dict = {"exportType": export_type, "uuids": [resource_id]}
+        if name:
+            payload["name"] = name
+        # Marcador de idempotencia: un reintento ambiguo se reconcilia en vez de re-exportar
+        marker = marker or new_marker()
+        payload["description"] = tag_description(description, marker)
+        body = MultipartBody(payload, [])
+        return await self._submit_deployment(body, "export", marker, policy, "export.post", 60)
+
+    async def start_import(
+        self,
+        upload: PreparedUpload,
+        name: str,
+        description: str,
+        policy: RetryPolicy,
+        data_source: Optional[str] = None,
+        marker: Optional[str] = None,
+    ) -> dict:
+        """Submit an import deployment; the streamed body is replayed on retries.
+
+        Each I/O step may stall for the fixed import wait; the whole exchange
+        (upload plus Appian's answer) is bounded by the body size over the
+        upload throughput (see ``deadline``).
+        """
+        marker = marker or new_marker()
+        body = upload.import_body(name, tag_description(description, marker), data_source)
+        stall, total = upload_timeouts(len(body), "deploy.post", IMPORT_POST_FLOOR_S)
+        return await self._submit_deployment(
+            body, "import", marker, policy, "deploy.post", stall, total_timeout=total
+        )
+
+    async def get_deployment(self, dep_uuid: str, url_hint: Optional[str] = None) -> dict:
+        url = url_hint or self.api_url(f"deployments/{dep_uuid}")
+        return _decode_json(await self.request("GET", url))
+
+    async def get_deployment_log(self, dep_uuid: str) -> str:
+        resp = await self.request(
+            "GET",
+            self.api_url(f"deployments/{dep_uuid}/log"),
+            accept="text/plain",
+            timeout=180,
+        )
+        try:
+            return resp.body.decode("utf-8")
+        except Exception:
+            return resp.body.decode("latin-1", "ignore")
+
+    async def stream_deployment_log(self, dep_uuid: str, sink: Callable[[bytes], None]) -> None:
+        """Hand the deployment log to ``sink`` chunk by chunk (never held in memory)."""
+        await self.request(
+            "GET",
+            self.api_url(f"deployments/{dep_uuid}/log"),
+            accept="text/plain",
+            timeout=180,
+            sink=sink,
+        )
+
+    async def poll_deployment(
+        self,
+        dep_uuid: str,
+        url_hint: Optional[str],
+        terminal: Iterable[str],
+        label: str,
+        interval_s: float,
+        max_wait_s: float,
+        timeout_message: str,
+        policy: Optional[RetryPolicy] = None,
+        phase: Optional[str] = None,
+        reserve_s: float = 0.0,
+        schedule: Optional[PollSchedule] = None,
+    ) -> dict:
+        """Poll a deployment until its status is in ``terminal``.
+
+        Logs ``<label>=<STATUS> uuid=...`` per poll, repeats collapsed (see
+        ``logger.log_status``). Transient errors are retried
+        per ``policy`` (``<label>=RETRY n/N``); without a policy they propagate.
+        Polls and the final status are counted under ``phase`` (default ``label``).
+        The wait is also capped by the operation deadline minus ``reserve_s``.
+        With ``schedule`` the gaps between polls follow past durations instead
+        of ``interval_s``, and the completion is fed back to it.
+        """
+        done = {s.upper() for s in terminal}
+        phase = phase or label
+        limit_s = operation_deadline().grant(phase, max_wait_s, reserve_s)
+        if limit_s < max_wait_s:
+            timeout_message += f" (deadline: {limit_s:.0f}s de {max_wait_s:.0f}s)"
+        waited = 0.0
+        retries = 0
+        polls = 0
+        started = time.monotonic()
+        status_key = f"{label}:{dep_uuid}"
+        try:
+            while True:
+                count_poll(phase)
+                polls += 1
+                try:
+                    st = await self.get_deployment(dep_uuid, url_hint)
+                except AppianError as exc:
+                    retries += 1
+                    if policy is None or not policy.allows(exc, retries):
+                        raise
+                    log(f"{label}=RETRY {retries}/{policy.attempts} uuid={dep_uuid} ({exc.cause})")
+                else:
+                    retries = 0
+                    status = str(st.get("status", "")).upper()
+                    log_status(status_key, f"{label}={status} uuid={dep_uuid}")
+                    if status in done:
+                        count_final_status(phase, status)
+                        if schedule is not None:
+                            schedule.finish(time.monotonic() - started, status, polls)
+                        return st
+                gap = schedule.next_sleep(time.monotonic() - started) if schedule else interval_s
+                await asyncio.sleep(gap)
+                waited += gap
+                if waited > limit_s:
+                    raise RuntimeError(timeout_message)
+        finally:
+            log_status_done(status_key)
+
+    # --- Applications ----------------------------------------------------
+
+    async def scan_packages(
+        self,
+        app_uuid: str,
+        visit: Callable[[dict], bool],
+        page_size: Optional[int] = None,
+        policy: Optional[RetryPolicy] = None,
+    ) -> Optional[dict]:
+        """Walk the packages of ``app_uuid`` (most recently modified first).
+
+        Returns the first package for which ``visit`` is True, ``None`` once the
+        listing is exhausted. Pages of ``page_size`` (``APPIAN_PACKAGE_PAGE_SIZE``,
+        default 100; ``0``: one request for everything) are requested with
+        ``offset``/``limit`` and parsed while they stream in: after a match the
+        rest of the page is not decoded and no further page is requested. A
+        tenant that rejects the paging parameters (HTTP 400) or ignores
+        ``offset`` (a page with no new package) is read in a single request.
+        """
+        if page_size is None:
+            page_size = int(os.environ.get("APPIAN_PACKAGE_PAGE_SIZE", "100") or 0)
+        base = self.api_url(f"applications/{app_uuid}/packages")
+        seen = set()
+        found: List[dict] = []
+
+        def _visit(item: dict) -> bool:
+            # Reintentos de una página o un tenant que ignora offset repiten packages
+            key = item.get("uuid") or json.dumps(item, sort_keys=True)
+            if key in seen:
+                return False
+            seen.add(key)
+            if visit(item):
+                found.append(item)
+                return True
+            return False
+
+        async def _page(url: str) -> _ItemStream:
+            stream = _ItemStream("packages", _visit)
+            await self.request("GET", url, sink=stream.feed)
+            return stream
+
+        offset = pages = 0
+        while True:
+            url = f"{base}?offset={offset}&limit={page_size}" if page_size else base
+            before = len(seen)
+            try:
+                if policy is not None:
+                    stream = await policy.run(lambda: _page(url), "packages.list")
+                else:
+                    stream = await _page(url)
+            except AppianHTTPError as exc:
+                if not page_size or offset or exc.status != 400:
+                    raise
+                log("packages.paging=UNSUPPORTED (HTTP 400); se pide el listado completo")
+                page_size = 0
+                continue
+            pages += 1
+            if found:
+                break
+            if page_size and stream.items and len(seen) == before:
+                # Repite la primera página: el tenant respeta limit pero ignora offset
+                log("packages.paging=IGNORED (offset); se pide el listado completo")
+                page_size = offset = 0
+                continue
+            total = stream.envelope().get("totalCount")
+            offset += stream.items
+            if (
+                not page_size
+                or stream.items != page_size
+                or (isinstance(total, int) and offset >= total)
+            ):
+                break
+        log(
+            f"packages.scan app={app_uuid} pages={pages} items={len(seen)} "
+            f"match={'yes' if found else 'no'}"
+        )
+        return found[0] if found else None
+
+    # --- Inspections -----------------------------------------------------
+
+    async def start_inspection(self, upload: PreparedUpload) -> dict:
+        body = upload.inspection_body()
+        stall, total = upload_timeouts(len(body), "inspect.post", INSPECTION_POST_FLOOR_S)
+        resp = await self.request(
+            "POST",
+            self.api_url("inspections"),
+            body=body,
+            content_type=body.content_type,
+            timeout=stall,
+            total_timeout=total,
+        )
+        return _decode_json(resp)
+
+    async def get_inspection(self, insp_uuid: str, url_hint: Optional[str] = None) -> dict:
+        url = (url_hint or self.api_url(f"inspections/{insp_uuid}")).rstrip("/")
+        return _decode_json(await self.request("GET", url))
+
+    # --- Downloads -------------------------------------------------------
+
+    async def download(
+        self,
+        url: str,
+        dest: Path,
+        accept: Optional[str] = None,
+        timeout: float = 180,
+        check: Optional[Callable[[Dict[str, str], bytes], bool]] = None,
+    ) -> Optional[Download]:
+        """Stream ``url`` into ``dest`` without buffering it in memory.
+
+        Data lands in ``<dest>.part`` and is renamed only once complete (and
+        accepted by ``check(headers, first_bytes)``); returns ``None`` when
+        ``check`` rejects the payload. Size, SHA-256 and per-chunk digests are
+        computed from the stream itself. Cancellation removes the partial file.
+        """
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        part = dest.with_name(dest.name + ".part")
+        head = bytearray()
+        hasher = StreamHasher()
+        kept = False
+        try:
+            with part.open("wb") as fh:
+
+                def _sink(chunk: bytes) -> None:
+                    if len(head) < 4:
+                        head.extend(chunk[: 4 - len(head)])
+                    hasher.update(chunk)
+                    fh.write(chunk)
+
+                resp = await self.request("GET", url, accept=accept, timeout=timeout, sink=_sink)
+            if check is not None and not check(resp.headers, bytes(head)):
+                return None
+            part.replace(dest)
+            kept = True
+            return Download(
+                dest,
+                hasher.size,
+                hasher.hexdigest(),
+                resp.headers,
+                hasher.chunk_digests(),
+                hasher.chunk_bytes,
+            )
+        finally:
+            if not kept:
+                part.unlink(missing_ok=True)
+
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Typed errors raised by the Appian HTTP helpers."""
+
+import json
+import re
+from typing import Optional
+
+# Códigos de error de Appian, p. ej. APNX-1-4552-005
+_APNX_RE = re.compile(r"APNX-\d+-\d+-\d+")
+
+# Estados HTTP que vale la pena reintentar (el servidor no procesó o está saturado)
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Estados que indican que el tenant no está respondiendo (cuentan para el circuit breaker)
+UNAVAILABLE_STATUSES = frozenset({502, 503, 504})
+
+# Estados tras los cuales no sabemos si el servidor alcanzó a procesar el request
+AMBIGUOUS_STATUSES = frozenset({500, 502, 504})
+
+
+def _extract_appian_code(body: str) -> Optional[str]:
+    """Return the APNX code carried by an Appian error body, if any."""
+    try:
+        data = json.loads(body)
+    except Exception:
+        data = None
+    if isinstance(data, dict):
+        for key in ("title", "errorCode", "code", "error"):
+            value = data.get(key)
+            if isinstance(value, str):
+                m = _APNX_RE.search(value)
+                if m:
+                    return m.group(0)
+    m = _APNX_RE.search(body or "")
+    return m.group(0) if m else None
+
+
+class AppianError(RuntimeError):
+    """Base error for Appian API calls.
+
+    Subclasses ``RuntimeError`` so callers that only know the legacy contract keep
+    working; new code should branch on ``status``, ``code`` and ``retryable``.
+    """
+
+    cause = "error"
+
+    def __init__(
+        self,
+        message: str,
+        url: str = "",
+        status: Optional[int] = None,
+        code: Optional[str] = None,
+        retryable: bool = False,
+        ambiguous: bool = False,
+    ) -> None:
+        super().__init__(message)
+        self.url = url
+        self.status = status
+        self.code = code
+        self.retryable = retryable
+        # True cuando un POST pudo haberse aplicado aunque no recibimos respuesta válida
+        self.ambiguous = ambiguous
+
+    @property
+    def summary(self) -> str:
+        """First line of the message, handy for one-line logs."""
+        text = str(self)
+        return text.splitlines()[0] if text else self.cause
+
+
+class AppianHTTPError(AppianError):
+    """The server answered with an HTTP error status."""
+
+    cause = "http"
+
+    def __init__(self, url: str, status: int, body: str = "") -> None:
+        code = _extract_appian_code(body)
+        super().__init__(
+            f"HTTP {status} on {url}: {body}",
+            url=url,
+            status=status,
+            code=code,
+            retryable=status in RETRYABLE_STATUSES,
+            ambiguous=status in AMBIGUOUS_STATUSES,
+        )
+        self.body = body
+        if status == 429:
+            self.cause = "throttled"
+        elif status >= 500:
+            self.cause = f"http_{status}"
+
+    @property
+    def unavailable(self) -> bool:
+        """True when the status suggests the tenant itself is down."""
+        if self.status in UNAVAILABLE_STATUSES:
+            return True
+        # Un 500 sin código APNX suele ser del balanceador, no de la aplicación
+        return self.status == 500 and not self.code
+
+
+class AppianNetworkError(AppianError):
+    """The request never got an HTTP answer (DNS, TLS, reset, timeout)."""
+
+    cause = "network"
+
+    def __init__(
+        self,
+        url: str,
+        reason: object,
+        timeout: bool = False,
+        sent: bool = True,
+    ) -> None:
+        # sent=False cuando la conexión nunca se estableció (DNS, connection refused)
+        super().__init__(
+            f"Network error on {url}: {reason}",
+            url=url,
+            retryable=True,
+            ambiguous=sent,
+        )
+        self.reason = reason
+        self.timeout = timeout
+        if timeout:
+            self.cause = "timeout"
+
+
+class CircuitOpenError(AppianError):
+    """Calls to a host are short-circuited after repeated failures."""
+
+    cause = "circuit_open"
+
+    def __init__(self, host: str, retry_in_s: float) -> None:
+        super().__init__(
+            f"Circuit abierto para {host}: demasiadas fallas consecutivas; "
+            f"próximo intento en {retry_in_s:.0f}s",
+            url=host,
+            retryable=False,
+        )
+        self.host = host
+        self.retry_in_s = retry_in_s
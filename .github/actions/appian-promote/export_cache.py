@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Skip re-exporting a resource that has not changed since the last export.
+
+Keyed on (environment, resource, ``lastModified`` reported by Appian), each
+entry keeps the CLI result of a successful export with the SHA-256 of every
+file it downloaded; the bytes themselves live in the artifact store. On a hit
+the files are materialized from the store and the previous result (hence the
+same manifest) is returned without asking Appian for a new export. An entry
+whose objects were evicted from the store counts as a miss.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from artifact_store import ArtifactStore
+from engine import AppianEngine
+from utils import log
+
+CACHE_VERSION = 1
+# Appian ha usado distintos nombres para la fecha de modificación del package
+_MODIFIED_KEYS = ("lastModified", "lastModifiedTimestamp", "lastModifiedDate", "modifiedTimestamp")
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip()) or "_"
+
+
+def _rebase(value: Any, mapping: Dict[str, str]) -> Any:
+    """Rewrite every path (string or dict key) that starts with a ``mapping`` key."""
+    if isinstance(value, str):
+        for old, new in mapping.items():
+            if value == old or value.startswith(old + os.sep):
+                return new + value[len(old):]
+        return value
+    if isinstance(value, list):
+        return [_rebase(item, mapping) for item in value]
+    if isinstance(value, dict):
+        return {_rebase(k, mapping): _rebase(v, mapping) for k, v in value.items()}
+    return value
+
+
+async def package_last_modified(
+    engine: AppianEngine,
+    app_uuid: str,
+    package_uuid: str,
+) -> Optional[str]:
+    """``lastModified`` of ``package_uuid`` from the application's package listing."""
+    item = await engine.scan_packages(app_uuid, lambda p: p.get("uuid") == package_uuid)
+    for key in _MODIFIED_KEYS:
+        if item and item.get(key):
+            return str(item[key])
+    return None
+
+
+class ExportCache:
+    """Export results per resource and ``lastModified``, backed by the artifact store."""
+
+    def __init__(self, store: ArtifactStore, base_url: str) -> None:
+        self.store = store
+        self.env = urlsplit(base_url).netloc or base_url
+        self.dir = store.root / "exports"
+
+    def _path(self, kind: str, resource_id: str) -> Path:
+        return self.dir / f"{_slug(self.env)}__{_slug(kind)}-{_slug(resource_id)}.json"
+
+    def lookup(self, kind: str, resource_id: str, last_modified: str) -> Optional[dict]:
+        """Return the cached entry if it matches ``last_modified`` and its objects exist."""
+        path = self._path(kind, resource_id)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("lastModified") != last_modified:
+            if isinstance(entry, dict):
+                log(
+                    f"export.cache=STALE lastModified={last_modified} "
+                    f"(cache={entry.get('lastModified')})"
+                )
+            return None
+        missing = [sha for sha in entry["objects"].values() if self.store.get(sha) is None]
+        if missing:
+            log(f"export.cache=EVICTED {len(missing)} objetos ya no están en el store")
+            return None
+        return entry
+
+    def materialize(self, entry: dict, out_path: Path) -> Dict[str, Any]:
+        """Link the cached files under ``out_path``'s directory and return the result."""
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        mapping = {
+            entry["package_path"]: str(out_path.resolve()),
+            entry["artifact_dir"]: str(out_path.resolve().parent),
+        }
+        for old_path, sha in entry["objects"].items():
+            self.store.materialize(sha, Path(_rebase(old_path, mapping)))
+        result = _rebase(entry["result"], mapping)
+        result["export_cache"] = {
+            "status": "HIT",
+            "lastModified": entry["lastModified"],
+            "exportedAt": entry.get("exportedAt"),
+        }
+        return result
+
+    def record(
+        self,
+        kind: str,
+        resource_id: str,
+        last_modified: str,
+        result: Dict[str, Any],
+    ) -> None:
+        """Remember ``result`` (its files must already be in the store)."""
+        entry = {
+            "version": CACHE_VERSION,
+            "env": self.env,
+            "kind": kind,
+            "resourceId": resource_id,
+            "lastModified": last_modified,
+            "exportedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "package_path": result["package_path"],
+            "artifact_dir": result["artifact_dir"],
+            "objects": {path: meta["sha256"] for path, meta in result["files"].items()},
+            "result": result,
+        }
+        path = self._path(kind, resource_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".export-", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        log(f"export.cache=RECORDED lastModified={last_modified} path={path}")
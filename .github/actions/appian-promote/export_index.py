@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Per-export namespaces under one ``--outdir`` and the index that lists them.
+
+Each export writes its package and side artifacts (``db-scripts/``,
+``plugins/``, ``customization/``, manifest and raw response) into its own
+directory ``<outdir>/<namespace>/`` (default ``<kind>-<rid>-<name>``), so
+several exports can run concurrently into the same outdir. Every one of them
+records itself in ``<outdir>/exports-index.json``, updated under ``flock``;
+paths in the index are relative to the outdir, so it stays valid after the
+directory is uploaded and downloaded elsewhere::
+
+    {"version": 1, "exports": {"package-<uuid>-orders": {
+        "state": "COMPLETED", "package": "package-<uuid>-orders/....zip",
+        "artifactDir": "package-<uuid>-orders", "files": [...], ...}}}
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+INDEX_NAME = "exports-index.json"
+INDEX_VERSION = 1
+
+
+def safe_namespace(raw: str) -> str:
+    """``raw`` as a single directory name (no separators, no leading dots)."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", raw.strip()).strip("._") or "export"
+    return slug[:120]
+
+
+def namespace_for(kind: str, resource_id: str, name: str = "") -> str:
+    """Default namespace of one export: ``<kind>-<rid>-<name>``."""
+    return safe_namespace(f"{kind}-{resource_id}-{name or resource_id}")
+
+
+class ExportIndex:
+    """``exports-index.json`` at the root of an outdir."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+        self.path = self.root / INDEX_NAME
+        self._lock_path = self.root / f".{INDEX_NAME}.lock"
+
+    def _read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) and data.get("version") == INDEX_VERSION else {}
+
+    def exports(self) -> Dict[str, dict]:
+        return dict(self._read().get("exports") or {})
+
+    def get(self, namespace: str) -> Optional[dict]:
+        return self.exports().get(namespace)
+
+    def relative(self, path: Any) -> str:
+        """``path`` relative to the outdir (absolute if it lives elsewhere)."""
+        if not path:
+            return ""
+        resolved = Path(str(path)).resolve()
+        try:
+            return str(resolved.relative_to(self.root))
+        except ValueError:
+            return str(resolved)
+
+    def _update(self, mutate: Callable[[dict], None]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock_path.open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            data = self._read() or {"version": INDEX_VERSION}
+            mutate(data)
+            fd, tmp = tempfile.mkstemp(prefix=".exports-index-", dir=str(self.root))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump(data, fh, ensure_ascii=False, indent=2, sort_keys=True)
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+
+    def update(self, namespace: str, replace: bool = False, **fields: Any) -> None:
+        """Merge ``fields`` into the entry of ``namespace`` (``replace``: start anew)."""
+
+        def _merge(data: dict) -> None:
+            exports = data.setdefault("exports", {})
+            entry = {} if replace else exports.get(namespace) or {}
+            entry.update(fields)
+            entry["updatedAt"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            exports[namespace] = entry
+
+        self._update(_merge)
+
+    def record_result(self, namespace: str, result: Dict[str, Any]) -> None:
+        """Record a finished export from the result of ``export_resource``."""
+        self.update(
+            namespace,
+            state="COMPLETED",
+            artifactDir=self.relative(result.get("artifact_dir")),
+            package=self.relative(result.get("package_path")),
+            deploymentUuid=result.get("deployment_uuid", ""),
+            deploymentStatus=result.get("deployment_status", ""),
+            files=sorted(self.relative(p) for p in result.get("downloaded_files") or []),
+            exportCache=(result.get("export_cache") or {}).get("status", ""),
+        )
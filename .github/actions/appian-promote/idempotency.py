@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Idempotent submission of Appian deployments (export/import).
+
+Each submission carries a client-generated marker in its description. When a
+POST fails ambiguously (timeout, reset, 500/502/504) the first attempt may have
+created the deployment anyway, so before re-sending we look for a deployment
+carrying the marker and attach to it instead of queueing a duplicate.
+"""
+
+import asyncio
+import uuid as _uuid
+from typing import Awaitable, Callable, List, Optional
+
+from errors import AppianError
+from retry import RetryPolicy
+from utils import log
+
+MARKER_TAG = "cicd-id"
+
+
+def new_marker() -> str:
+    """Return a fresh idempotency marker."""
+    return f"{MARKER_TAG}-{_uuid.uuid4().hex[:16]}"
+
+
+def tag_description(description: Optional[str], marker: str) -> str:
+    """Append ``[marker]`` to a deployment description."""
+    tag = f"[{marker}]"
+    text = (description or "").strip()
+    if tag in text:
+        return text
+    return f"{text} {tag}".strip()
+
+
+def _deployment_items(data: object) -> List[dict]:
+    if isinstance(data, list):
+        items = data
+    elif isinstance(data, dict):
+        items = []
+        for key in ("deployments", "data", "results", "items"):
+            value = data.get(key)
+            if isinstance(value, list):
+                items = value
+                break
+    else:
+        items = []
+    return [item for item in items if isinstance(item, dict)]
+
+
+async def submit_idempotent(
+    submit: Callable[[], Awaitable[dict]],
+    lookup: Callable[[], Awaitable[Optional[dict]]],
+    policy: RetryPolicy,
+    label: str,
+) -> dict:
+    """Run ``submit`` retrying per ``policy``, reconciling ambiguous failures.
+
+    After an ambiguous failure we wait the retry delay (the server may still be
+    registering the first attempt), then call ``lookup``; a match is returned as
+    if the POST had answered. Only when nothing is found do we submit again.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await submit()
+        except AppianError as exc:
+            attempt += 1
+            allowed = policy.allows(exc, attempt)
+            if not exc.ambiguous:
+                if not allowed:
+                    raise
+                log(f"{label}=RETRY {attempt}/{policy.attempts} ({exc.cause}: {exc.summary})")
+                await asyncio.sleep(policy.delay_for(attempt))
+                continue
+            log(f"{label}=AMBIGUOUS ({exc.cause}: {exc.summary}); buscando deployment existente")
+            if allowed:
+                await asyncio.sleep(policy.delay_for(attempt))
+            try:
+                existing = await lookup()
+            except AppianError as lookup_exc:
+                log(f"{label}.lookup=ERROR ({lookup_exc.cause}: {lookup_exc.summary})")
+                existing = None
+            if existing:
+                log(f"{label}=ATTACHED uuid={existing.get('uuid')}")
+                return existing
+            if not allowed:
+                raise
+            log(f"{label}=RETRY {attempt}/{policy.attempts} (sin deployment previo)")
@@ -5,229 +5,218 @@ import argparse
 import json
 import os
 import sys
-import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 # Soportar ejecución directa del script
 if __package__ is None:  # pragma: no cover
     sys.path.append(os.path.dirname(__file__))
-from utils import log, _http
-try:  # prefer relative when running as a package
-    from .utils import _multipart_form  # type: ignore
-except Exception:  # fallback when running as loose scripts
-    from utils import _multipart_form
+from async_http import run_sync
+from checkpoint import Checkpoint, check_artifacts, reattach
+from deadline import operation_deadline
+from deploy_log import DeploymentLogParser
+from deploy_queue import DeploymentQueue
+from engine import AppianEngine
+from idempotency import new_marker
+from metrics import timed_operation
+from poll_schedule import poll_schedule_for
+from retry import RetryPolicy
+from upload import DbScriptSpec, PreparedUpload
+from utils import log
+from profiling import run_main
 
+TERMINAL_STATUSES = (
+    "COMPLETED",
+    "COMPLETED_WITH_ERRORS",
+    "COMPLETED_WITH_IMPORT_ERRORS",
+    "COMPLETED_WITH_PUBLISH_ERRORS",
+    "FAILED",
+    "PENDING_REVIEW",
+    "REJECTED",
+)
 
-DbScriptSpec = Tuple[Path, str, Optional[int]]
+# Fallas listadas en el log del job; el resto queda solo en el JSON
+FAILURES_LOGGED = 20
 
 
-def _post_import(
-    base_url: str,
-    api_key: str,
+def _retry_policy() -> RetryPolicy:
+    return RetryPolicy.from_env(
+        "APPIAN_PROMOTE_IMPORT_RETRIES",
+        3,
+        "APPIAN_PROMOTE_RETRY_DELAY",
+        10,
+    )
+
+
+async def _post_import(
+    engine: AppianEngine,
     name: str,
     description: str,
-    package_path: Path,
-    customization_path: Optional[Path] = None,
-    admin_settings_path: Optional[Path] = None,
-    plugins_zip: Optional[Path] = None,
+    upload: PreparedUpload,
     data_source: Optional[str] = None,
-    db_scripts: Optional[List[DbScriptSpec]] = None,
+    marker: Optional[str] = None,
 ) -> dict:
-    url = f"{base_url.rstrip('/')}/suite/deployment-management/v2/deployments"
-    json_obj: dict = {
-        "name": name,
-        "description": description,
-        "packageFileName": package_path.name,
-    }
-    # multipart form-data con campos alineados al JSON
-    files: dict = {"packageFileName": package_path}
-    if customization_path:
-        json_obj["customizationFileName"] = customization_path.name
-        files["customizationFileName"] = customization_path
-    if admin_settings_path:
-        json_obj["adminConsoleSettingsFileName"] = admin_settings_path.name
-        files["adminConsoleSettingsFileName"] = admin_settings_path
-    if plugins_zip:
-        json_obj["pluginsFileName"] = plugins_zip.name
-        files["pluginsFileName"] = plugins_zip
-    if data_source:
-        json_obj["dataSource"] = data_source
-    if db_scripts:
-        payload_scripts = []
-        for idx, (script_path, script_name, order_id) in enumerate(db_scripts, start=1):
-            fname = script_name or script_path.name
-            order_value = order_id if order_id is not None else idx
-            payload_scripts.append({"fileName": fname, "orderId": str(order_value)})
-            files[f"databaseScript{idx}"] = (script_path, fname)
-        if payload_scripts:
-            json_obj["databaseScripts"] = payload_scripts
-            ds_label = data_source or "(ninguno)"
-            log(
-                "Payload incluye "
-                f"{len(payload_scripts)} database scripts; dataSource={ds_label}"
-            )
+    if upload.db_scripts:
+        ds_label = data_source or "(ninguno)"
+        log(
+            "Payload incluye "
+            f"{len(upload.db_scripts)} database scripts; dataSource={ds_label}"
+        )
+    # Marcador de idempotencia: permite reconciliar reintentos ambiguos del POST;
+    # el cuerpo multipart se re-emite desde disco en cada retry
+    return await engine.start_import(
+        upload,
+        name,
+        description,
+        _retry_policy(),
+        data_source=data_source,
+        marker=marker or new_marker(),
+    )
 
-    body, ctype = _multipart_form(json_obj, files)
-    headers = {
-        "appian-api-key": api_key,
-        "Action-Type": "import",
-        "Content-Type": ctype,
-        "Accept": "application/json",
-    }
-    retries = int(os.environ.get("APPIAN_PROMOTE_IMPORT_RETRIES", "3"))
-    delay_s = int(os.environ.get("APPIAN_PROMOTE_RETRY_DELAY", "10"))
-    attempt = 0
-    while True:
-        attempt += 1
-        try:
-            raw, _ = _http("POST", url, headers, data=body, timeout=300)
-            return json.loads(raw.decode("utf-8"))
-        except RuntimeError as e:
-            msg = str(e)
-            transient = (
-                "HTTP 500" in msg or
-                "Network error" in msg or
-                "handshake" in msg or
-                "timed out" in msg
-            )
-            if attempt <= retries and transient:
-                log(f"deploy.post=RETRY {attempt}/{retries} (transitorio: {msg.splitlines()[0]})")
-                time.sleep(delay_s)
-                continue
-            raise
 
+async def _submit_and_wait(
+    engine: AppianEngine,
+    upload: PreparedUpload,
+    name: str,
+    description: str,
+    data_source: Optional[str],
+    checkpoint: Optional[Checkpoint],
+    resume: bool,
+) -> Tuple[str, dict]:
+    """Submit (or reattach to) the import and poll it until a terminal status."""
+    max_wait_s = int(os.environ.get("APPIAN_PROMOTE_MAX_WAIT", "1800"))
+    interval_s = int(os.environ.get("APPIAN_PROMOTE_POLL_INTERVAL", "5"))
+
+    marker = new_marker()
+    artifacts = {att.filename: att.sha256 for att in upload.attachments}
+    dep: Optional[dict] = None
+    saved = checkpoint.resumable(resume) if checkpoint is not None else None
+    if saved is not None:
+        check_artifacts(saved, artifacts)
+        dep = await reattach(engine, saved)
+        # Si el POST nunca llegó se re-envía con el mismo marcador
+        marker = saved.get("marker") or marker
+    if dep is None:
+        log(
+            "Iniciando import del paquete… "
+            f"(marker={marker}, sha256={upload.package.sha256})"
+        )
+        if checkpoint is not None:
+            checkpoint.save(state="SUBMITTING", marker=marker, artifacts=artifacts, name=name)
+        dep = await _post_import(engine, name, description, upload, data_source, marker)
+        if checkpoint is not None and dep.get("uuid"):
+            checkpoint.save(state="SUBMITTED", uuid=dep.get("uuid"), url=dep.get("url"))
+    dep_uuid = dep.get("uuid")
+    dep_url = dep.get("url")
+    if not dep_uuid:
+        raise RuntimeError(f"Respuesta inesperada al iniciar import: {dep}")
 
-def _get_deployment(
-    base_url: str,
-    api_key: str,
-    dep_uuid: str,
-    url_hint: Optional[str] = None,
-) -> dict:
-    url = url_hint or (
-        f"{base_url.rstrip('/')}/suite/deployment-management/v2/deployments/{dep_uuid}"
+    final = await engine.poll_deployment(
+        dep_uuid,
+        dep_url,
+        TERMINAL_STATUSES,
+        "deploy.status",
+        interval_s,
+        max_wait_s,
+        "Timeout esperando import en Appian",
+        policy=_retry_policy(),
+        phase="import",
+        schedule=poll_schedule_for(
+            engine.base_url,
+            "import",
+            interval_s,
+            size=sum(att.size for att in upload.attachments),
+            # Reenganchado a mitad de camino: su duración no es representativa
+            learn=saved is None,
+        ),
     )
-    headers = {"appian-api-key": api_key, "Accept": "application/json"}
-    raw, _ = _http("GET", url, headers, timeout=60)
-    return json.loads(raw.decode("utf-8"))
+    if checkpoint is not None:
+        # Estado terminal: un re-run ya no tiene a qué reengancharse
+        checkpoint.clear()
+    return dep_uuid, final
 
 
-def _get_deployment_log(base_url: str, api_key: str, dep_uuid: str) -> str:
-    url = f"{base_url.rstrip('/')}/suite/deployment-management/v2/deployments/{dep_uuid}/log"
-    headers = {"appian-api-key": api_key, "Accept": "text/plain"}
-    raw, _ = _http("GET", url, headers, timeout=180)
-    try:
-        return raw.decode("utf-8")
-    except Exception:
-        return raw.decode("latin-1", "ignore")
+def _report_log(report: Dict[str, object], log_json: Optional[Path]) -> None:
+    counts = report["counts"]
+    log(
+        f"deploy.log=PARSED lines={report['lines']} imported={counts['imported']} "
+        f"failed={counts['failed']} skipped={counts['skipped']} "
+        f"matches_summary={report.get('matchesSummary', '-')}"
+    )
+    for mismatch in report.get("mismatches") or []:
+        log(f"deploy.log=MISMATCH {mismatch}")
+    failures = report["failures"]
+    for failure in failures[:FAILURES_LOGGED]:
+        log(
+            f"deploy.log.failed uuid={failure['uuid']} type={failure['type'] or '-'} "
+            f"name={failure['name'] or '-'} code={failure['code'] or '-'}"
+        )
+    if len(failures) > FAILURES_LOGGED:
+        log(f"deploy.log.failed … {len(failures) - FAILURES_LOGGED} más en el JSON")
+    if log_json is not None:
+        log_json.parent.mkdir(parents=True, exist_ok=True)
+        log_json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        log(f"deploy.log=WRITTEN path={log_json}")
 
 
-def import_package(
-    base_url: str,
-    api_key: str,
-    package_path: Path,
-    customization_path: Optional[Path] = None,
-    admin_settings_path: Optional[Path] = None,
-    plugins_zip: Optional[Path] = None,
-    data_source: Optional[str] = None,
-    db_scripts: Optional[List[DbScriptSpec]] = None,
-    name: Optional[str] = None,
+@timed_operation("import")
+async def import_package_async(
+    engine: AppianEngine,
+    upload: PreparedUpload,
+    name: str,
     description: str = "",
+    data_source: Optional[str] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    resume: bool = False,
+    queue: Optional[DeploymentQueue] = None,
+    log_json: Optional[Path] = None,
 ) -> Dict[str, object]:
-    if not package_path.exists():
-        raise FileNotFoundError(f"No existe el paquete: {package_path}")
-
-    try:
-        size = package_path.stat().st_size
-        head = package_path.read_bytes()[:4]
-        if size < 1024 or not (len(head) >= 2 and head[:2] == b"PK"):
-            raise RuntimeError(
-                f"El artifact no es un ZIP válido para Appian (size={size}B, magic={head!r})."
-            )
-    except Exception as e:
-        if isinstance(e, RuntimeError):
-            raise
-        raise RuntimeError(f"No se pudo validar el ZIP del paquete: {e}")
-    if customization_path and not customization_path.exists():
-        raise FileNotFoundError(f"No existe customization file: {customization_path}")
-    if admin_settings_path and not admin_settings_path.exists():
-        raise FileNotFoundError(f"No existe admin console settings: {admin_settings_path}")
-    if plugins_zip and not plugins_zip.exists():
-        raise FileNotFoundError(f"No existe plugins zip: {plugins_zip}")
-    if db_scripts:
-        for script_path, _, _ in db_scripts:
-            if not script_path.exists():
-                raise FileNotFoundError(f"No existe database script: {script_path}")
+    """Submit ``upload`` as an import, wait for it and summarize the outcome.
 
-    max_wait_s = int(os.environ.get("APPIAN_PROMOTE_MAX_WAIT", "1800"))
-    interval_s = int(os.environ.get("APPIAN_PROMOTE_POLL_INTERVAL", "5"))
-
-    dep_name = name or f"Import {package_path.name}"
-    dep_desc = description
-    log("Iniciando import del paquete…")
-    dep = _post_import(
-        base_url,
-        api_key,
-        dep_name,
-        dep_desc,
-        package_path,
-        customization_path,
-        admin_settings_path,
-        plugins_zip,
-        data_source,
-        db_scripts,
-    )
-    dep_uuid = dep.get("uuid")
-    dep_url = dep.get("url")
-    if not dep_uuid:
-        raise RuntimeError(f"Respuesta inesperada al iniciar import: {dep}")
+    With ``checkpoint`` the submission is recorded so that ``resume`` can
+    reattach to it after a crash instead of importing again. With ``queue``
+    the import is submitted only once the target environment's slot is ours,
+    and the slot is held until Appian reports a terminal status. When the
+    import does not complete cleanly the deployment log is parsed into
+    per-object failures, written to ``log_json`` if given.
+    """
+    if queue is None:
+        dep_uuid, final = await _submit_and_wait(
+            engine, upload, name, description, data_source, checkpoint, resume
+        )
+    else:
+        async with queue.slot(name):
+            dep_uuid, final = await _submit_and_wait(
+                engine, upload, name, description, data_source, checkpoint, resume
+            )
 
-    waited = 0
-    final = None
-    while True:
-        st = _get_deployment(base_url, api_key, dep_uuid, dep_url)
-        status = str(st.get("status", "")).upper()
-        log(f"deploy.status={status} uuid={dep_uuid}")
-        if status in (
-            "COMPLETED",
-            "COMPLETED_WITH_ERRORS",
-            "COMPLETED_WITH_IMPORT_ERRORS",
-            "COMPLETED_WITH_PUBLISH_ERRORS",
-            "FAILED",
-            "PENDING_REVIEW",
-            "REJECTED",
-        ):
-            final = st
-            break
-        time.sleep(interval_s)
-        waited += interval_s
-        if waited > max_wait_s:
-            raise RuntimeError("Timeout esperando import en Appian")
-
-    final_status = str(final.get("status", "")).upper() if final else ""
+    final_status = str(final.get("status", "")).upper()
     summary = final.get("summary") or {}
     log_url = summary.get("deploymentLogUrl") or final.get("deploymentLogUrl")
 
     log_was_printed = False
 
-    def _print_log():
+    async def _print_log():
         nonlocal log_was_printed
         if log_was_printed:
             return
         try:
             if log_url:
+                # Una sola pasada: el parser cuenta por objeto y retiene solo fallas y la cola
+                parser = DeploymentLogParser()
+                await engine.stream_deployment_log(dep_uuid, parser.feed)
+                parser.close()
                 log("--- Deployment log (tail) ---")
-                txt = _get_deployment_log(base_url, api_key, dep_uuid)
-                lines = txt.splitlines()
-                for ln in lines[-200:]:
+                for ln in parser.tail:
                     log(ln)
                 log("--- Fin deployment log ---")
                 log_was_printed = True
+                _report_log(parser.report(summary.get("objects")), log_json)
         except Exception as e:
             log(f"No se pudo obtener deployment log: {e}")
 
     if final_status != "COMPLETED":
-        _print_log()
+        await _print_log()
 
     bad_statuses = {"FAILED", "REJECTED"}
     error_statuses = {
@@ -237,10 +226,10 @@ def import_package(
     }
 
     if final_status in bad_statuses:
-        _print_log()
+        await _print_log()
         raise RuntimeError(f"Import FAILED: status={final_status}")
     if final_status in error_statuses:
-        _print_log()
+        await _print_log()
         raise RuntimeError(f"Import completado con errores: status={final_status}")
 
     objs = (summary.get("objects") or {})
@@ -250,7 +239,50 @@ def import_package(
         f"failed={objs.get('failed')} "
         f"skipped={objs.get('skipped')}"
     )
-    return {"status": final_status, "uuid": dep_uuid or "", "deployment": final or {}}
+    operation_deadline().report("import")
+    return {"status": final_status, "uuid": dep_uuid or "", "deployment": final}
+
+
+def import_package(
+    base_url: str,
+    api_key: str,
+    package_path: Path,
+    customization_path: Optional[Path] = None,
+    admin_settings_path: Optional[Path] = None,
+    plugins_zip: Optional[Path] = None,
+    data_source: Optional[str] = None,
+    db_scripts: Optional[List[DbScriptSpec]] = None,
+    name: Optional[str] = None,
+    description: str = "",
+    upload: Optional[PreparedUpload] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    resume: bool = False,
+    queue: Optional[DeploymentQueue] = None,
+    log_json: Optional[Path] = None,
+) -> Dict[str, object]:
+    # Validación, hash y tamaño se calculan una sola vez (reutilizable desde la inspección)
+    if upload is None:
+        upload = PreparedUpload(
+            package_path,
+            customization_path,
+            admin_settings_path,
+            plugins_zip,
+            db_scripts,
+        )
+
+    return run_sync(
+        import_package_async(
+            AppianEngine(base_url, api_key),
+            upload,
+            name or f"Import {package_path.name}",
+            description,
+            data_source,
+            checkpoint,
+            resume,
+            queue,
+            log_json,
+        )
+    )
 
 
 def main():
@@ -287,4 +319,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "import")
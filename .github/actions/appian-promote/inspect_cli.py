@@ -2,161 +2,129 @@
 """CLI helper that performs Appian package inspections."""
 
 import argparse
-import json
+import asyncio
 import os
 import sys
-import time
 from pathlib import Path
 from typing import Optional
 
 # Soportar ejecución directa del script
 if __package__ is None:  # pragma: no cover
     sys.path.append(os.path.dirname(__file__))
-from utils import log, _http, _multipart_form
-
-
-def _post_inspection(
-    base_url: str,
-    api_key: str,
-    package_path: Path,
-    customization_path: Optional[Path] = None,
-    admin_settings_path: Optional[Path] = None,
-) -> dict:
-    url = f"{base_url.rstrip('/')}/suite/deployment-management/v2/inspections"
-    json_obj = {"packageFileName": package_path.name}
-    files = {"packageFileName": package_path}
-    if customization_path:
-        json_obj["customizationFileName"] = customization_path.name
-        files["customizationFileName"] = customization_path
-    if admin_settings_path:
-        json_obj["adminConsoleSettingsFileName"] = admin_settings_path.name
-        files["adminConsoleSettingsFileName"] = admin_settings_path
-
-    try:
-        package_size = package_path.stat().st_size
-        log_parts = [
-            f"/inspections: package={package_path.name} size={package_size}B",
-        ]
-        if customization_path:
-            log_parts.append(f"icf={customization_path.name}")
-        if admin_settings_path:
-            log_parts.append(f"admin={admin_settings_path.name}")
-        log(", ".join(log_parts))
-    except Exception:
-        pass
-
-    body, ctype = _multipart_form(json_obj, files)
-    headers = {
-        "appian-api-key": api_key,
-        "Content-Type": ctype,
-        "Accept": "application/json",
-    }
-    raw, _ = _http("POST", url, headers, data=body, timeout=600)
-    return json.loads(raw.decode("utf-8"))
-
-
-def _get_inspection(
-    base_url: str,
-    api_key: str,
-    insp_uuid: str,
-    url_hint: Optional[str] = None,
+from async_http import run_sync
+from deadline import operation_deadline
+from engine import AppianEngine
+from errors import AppianHTTPError, AppianNetworkError
+from logger import log_status, log_status_done
+from metrics import count_final_status, count_poll, timed_operation
+from retry import RetryPolicy
+from upload import PreparedUpload
+from utils import log
+from profiling import run_main
+
+
+async def _post_inspection(engine: AppianEngine, upload: PreparedUpload) -> dict:
+    log_parts = [
+        f"/inspections: package={upload.package.filename} size={upload.package.size}B "
+        f"sha256={upload.package.sha256}",
+    ]
+    if upload.customization:
+        log_parts.append(f"icf={upload.customization.filename}")
+    if upload.admin_settings:
+        log_parts.append(f"admin={upload.admin_settings.filename}")
+    log(", ".join(log_parts))
+    return await engine.start_inspection(upload)
+
+
+@timed_operation("inspect")
+async def inspect_package_async(
+    engine: AppianEngine,
+    upload: PreparedUpload,
+    reserve_s: float = 0.0,
 ) -> dict:
-    url = (
-        url_hint
-        or f"{base_url.rstrip('/')}/suite/deployment-management/v2/inspections/{insp_uuid}"
-    ).rstrip("/")
-    headers = {"appian-api-key": api_key, "Accept": "application/json"}
-    raw, _ = _http("GET", url, headers, timeout=60)
-    return json.loads(raw.decode("utf-8"))
-
-
-def inspect_package(
-    base_url: str,
-    api_key: str,
-    package_path: Path,
-    customization_path: Optional[Path] = None,
-    admin_settings_path: Optional[Path] = None,
-) -> None:
-    if not package_path.exists():
-        raise FileNotFoundError(f"No existe el paquete: {package_path}")
-    # Validación básica
-    size = package_path.stat().st_size
-    head = package_path.read_bytes()[:4]
-    if size < 1024 or not (len(head) >= 2 and head[:2] == b"PK"):
-        msg = f"El artifact no es un ZIP válido para Appian (size={size}B, magic={head!r})."
-        raise RuntimeError(msg)
+    """Run an inspection of ``upload`` and return the final inspection payload.
 
+    ``reserve_s`` is kept out of the polling budget for the phases that follow
+    (e.g. the import in ``promote``) when ``APPIAN_DEADLINE`` is set.
+    """
     max_wait_s = int(os.environ.get("APPIAN_PROMOTE_MAX_WAIT", "1800"))
     interval_s = int(os.environ.get("APPIAN_PROMOTE_POLL_INTERVAL", "5"))
-    max_err_retries = int(os.environ.get("APPIAN_PROMOTE_INSPECTION_RETRIES", "5"))
 
     log("Iniciando inspección del paquete…")
-    insp = _post_inspection(
-        base_url,
-        api_key,
-        package_path,
-        customization_path,
-        admin_settings_path,
-    )
+    insp = await _post_inspection(engine, upload)
     insp_uuid = insp.get("uuid")
     insp_url = insp.get("url")
     if not insp_uuid:
         raise RuntimeError(f"Respuesta inesperada de inspección: {insp}")
-
+    max_wait_s = operation_deadline().grant("inspect", max_wait_s, reserve_s)
+
+    # Reintentos de errores transitorios: acotados por inspección y por el budget global
+    policy = RetryPolicy.from_env(
+        "APPIAN_PROMOTE_INSPECTION_RETRIES",
+        5,
+        "APPIAN_PROMOTE_POLL_INTERVAL",
+        interval_s,
+    )
     waited = 0
     retries_500 = 0
     retries_net = 0
-    while True:
-        try:
-            res = _get_inspection(base_url, api_key, insp_uuid, insp_url)
-        except RuntimeError as e:
-            msg = str(e)
-            if "HTTP 404" in msg:
-                log(
-                    f"inspect.status=PENDING uuid={insp_uuid} "
-                    "(404: no registrada aún; reintentando)"
-                )
-                time.sleep(interval_s)
-                waited += interval_s
-                if waited > max_wait_s:
-                    raise RuntimeError("Timeout esperando inspección de Appian (404 persistente)")
-                continue
-            # Appian a veces responde 500 APNX-1-4552-005 cuando la inspección terminó
-            # pero los datos aún no están listos. Reintentamos como si fuera PENDING.
-            if "HTTP 500" in msg and ("APNX-1-4552-005" in msg or "/inspections/" in msg):
+    status_key = f"inspect:{insp_uuid}"
+    try:
+        while True:
+            count_poll("inspect")
+            try:
+                res = await engine.get_inspection(insp_uuid, insp_url)
+            except AppianHTTPError as e:
+                if e.status == 404:
+                    log_status(
+                        status_key,
+                        f"inspect.status=PENDING uuid={insp_uuid} "
+                        "(404: no registrada aún; reintentando)",
+                    )
+                    await asyncio.sleep(interval_s)
+                    waited += interval_s
+                    if waited > max_wait_s:
+                        raise RuntimeError(
+                            "Timeout esperando inspección de Appian (404 persistente)"
+                        )
+                    continue
+                # Appian a veces responde 500 APNX-1-4552-005 cuando la inspección terminó
+                # pero los datos aún no están listos. Reintentamos como si fuera PENDING.
+                if e.status != 500:
+                    raise
                 retries_500 += 1
-                if retries_500 > max_err_retries:
+                if not policy.allows(e, retries_500):
                     msg = (
-                        "Inspección abortada: demasiados 500 APNX-1-4552-005 consecutivos "
-                        f"(>{max_err_retries})."
+                        "Inspección abortada: demasiados 500 "
+                        f"{e.code or 'sin código'} consecutivos (>{policy.attempts})."
                     )
-                    raise RuntimeError(msg)
+                    raise RuntimeError(msg) from e
                 log(
                     "inspect.status=PENDING "
                     f"uuid={insp_uuid} "
-                    f"(500 APNX-1-4552-005: sin información; retry "
-                    f"{retries_500}/{max_err_retries})"
+                    f"(500 {e.code or 'sin código'}: sin información; retry "
+                    f"{retries_500}/{policy.attempts})"
                 )
-                time.sleep(interval_s)
+                await asyncio.sleep(interval_s)
                 waited += interval_s
                 if waited > max_wait_s:
                     raise RuntimeError("Timeout esperando inspección de Appian (500 persistente)")
                 continue
-            # Reintento ante fallas de red/handshake (URLError, timeouts)
-            if "Network error" in msg or "handshake" in msg or "timed out" in msg:
+            except AppianNetworkError as e:
+                # Reintento ante fallas de red/handshake (URLError, timeouts)
                 retries_net += 1
-                if retries_net > max_err_retries:
+                if not policy.allows(e, retries_net):
                     msg = (
                         "Inspección abortada: demasiados errores de red consecutivos "
-                        f"(>{max_err_retries})."
+                        f"(>{policy.attempts})."
                     )
-                    raise RuntimeError(msg)
+                    raise RuntimeError(msg) from e
                 log(
                     "inspect.status=PENDING "
                     f"uuid={insp_uuid} "
-                    f"(red/timeout; retry {retries_net}/{max_err_retries})"
+                    f"({e.cause}; retry {retries_net}/{policy.attempts})"
                 )
-                time.sleep(interval_s)
+                await asyncio.sleep(interval_s)
                 waited += interval_s
                 if waited > max_wait_s:
                     raise RuntimeError(
@@ -164,18 +132,20 @@ def inspect_package(
                         "(problemas de red persistentes)"
                     )
                 continue
-            raise
-        status = str(res.get("status", "")).upper()
-        log(f"inspect.status={status} uuid={insp_uuid}")
-        # Resetear contadores de errores transitorios al recibir respuesta válida
-        retries_500 = 0
-        retries_net = 0
-        if status in ("COMPLETED", "FAILED"):
-            break
-        time.sleep(interval_s)
-        waited += interval_s
-        if waited > max_wait_s:
-            raise RuntimeError("Timeout esperando inspección de Appian")
+            status = str(res.get("status", "")).upper()
+            log_status(status_key, f"inspect.status={status} uuid={insp_uuid}")
+            # Resetear contadores de errores transitorios al recibir respuesta válida
+            retries_500 = 0
+            retries_net = 0
+            if status in ("COMPLETED", "FAILED"):
+                count_final_status("inspect", status)
+                break
+            await asyncio.sleep(interval_s)
+            waited += interval_s
+            if waited > max_wait_s:
+                raise RuntimeError("Timeout esperando inspección de Appian")
+    finally:
+        log_status_done(status_key)
 
     summary = (res.get("summary") or {})
     problems = (summary.get("problems") or {})
@@ -189,6 +159,22 @@ def inspect_package(
         for e in errors[:10]:
             log(f"- {e.get('objectName')} ({e.get('objectUuid')}): {e.get('errorMessage')}")
         raise RuntimeError("Inspección fallida (hay errores)")
+    return res
+
+
+def inspect_package(
+    base_url: str,
+    api_key: str,
+    package_path: Path,
+    customization_path: Optional[Path] = None,
+    admin_settings_path: Optional[Path] = None,
+    upload: Optional[PreparedUpload] = None,
+    reserve_s: float = 0.0,
+) -> None:
+    # Validación, hash y tamaño se calculan una sola vez; el import puede reutilizarlos
+    if upload is None:
+        upload = PreparedUpload(package_path, customization_path, admin_settings_path)
+    run_sync(inspect_package_async(AppianEngine(base_url, api_key), upload, reserve_s))
 
 
 def main():
@@ -216,4 +202,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "inspect")
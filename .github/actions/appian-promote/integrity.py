@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Size/SHA-256 integrity of exported files, checked again before promotion.
+
+Export records, per downloaded file, its size, whole-file SHA-256 and the
+SHA-256 of every fixed-size chunk, all computed from the download stream. On
+the promote side the chunk digests let a large ZIP be verified by several
+threads at once (``hashlib`` releases the GIL), and a small verified-cache
+keyed on path, size and mtime skips files already checked on this runner.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from utils import log
+
+CHUNK_BYTES = 8 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+
+class StreamHasher:
+    """Whole-file and per-chunk SHA-256 fed incrementally (e.g. from a download)."""
+
+    def __init__(self, chunk_bytes: int = CHUNK_BYTES) -> None:
+        self.chunk_bytes = chunk_bytes
+        self.size = 0
+        self.chunks: List[str] = []
+        self._whole = hashlib.sha256()
+        self._chunk = hashlib.sha256()
+        self._chunk_fill = 0
+
+    def update(self, data: bytes) -> None:
+        self._whole.update(data)
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.chunk_bytes - self._chunk_fill)
+            self._chunk.update(view[:take])
+            self._chunk_fill += take
+            view = view[take:]
+            if self._chunk_fill == self.chunk_bytes:
+                self.chunks.append(self._chunk.hexdigest())
+                self._chunk = hashlib.sha256()
+                self._chunk_fill = 0
+
+    def hexdigest(self) -> str:
+        return self._whole.hexdigest()
+
+    def chunk_digests(self) -> List[str]:
+        if self._chunk_fill or not self.chunks:
+            return self.chunks + [self._chunk.hexdigest()]
+        return list(self.chunks)
+
+
+class ManifestEntry(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+    chunk_bytes: int
+    chunks: Tuple[str, ...]
+
+
+def _hash_range(path: Path, offset: int, length: int) -> str:
+    digest = hashlib.sha256()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        while length > 0:
+            data = os.pread(fd, min(READ_SIZE, length), offset)
+            if not data:
+                break
+            digest.update(data)
+            offset += len(data)
+            length -= len(data)
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+
+def _hash_whole(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for data in iter(lambda: fh.read(READ_SIZE), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_workers() -> int:
+    """Threads for verification (``APPIAN_HASH_WORKERS``, default min(8, CPUs))."""
+    raw = os.environ.get("APPIAN_HASH_WORKERS", "")
+    return max(1, int(raw)) if raw else min(8, os.cpu_count() or 1)
+
+
+def load_manifest(path: Path) -> List[ManifestEntry]:
+    """Read the ``files`` section of ``export-manifest.json``."""
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el manifest de export: {path}")
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        raise RuntimeError(f"Manifest de export inválido: {path}: {e}") from e
+    files = data.get("files") if isinstance(data, dict) else None
+    if not isinstance(files, list):
+        raise RuntimeError(f"El manifest {path} no incluye checksums ('files'); re-exporte")
+    entries: List[ManifestEntry] = []
+    for item in files:
+        if not isinstance(item, dict) or not item.get("path") or not item.get("sha256"):
+            continue
+        entries.append(
+            ManifestEntry(
+                path=str(item["path"]),
+                size=int(item.get("size") or 0),
+                sha256=str(item["sha256"]),
+                chunk_bytes=int(item.get("chunk_bytes") or 0),
+                chunks=tuple(item.get("chunks") or ()),
+            )
+        )
+    return entries
+
+
+class VerifiedCache:
+    """Files already verified on this runner, keyed by path + size + mtime."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._entries: Dict[str, dict] = {}
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, path: Path, st: os.stat_result, sha256: str) -> bool:
+        entry = self._entries.get(str(path))
+        return bool(
+            entry
+            and entry.get("size") == st.st_size
+            and entry.get("mtime_ns") == st.st_mtime_ns
+            and entry.get("sha256") == sha256
+        )
+
+    def remember(self, path: Path, st: os.stat_result, sha256: str) -> None:
+        self._entries[str(path)] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha256,
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".verified-", dir=str(self.path.parent))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(self._entries, fh)
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+def verify_cache_from(arg: str) -> Optional[VerifiedCache]:
+    """Cache at ``--verify-cache``, ``APPIAN_VERIFY_CACHE`` or ``$RUNNER_TEMP``."""
+    value = arg or os.environ.get("APPIAN_VERIFY_CACHE", "")
+    if not value and os.environ.get("RUNNER_TEMP"):
+        value = os.path.join(os.environ["RUNNER_TEMP"], "appian-verified.json")
+    return VerifiedCache(Path(value).resolve()) if value else None
+
+
+def _match(path: Path, size: int, entries: Sequence[ManifestEntry]) -> Optional[ManifestEntry]:
+    # El promote recibe los archivos en otro layout: se emparejan por nombre (y tamaño)
+    named = [e for e in entries if Path(e.path).name == path.name]
+    for entry in named:
+        if entry.size == size:
+            return entry
+    return named[0] if named else None
+
+
+def verify_files(
+    paths: Sequence[Path],
+    entries: Sequence[ManifestEntry],
+    cache: Optional[VerifiedCache] = None,
+    workers: Optional[int] = None,
+    required: Sequence[Path] = (),
+    allow_unlisted: bool = False,
+) -> Dict[Path, str]:
+    """Check ``paths`` against manifest ``entries``; return ``{path: sha256}`` verified.
+
+    ``required`` files (those the export produced, e.g. the package) must have
+    a manifest entry unless ``allow_unlisted``; other files without one are
+    left out (the caller hashes them). Any missing entry, size or digest
+    mismatch raises ``RuntimeError`` naming every bad file.
+    """
+    must_match = {p.resolve() for p in required}
+    verified: Dict[Path, str] = {}
+    cached = 0
+    jobs: List[Tuple[Path, os.stat_result, ManifestEntry]] = []
+    unknown: List[str] = []
+    problems: List[str] = []
+    for path in dict.fromkeys(p.resolve() for p in paths):
+        st = path.stat()
+        entry = _match(path, st.st_size, entries)
+        if entry is None:
+            if path in must_match and not allow_unlisted:
+                problems.append(f"{path.name} (no figura en el manifest)")
+            else:
+                unknown.append(path.name)
+            continue
+        if entry.size != st.st_size:
+            problems.append(f"{path.name} (size={st.st_size}B, manifest={entry.size}B)")
+            continue
+        if cache is not None and cache.lookup(path, st, entry.sha256):
+            verified[path] = entry.sha256
+            cached += 1
+            continue
+        jobs.append((path, st, entry))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers or hash_workers()) as pool:
+        pending: List[Tuple[Path, os.stat_result, ManifestEntry, list]] = []
+        for path, st, entry in jobs:
+            if entry.chunk_bytes and entry.chunks:
+                futures = [
+                    pool.submit(_hash_range, path, offset, entry.chunk_bytes)
+                    for offset in range(0, max(st.st_size, 1), entry.chunk_bytes)
+                ]
+            else:
+                # Manifest sin chunks: un solo hash secuencial del archivo completo
+                futures = [pool.submit(_hash_whole, path)]
+            pending.append((path, st, entry, futures))
+        for path, st, entry, futures in pending:
+            digests = [f.result() for f in futures]
+            expected = list(entry.chunks) if entry.chunks and entry.chunk_bytes else [entry.sha256]
+            if digests != expected:
+                bad = next((i for i, (a, b) in enumerate(zip(digests, expected)) if a != b), 0)
+                problems.append(f"{path.name} (sha256 distinto desde el chunk {bad})")
+                continue
+            verified[path] = entry.sha256
+            if cache is not None:
+                cache.remember(path, st, entry.sha256)
+
+    if problems:
+        raise RuntimeError(
+            "Los archivos no coinciden con el manifest de export "
+            "(alterados, truncados o ausentes): " + "; ".join(problems)
+        )
+    if cache is not None and len(verified) > cached:
+        cache.save()
+    log(
+        f"verify=OK files={len(verified)} hashed={len(verified) - cached} cached={cached}"
+        + (f" sin_manifest={','.join(unknown)}" if unknown else "")
+    )
+    return verified
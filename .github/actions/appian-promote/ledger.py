@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Checksum ledger of database scripts already applied per environment.
+
+One JSON file per (environment, data source) records the SHA-256 of every
+script that was part of a successful import. Before the next import, scripts
+whose checksum is already recorded are dropped from the upload, new ones are
+kept (with their original ``orderId``), and an applied script whose content
+changed aborts the promotion: it will not be re-run and must become a new file.
+Writes re-read and merge the file under an ``flock`` on a sidecar ``.lock``, so
+parallel release apps, service jobs and runners do not drop each other's entries.
+"""
+
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+from upload import Attachment
+from utils import log
+
+LEDGER_VERSION = 1
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip()) or "_"
+
+
+class ScriptLedger:
+    """Applied-script checksums for one environment and data source."""
+
+    def __init__(self, directory: Path, env: str, data_source: Optional[str]) -> None:
+        self.env = env.strip().lower()
+        if not self.env:
+            raise RuntimeError("El ledger de scripts requiere el nombre del entorno (--env-name)")
+        self.data_source = data_source or "default"
+        self.path = directory / f"{_slug(self.env)}__{_slug(self.data_source)}.json"
+        self._lock_path = self.path.with_name(f".{self.path.name}.lock")
+        self.scripts: Dict[str, dict] = self._read()
+
+    def _read(self) -> Dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Ledger de scripts ilegible: {self.path}: {e}") from e
+        return dict(data.get("scripts") or {})
+
+    def partition(
+        self,
+        scripts: List[Tuple[Attachment, int]],
+    ) -> Tuple[List[Tuple[Attachment, int]], List[Tuple[Attachment, int]]]:
+        """Split ``scripts`` into (pending, already_applied).
+
+        Raises ``RuntimeError`` listing every applied script whose checksum no
+        longer matches the ledger.
+        """
+        pending: List[Tuple[Attachment, int]] = []
+        applied: List[Tuple[Attachment, int]] = []
+        edited: List[str] = []
+        for att, order_id in scripts:
+            entry = self.scripts.get(att.filename)
+            if entry is None:
+                pending.append((att, order_id))
+            elif entry.get("sha256") == att.sha256:
+                applied.append((att, order_id))
+            else:
+                edited.append(
+                    f"{att.filename} (aplicado sha256={entry.get('sha256')}, "
+                    f"actual sha256={att.sha256}, deployment={entry.get('deployment') or '?'})"
+                )
+        if edited:
+            raise RuntimeError(
+                f"Scripts ya aplicados en {self.env}/{self.data_source} fueron modificados; "
+                "agregue un script nuevo en vez de editar uno existente: " + "; ".join(edited)
+            )
+        return pending, applied
+
+    def record(self, scripts: List[Tuple[Attachment, int]], deployment_uuid: str) -> None:
+        """Mark ``scripts`` as applied by ``deployment_uuid`` and persist atomically.
+
+        The file is re-read under the lock and merged: entries recorded by other
+        writers since this ledger was loaded are kept.
+        """
+        if not scripts:
+            return
+        applied_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock_path.open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            self.scripts = self._read()
+            for att, order_id in scripts:
+                self.scripts[att.filename] = {
+                    "sha256": att.sha256,
+                    "size": att.size,
+                    "orderId": order_id,
+                    "deployment": deployment_uuid,
+                    "appliedAt": applied_at,
+                }
+            payload = {
+                "version": LEDGER_VERSION,
+                "env": self.env,
+                "dataSource": self.data_source,
+                "scripts": dict(sorted(self.scripts.items())),
+            }
+            fd, tmp = tempfile.mkstemp(prefix=".ledger-", dir=str(self.path.parent))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump(payload, fh, indent=2)
+                    fh.write("\n")
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        log(f"db.ledger=RECORDED scripts={len(scripts)} path={self.path}")
+
+
+def ledger_dir_from(arg: str) -> Optional[Path]:
+    """Ledger directory from ``--db-ledger-dir`` or ``APPIAN_DB_LEDGER_DIR`` (opt-in)."""
+    value = arg or os.environ.get("APPIAN_DB_LEDGER_DIR", "")
+    return Path(value).resolve() if value else None
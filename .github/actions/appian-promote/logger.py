@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Structured, buffered stderr logging shared by every CLI.
+
+Lines keep the usual grep-friendly ``key=VALUE`` text; on top of that:
+
+- Levels (``APPIAN_LOG_LEVEL``: ``debug``/``info``/``warning``/``error``,
+  default ``info``; ``RUNNER_DEBUG=1`` means ``debug``).
+- ``APPIAN_LOG_FORMAT=json``: one JSON object per line (``ts``, ``level``,
+  ``msg`` and the ``key=VALUE`` tokens of the message under ``fields``).
+- Buffered writes: lines are flushed every ``APPIAN_LOG_FLUSH_S`` seconds
+  (default 1; ``0`` writes each line at once) or when ``APPIAN_LOG_BUFFER``
+  bytes pile up, and always at exit.
+- :func:`log_status` collapses a status repeated by a polling loop: the first
+  occurrence is printed, repeats only every ``APPIAN_LOG_COLLAPSE_S`` seconds
+  (default 60) as ``<line> (sigue: x42, 3m30s)``, and a change of status is
+  printed at once. ``debug`` prints every poll.
+
+GitHub workflow commands (``::error::``, ``::warning::``, ...) bypass the
+format and the buffer: pending lines are flushed and the annotation written
+immediately. In the service mode the lines of each job go to its client
+(:func:`set_log_sink`) instead. Stdlib only, so ``async_http`` and its
+helpers can use it.
+"""
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+_FIELD = re.compile(r"(?<![\w.])([A-Za-z_][\w.]*)=(\S+)")
+# Destino de las líneas de un job del modo servicio (se reenvían a su cliente)
+_SINK: ContextVar[Optional[Callable[[str], None]]] = ContextVar("appian_log_sink", default=None)
+
+
+def format_elapsed(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+class _Repeat:
+    __slots__ = ("msg", "count", "first_at", "printed_at", "pending")
+
+    def __init__(self, msg: str, now: float) -> None:
+        self.msg = msg
+        self.count = 1
+        self.first_at = now
+        self.printed_at = now
+        self.pending = 0
+
+
+class Logger:
+    """Process-wide log writer (see the module docstring)."""
+
+    def __init__(
+        self,
+        level: int = INFO,
+        json_lines: bool = False,
+        flush_s: float = 1.0,
+        buffer_bytes: int = 65536,
+        collapse_s: float = 60.0,
+    ) -> None:
+        self.level = level
+        self.json_lines = json_lines
+        self.flush_s = max(0.0, flush_s)
+        self.buffer_bytes = max(0, buffer_bytes)
+        self.collapse_s = max(0.0, collapse_s)
+        self._buf: List[str] = []
+        self._size = 0
+        self._flushed_at = time.monotonic()
+        self._repeats: Dict[str, _Repeat] = {}
+        self._lock = threading.RLock()
+        self._flusher: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "Logger":
+        raw = os.environ.get("APPIAN_LOG_LEVEL", "").strip().lower()
+        if not raw and os.environ.get("RUNNER_DEBUG") == "1":
+            raw = "debug"
+        return cls(
+            LEVELS.get(raw, INFO),
+            os.environ.get("APPIAN_LOG_FORMAT", "").strip().lower() == "json",
+            float(os.environ.get("APPIAN_LOG_FLUSH_S", "1") or 0),
+            int(os.environ.get("APPIAN_LOG_BUFFER", "65536") or 0),
+            float(os.environ.get("APPIAN_LOG_COLLAPSE_S", "60") or 0),
+        )
+
+    def _render(self, msg: str, level: int, extra: Optional[dict] = None) -> str:
+        if not self.json_lines:
+            return msg
+        record = {
+            "ts": round(time.time(), 3),
+            "level": _LEVEL_NAMES.get(level, "info"),
+            "msg": msg,
+        }
+        fields = dict(_FIELD.findall(msg))
+        if fields:
+            record["fields"] = fields
+        if extra:
+            record.update(extra)
+        return json.dumps(record, ensure_ascii=False)
+
+    def _write(self, line: str) -> None:
+        sink = _SINK.get()
+        if sink is not None:
+            sink(line)
+            return
+        with self._lock:
+            self._buf.append(line + "\n")
+            self._size += len(line) + 1
+            now = time.monotonic()
+            if (
+                self.flush_s == 0
+                or self._size >= self.buffer_bytes
+                or now - self._flushed_at >= self.flush_s
+            ):
+                self.flush()
+            elif self._flusher is None:
+                # Sin nuevas líneas (p. ej. un poll largo) el hilo vacía el buffer igual
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="appian-log-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_s)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flushed_at = time.monotonic()
+            if not self._buf:
+                return
+            data = "".join(self._buf)
+            self._buf.clear()
+            self._size = 0
+            try:
+                sys.stderr.write(data)
+                sys.stderr.flush()
+            except (OSError, ValueError):  # pragma: no cover - stderr cerrado al salir
+                pass
+
+    def log(self, msg: str, level: int = INFO) -> None:
+        if msg.startswith("::"):
+            self.annotate(msg)
+            return
+        if level >= self.level:
+            self._write(self._render(msg, level))
+
+    def write_line(self, line: str) -> None:
+        """Write a line already rendered elsewhere (e.g. by the service), as is."""
+        if line.startswith("::"):
+            self.annotate(line)
+        else:
+            self._write(line)
+
+    def annotate(self, msg: str) -> None:
+        """Write a GitHub workflow command now, after the pending lines.
+
+        Always raw text, also with JSON lines: Actions only parses it verbatim.
+        """
+        sink = _SINK.get()
+        if sink is not None:
+            sink(msg)
+            return
+        with self._lock:
+            self.flush()
+            try:
+                sys.stderr.write(msg + "\n")
+                sys.stderr.flush()
+            except (OSError, ValueError):  # pragma: no cover
+                pass
+
+    def status(self, key: str, msg: str) -> None:
+        """Log ``msg`` as the current status of ``key``, collapsing repeats."""
+        if self.level <= DEBUG or self.collapse_s == 0:
+            self.log(msg)
+            return
+        with self._lock:
+            now = time.monotonic()
+            repeat = self._repeats.get(key)
+            if repeat is not None and repeat.msg == msg:
+                repeat.count += 1
+                repeat.pending += 1
+                if now - repeat.printed_at >= self.collapse_s:
+                    self._summary(repeat, now)
+                return
+            if repeat is not None and repeat.pending:
+                self._summary(repeat, now)
+            self._repeats[key] = _Repeat(msg, now)
+            self.log(msg)
+
+    def _summary(self, repeat: _Repeat, now: float) -> None:
+        elapsed = now - repeat.first_at
+        if INFO >= self.level:
+            self._write(
+                self._render(
+                    f"{repeat.msg} (sigue: x{repeat.count}, {format_elapsed(elapsed)})",
+                    INFO,
+                    {"repeat": repeat.count, "elapsedS": round(elapsed, 1)},
+                )
+            )
+        repeat.printed_at = now
+        repeat.pending = 0
+
+    def done(self, key: str) -> None:
+        """Forget ``key`` (its loop ended), reporting repeats not printed yet."""
+        with self._lock:
+            repeat = self._repeats.pop(key, None)
+            if repeat is not None and repeat.pending:
+                self._summary(repeat, time.monotonic())
+
+
+_LOGGER: Optional[Logger] = None
+_LOGGER_LOCK = threading.Lock()
+
+
+def get_logger() -> Logger:
+    global _LOGGER
+    if _LOGGER is None:
+        with _LOGGER_LOCK:
+            if _LOGGER is None:
+                _LOGGER = Logger.from_env()
+    return _LOGGER
+
+
+def log(msg: str, level: int = INFO) -> None:
+    """Emit a log line compatible with GitHub Actions."""
+    get_logger().log(msg, level)
+
+
+def log_status(key: str, msg: str) -> None:
+    """Emit the status line of a polling loop; repeats are collapsed."""
+    get_logger().status(key, msg)
+
+
+def log_status_done(key: str) -> None:
+    get_logger().done(key)
+
+
+def log_line(line: str) -> None:
+    get_logger().write_line(line)
+
+
+def set_log_sink(sink: Optional[Callable[[str], None]]) -> None:
+    """Send the lines logged in the current context to ``sink`` instead of stderr."""
+    _SINK.set(sink)
+
+
+def flush_logs() -> None:
+    if _LOGGER is not None:
+        _LOGGER.flush()
+
+
+# Registrado al importar: corre después de los atexit de quienes importan este módulo
+# (p. ej. el resumen de ratelimit), que todavía pueden escribir líneas
+atexit.register(flush_logs)
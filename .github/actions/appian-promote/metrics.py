@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Process-wide counters/histograms exported in OpenMetrics text format.
+
+``HttpClient`` records latency and bytes of every Appian request, the polling
+loops count polls and final statuses, ``RetryPolicy`` counts retries by cause
+and ``timed_operation`` times whole export/inspect/import flows; the
+deployment queue records its waits and the poll schedule its prediction
+errors. At exit the registry is written to ``APPIAN_METRICS_FILE``
+(textfile collectors; written atomically) and/or pushed to
+``APPIAN_METRICS_PUSH_URL``. Exporting never fails the run. Stdlib
+only: ``async_http`` imports this module.
+"""
+
+import atexit
+import functools
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from logger import log as _log
+
+T = TypeVar("T")
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+DURATION_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0)
+THROUGHPUT_BUCKETS = tuple(float(2**n) for n in range(16, 30, 2))  # 64 KiB/s .. 128 MiB/s
+# Por debajo de esto el throughput es ruido (latencia domina)
+THROUGHPUT_MIN_BYTES = 64 * 1024
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_API_PREFIX = re.compile(r"^.*?/deployment-management/v\d+")
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[A-Za-z0-9_.~-]{8,}$|^\d+$")
+
+
+def endpoint_of(url: str) -> str:
+    """Low-cardinality endpoint: API prefix stripped, ids replaced by ``{id}``."""
+    path = _API_PREFIX.sub("", urlsplit(url).path) or "/"
+    segments = ["{id}" if _ID_SEGMENT.match(seg) else seg for seg in path.split("/")]
+    return "/".join(segments) or "/"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels_text(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class _Family:
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        unit: str = "",
+        buckets: Tuple[float, ...] = (),
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.unit = unit
+        self.buckets = buckets
+        # counter: labels -> valor; histogram: labels -> [buckets..., sum, count]
+        self.samples: Dict[Labels, List[float]] = {}
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counter and histogram families."""
+
+    def __init__(self, const_labels: Optional[Dict[str, str]] = None) -> None:
+        self.const_labels: Labels = tuple(sorted((const_labels or {}).items()))
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, unit: str = "") -> None:
+        self._families[name] = _Family(name, "counter", help_text, unit)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Tuple[float, ...],
+        unit: str = "",
+    ) -> None:
+        self._families[name] = _Family(name, "histogram", help_text, unit, tuple(sorted(buckets)))
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        family = self._families[name]
+        key = self.const_labels + tuple(sorted(labels.items()))
+        with self._lock:
+            family.samples.setdefault(key, [0.0])[0] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        family = self._families[name]
+        key = self.const_labels + tuple(sorted(labels.items()))
+        with self._lock:
+            row = family.samples.setdefault(key, [0.0] * (len(family.buckets) + 2))
+            for idx, bound in enumerate(family.buckets):
+                if value <= bound:
+                    row[idx] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def is_empty(self) -> bool:
+        return not any(f.samples for f in self._families.values())
+
+    def render(self) -> str:
+        """OpenMetrics text exposition (ends with ``# EOF``)."""
+        lines: List[str] = []
+        with self._lock:
+            for family in self._families.values():
+                if not family.samples:
+                    continue
+                lines.append(f"# TYPE {family.name} {family.kind}")
+                if family.unit:
+                    lines.append(f"# UNIT {family.name} {family.unit}")
+                lines.append(f"# HELP {family.name} {_escape(family.help)}")
+                for labels, row in sorted(family.samples.items()):
+                    if family.kind == "counter":
+                        lines.append(f"{family.name}_total{_labels_text(labels)} {_fmt(row[0])}")
+                        continue
+                    # observe() ya acumula: cada bucket cuenta todo valor <= su límite
+                    bounds = [repr(float(b)) for b in family.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, row[:-2] + row[-1:]):
+                        le = _labels_text(labels, (("le", bound),))
+                        lines.append(f"{family.name}_bucket{le} {_fmt(count)}")
+                    lines.append(f"{family.name}_count{_labels_text(labels)} {_fmt(row[-1])}")
+                    lines.append(f"{family.name}_sum{_labels_text(labels)} {_fmt(row[-2])}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _const_labels_from_env() -> Dict[str, str]:
+    """``APPIAN_METRICS_LABELS=env=qa,app=MyApp`` added to every sample."""
+    labels: Dict[str, str] = {}
+    for item in os.environ.get("APPIAN_METRICS_LABELS", "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            if key.strip():
+                labels[key.strip()] = value.strip()
+    return labels
+
+
+REGISTRY = MetricsRegistry(_const_labels_from_env())
+REGISTRY.histogram(
+    "appian_http_request_duration_seconds",
+    "Latency of one HTTP exchange with Appian by endpoint and status",
+    LATENCY_BUCKETS,
+    unit="seconds",
+)
+REGISTRY.counter(
+    "appian_http_transferred_bytes",
+    "Request/response body bytes by direction and endpoint",
+    unit="bytes",
+)
+REGISTRY.histogram(
+    "appian_http_throughput_bytes_per_second",
+    f"Upload/download throughput of transfers of at least {THROUGHPUT_MIN_BYTES} bytes",
+    THROUGHPUT_BUCKETS,
+    unit="bytes_per_second",
+)
+REGISTRY.counter("appian_polls", "Status polls by phase")
+REGISTRY.counter("appian_retries", "Retries granted by cause")
+REGISTRY.counter("appian_final_status", "Terminal status reported by Appian by phase")
+REGISTRY.histogram(
+    "appian_operation_duration_seconds",
+    "Wall time of export/inspect/import flows by outcome",
+    DURATION_BUCKETS,
+    unit="seconds",
+)
+REGISTRY.histogram(
+    "appian_ratelimit_wait_seconds",
+    "Time requests waited for a token of the per-host rate limiter",
+    LATENCY_BUCKETS,
+    unit="seconds",
+)
+REGISTRY.histogram(
+    "appian_queue_wait_seconds",
+    "Client-side wait for the target environment's deployment slot by lane",
+    DURATION_BUCKETS,
+    unit="seconds",
+)
+REGISTRY.histogram(
+    "appian_poll_prediction_error_seconds",
+    "Absolute error of the history-predicted deployment duration by phase",
+    DURATION_BUCKETS,
+    unit="seconds",
+)
+
+
+def observe_request(
+    method: str,
+    url: str,
+    status: str,
+    elapsed_s: float,
+    sent: int,
+    received: int,
+) -> None:
+    endpoint = endpoint_of(url)
+    REGISTRY.observe(
+        "appian_http_request_duration_seconds",
+        elapsed_s,
+        method=method.upper(),
+        endpoint=endpoint,
+        status=status,
+    )
+    for direction, size in (("upload", sent), ("download", received)):
+        if not size:
+            continue
+        REGISTRY.inc("appian_http_transferred_bytes", size, direction=direction, endpoint=endpoint)
+        if size >= THROUGHPUT_MIN_BYTES and elapsed_s > 0:
+            REGISTRY.observe(
+                "appian_http_throughput_bytes_per_second",
+                size / elapsed_s,
+                direction=direction,
+                endpoint=endpoint,
+            )
+
+
+def observe_ratelimit_wait(host: str, seconds: float) -> None:
+    REGISTRY.observe("appian_ratelimit_wait_seconds", seconds, host=host)
+
+
+def count_poll(phase: str) -> None:
+    REGISTRY.inc("appian_polls", phase=phase)
+
+
+def count_retry(cause: str) -> None:
+    REGISTRY.inc("appian_retries", cause=cause)
+
+
+def count_final_status(phase: str, status: str) -> None:
+    REGISTRY.inc("appian_final_status", phase=phase, status=status or "UNKNOWN")
+
+
+def observe_queue_wait(env: str, lane: str, seconds: float) -> None:
+    REGISTRY.observe("appian_queue_wait_seconds", seconds, env=env, lane=lane)
+
+
+def observe_poll_prediction(phase: str, error_s: float) -> None:
+    REGISTRY.observe("appian_poll_prediction_error_seconds", error_s, phase=phase)
+
+
+def timed_operation(
+    operation: str,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Decorate an async flow to record its duration with ``outcome=ok|error``."""
+
+    def decorate(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.monotonic()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                REGISTRY.observe(
+                    "appian_operation_duration_seconds",
+                    time.monotonic() - started,
+                    operation=operation,
+                    outcome=outcome,
+                )
+
+        return wrapper
+
+    return decorate
+
+
+def flush() -> None:
+    """Write/push the registry if configured; errors are logged, never raised."""
+    target = os.environ.get("APPIAN_METRICS_FILE", "")
+    push_url = os.environ.get("APPIAN_METRICS_PUSH_URL", "")
+    if not (target or push_url) or REGISTRY.is_empty():
+        return
+    payload = REGISTRY.render().encode("utf-8")
+    if target:
+        path = Path(target).resolve()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".metrics-", dir=str(path.parent))
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(payload)
+            os.replace(tmp, path)
+            _log(f"metrics=WRITTEN path={path}")
+        except OSError as e:
+            _log(f"metrics=FAILED no se pudo escribir {path}: {e}")
+    if push_url:
+        # urllib directo: el push no debe pasar por cassettes ni por el circuit breaker
+        method = os.environ.get("APPIAN_METRICS_PUSH_METHOD", "POST").upper()
+        req = Request(push_url, data=payload, method=method)
+        req.add_header("Content-Type", CONTENT_TYPE)
+        try:
+            with urlopen(req, timeout=float(os.environ.get("APPIAN_METRICS_PUSH_TIMEOUT", "5"))):
+                pass
+            _log(f"metrics=PUSHED url={push_url}")
+        except Exception as e:
+            _log(f"metrics=FAILED push a {push_url}: {e}")
+
+
+atexit.register(flush)
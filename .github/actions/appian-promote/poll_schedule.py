@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Polling schedule of export/import deployments learned from past runs.
+
+Durations of completed deployments are recorded per environment, operation
+and package size bucket (x4 steps: ``le1MiB``, ``le4MiB``, ...). With at
+least ``MIN_SAMPLES`` of them the poller starts sparse, halving the gap
+towards the earliest expected completion (the lower of the 10th percentile
+and 80% of the median, capped at ``APPIAN_POLL_MAX_INTERVAL`` between polls),
+and polls at the configured interval from there on, so the usual completion
+is seen as fast as before with a fraction of the requests. Without history
+the interval is fixed, as always.
+
+History lives in ``APPIAN_POLL_HISTORY`` (a JSON file; default
+``<APPIAN_ARTIFACT_STORE>/poll-history.json`` when the store is enabled,
+otherwise off), updated under ``flock`` so concurrent jobs can share it.
+Exports record the size of the downloaded package, which buckets the next
+export of the same resource and sizes the time it keeps for the download.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+from metrics import observe_poll_prediction
+from utils import log
+
+HISTORY_VERSION = 1
+MAX_SAMPLES = 20
+MIN_SAMPLES = 3
+_MIB = 1024 * 1024
+
+
+def size_bucket(size: Optional[int]) -> str:
+    if not size:
+        return "unknown"
+    upper = 1
+    while size > upper * _MIB:
+        upper *= 4
+    return f"le{upper}MiB"
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PollHistory:
+    """Recorded durations (and export sizes) in one JSON file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock_path = path.with_name(path.name + ".lock")
+
+    def _read(self) -> dict:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) and data.get("version") == HISTORY_VERSION else {}
+
+    def samples(self, key: str) -> List[float]:
+        values = (self._read().get("durations") or {}).get(key) or []
+        return [float(v) for v in values if isinstance(v, (int, float)) and v > 0]
+
+    def size_of(self, ref: str) -> Optional[int]:
+        size = (self._read().get("sizes") or {}).get(ref)
+        return int(size) if isinstance(size, int) else None
+
+    def _update(self, mutate: Callable[[dict], None]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock_path.open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            data = self._read() or {"version": HISTORY_VERSION}
+            mutate(data)
+            fd, tmp = tempfile.mkstemp(prefix=".poll-history-", dir=str(self.path.parent))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump(data, fh, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+
+    def record(self, key: str, duration_s: float) -> None:
+        def _add(data: dict) -> None:
+            durations = data.setdefault("durations", {})
+            durations[key] = (durations.get(key) or [])[-(MAX_SAMPLES - 1):] + [
+                round(duration_s, 1)
+            ]
+
+        self._update(_add)
+
+    def remember_size(self, ref: str, size: int) -> None:
+        def _set(data: dict) -> None:
+            data.setdefault("sizes", {})[ref] = int(size)
+
+        self._update(_set)
+
+
+def history_from_env() -> Optional[PollHistory]:
+    raw = os.environ.get("APPIAN_POLL_HISTORY", "")
+    if not raw:
+        store = os.environ.get("APPIAN_ARTIFACT_STORE", "")
+        if not store:
+            return None
+        raw = str(Path(store) / "poll-history.json")
+    return PollHistory(Path(raw).resolve())
+
+
+class PollSchedule:
+    """Gaps between the polls of one deployment (see the module docstring)."""
+
+    def __init__(
+        self,
+        phase: str,
+        key: str,
+        interval_s: float,
+        samples: List[float],
+        history: Optional[PollHistory] = None,
+        max_interval_s: float = 60.0,
+    ) -> None:
+        self.phase = phase
+        self.key = key
+        self.interval_s = interval_s
+        self.samples = samples
+        self.history = history
+        self.max_interval_s = max(interval_s, max_interval_s)
+        self.expected: Optional[float] = None
+        self.dense_from: Optional[float] = None
+        if len(samples) >= MIN_SAMPLES:
+            self.expected = _quantile(samples, 0.5)
+            # Límite inferior: llegar temprano al tramo denso no agrega latencia
+            self.dense_from = min(_quantile(samples, 0.1), 0.8 * self.expected)
+        self._last_gap = 0.0
+
+    def describe(self) -> str:
+        if self.dense_from is None:
+            return (
+                f"poll.schedule={self.phase} key={self.key} fixed={self.interval_s:g}s "
+                f"samples={len(self.samples)}"
+            )
+        return (
+            f"poll.schedule={self.phase} key={self.key} samples={len(self.samples)} "
+            f"expected={self.expected:.0f}s dense_from={self.dense_from:.0f}s "
+            f"max_gap={self.max_interval_s:g}s"
+        )
+
+    def next_sleep(self, elapsed_s: float) -> float:
+        """Seconds until the next poll, ``elapsed_s`` after the first one."""
+        gap = self.interval_s
+        if self.dense_from is not None and elapsed_s < self.dense_from - self.interval_s:
+            remaining = self.dense_from - elapsed_s
+            gap = min(max(self.interval_s, remaining / 2), self.max_interval_s, remaining)
+        self._last_gap = gap
+        return gap
+
+    def finish(self, elapsed_s: float, status: str, polls: int) -> None:
+        """Report the prediction error and learn from a completed deployment."""
+        # Visto tras un salto largo: terminó en algún punto del salto, no al verlo
+        actual = elapsed_s - max(0.0, self._last_gap - self.interval_s) / 2
+        if self.expected is not None:
+            error = actual - self.expected
+            log(
+                f"poll.predict={self.phase} key={self.key} expected={self.expected:.0f}s "
+                f"actual={actual:.0f}s error={error:+.0f}s "
+                f"({100 * error / max(self.expected, 1):+.0f}%) polls={polls}"
+            )
+            observe_poll_prediction(self.phase, abs(error))
+        if self.history is not None and status.startswith("COMPLETED"):
+            try:
+                self.history.record(self.key, actual)
+            except OSError as e:
+                log(f"poll.history=FAILED no se pudo registrar la duración: {e}")
+
+
+def _env_of(base_url: str) -> str:
+    return urlsplit(base_url).netloc or base_url
+
+
+def poll_schedule_for(
+    base_url: str,
+    phase: str,
+    interval_s: float,
+    size: Optional[int] = None,
+    size_ref: Optional[str] = None,
+    learn: bool = True,
+) -> Optional[PollSchedule]:
+    """Schedule for one deployment; ``None`` when no history is configured.
+
+    ``size_ref`` names the resource whose last recorded size stands in for
+    ``size`` (exports, whose package size is unknown until downloaded).
+    Without ``learn`` (e.g. a deployment reattached mid-way) the duration is
+    not recorded.
+    """
+    history = history_from_env()
+    if history is None:
+        return None
+    env = _env_of(base_url)
+    if size is None and size_ref:
+        size = history.size_of(f"{env}|{size_ref}")
+    key = f"{env}|{phase}|{size_bucket(size)}"
+    schedule = PollSchedule(
+        phase,
+        key,
+        interval_s,
+        history.samples(key),
+        history if learn else None,
+        float(os.environ.get("APPIAN_POLL_MAX_INTERVAL", "60")),
+    )
+    log(schedule.describe())
+    return schedule
+
+
+def previous_export_size(base_url: str, size_ref: str) -> Optional[int]:
+    """Package size of the last export of ``size_ref`` (``None`` without history)."""
+    history = history_from_env()
+    if history is None:
+        return None
+    return history.size_of(f"{_env_of(base_url)}|{size_ref}")
+
+
+def remember_export_size(base_url: str, size_ref: str, size: int) -> None:
+    history = history_from_env()
+    if history is None:
+        return
+    try:
+        history.remember_size(f"{_env_of(base_url)}|{size_ref}", size)
+    except OSError as e:
+        log(f"poll.history=FAILED no se pudo registrar el tamaño: {e}")
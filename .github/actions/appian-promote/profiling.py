@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Opt-in profiling for every CLI entry point (``APPIAN_PROFILE``).
+
+``run_main`` wraps a ``main`` function; with ``APPIAN_PROFILE`` unset it just
+calls it. Otherwise it enables the requested modes (comma separated, or
+``1``/``all`` for every one) and writes the reports to ``APPIAN_PROFILE_DIR``
+when the program ends, even on errors:
+
+- ``cpu``: cProfile of the main thread (``.pstats`` plus a ``.cpu.txt`` top).
+- ``mem``: tracemalloc peak and top allocations at exit and near the peak.
+- ``sample``: low-overhead stack sampler over all threads, written in the
+  collapsed-stack format used by flamegraph tools (``.collapsed``).
+
+A ``.json`` summary compares wall and CPU time: a wide gap means the run was
+waiting on the network rather than computing. Stdlib only, so the small
+helper scripts can use it without pulling in the HTTP stack; the profilers
+themselves live in ``profiling_session`` and load only when enabled.
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Tuple, TypeVar
+
+from logger import flush_logs, log as _log
+
+T = TypeVar("T")
+
+PROFILE_MODES = ("cpu", "mem", "sample")
+
+
+def profile_modes() -> Tuple[str, ...]:
+    raw = os.environ.get("APPIAN_PROFILE", "").strip().lower()
+    if raw in ("", "0", "false", "no", "off"):
+        return ()
+    if raw in ("1", "true", "yes", "on", "all"):
+        return PROFILE_MODES
+    modes = tuple(dict.fromkeys(m.strip() for m in raw.split(",") if m.strip()))
+    unknown = [m for m in modes if m not in PROFILE_MODES]
+    if unknown:
+        # Un typo en el perfilado no debe romper el deploy
+        _log(f"profile: modos desconocidos ignorados: {', '.join(unknown)}")
+    return tuple(m for m in modes if m in PROFILE_MODES)
+
+
+def profile_dir() -> Path:
+    """``APPIAN_PROFILE_DIR``, else ``$RUNNER_TEMP/appian-profile``, else ``./appian-profile``."""
+    raw = os.environ.get("APPIAN_PROFILE_DIR", "")
+    if not raw:
+        raw = os.path.join(os.environ.get("RUNNER_TEMP", "."), "appian-profile")
+    return Path(raw).resolve()
+
+
+def run_main(main: Callable[[], T], name: str) -> T:
+    """Run ``main`` under the profilers selected by ``APPIAN_PROFILE`` (if any)."""
+    modes = profile_modes()
+    if not modes:
+        try:
+            return main()
+        finally:
+            # Antes del traceback de un error: las líneas en buffer quedan en orden
+            flush_logs()
+    # Import diferido: sin APPIAN_PROFILE el arranque no paga cProfile/pstats/tracemalloc
+    from profiling_session import ProfileSession
+
+    session = ProfileSession(name, modes, profile_dir())
+    session.start()
+    status = "error"
+    try:
+        result = main()
+        status = "ok" if result in (None, 0) else "error"
+        return result
+    except SystemExit as exc:
+        status = "ok" if exc.code in (None, 0) else "error"
+        raise
+    finally:
+        try:
+            written = session.finish(status)
+            _log(f"profile=WRITTEN dir={session.out_dir} files={len(written)} stem={session.stem}")
+        except OSError as e:
+            _log(f"profile=FAILED no se pudieron escribir los reportes: {e}")
+        flush_logs()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Profilers behind ``APPIAN_PROFILE`` (see ``profiling``).
+
+Kept apart so that the CLIs only import cProfile, pstats and tracemalloc
+when profiling is actually requested.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows runners
+    resource = None  # type: ignore[assignment]
+
+_SECRET_ARG = re.compile(r"(key|token|password|secret)", re.I)
+
+
+def _scrub_argv(argv: List[str]) -> List[str]:
+    scrubbed: List[str] = []
+    hide_next = False
+    for arg in argv:
+        if hide_next:
+            scrubbed.append("<REDACTED>")
+            hide_next = False
+        elif arg.startswith("--") and _SECRET_ARG.search(arg):
+            if "=" in arg:
+                scrubbed.append(arg.split("=", 1)[0] + "=<REDACTED>")
+            else:
+                scrubbed.append(arg)
+                hide_next = True
+        else:
+            scrubbed.append(arg)
+    return scrubbed
+
+
+class _Monitor(threading.Thread):
+    """Background thread: stack sampling and near-peak tracemalloc snapshots."""
+
+    def __init__(self, interval_s: float, sample: bool, mem: bool) -> None:
+        super().__init__(name="appian-profiler", daemon=True)
+        self.interval_s = interval_s
+        self.sample = sample
+        self.mem = mem
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_snapshot_bytes = 0
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                where = f"{Path(code.co_filename).name}:{code.co_firstlineno}"
+                stack.append(f"{code.co_name} ({where})")
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _check_peak(self) -> None:
+        _, peak = tracemalloc.get_traced_memory()
+        # Nueva foto solo si el pico creció >10%: take_snapshot es caro
+        if peak > self.peak_snapshot_bytes * 1.1:
+            self.peak_snapshot = tracemalloc.take_snapshot()
+            self.peak_snapshot_bytes = peak
+
+    def run(self) -> None:
+        next_mem = 0.0
+        while not self._stop_event.wait(self.interval_s):
+            if self.sample:
+                self._sample()
+            if self.mem and time.monotonic() >= next_mem:
+                self._check_peak()
+                next_mem = time.monotonic() + 1.0
+
+
+class ProfileSession:
+    """Profilers for one CLI run and the reports they produce."""
+
+    def __init__(self, name: str, modes: Tuple[str, ...], out_dir: Path) -> None:
+        self.name = name
+        self.modes = modes
+        self.out_dir = out_dir
+        self.stem = f"{name}-{os.getpid()}"
+        interval_ms = float(os.environ.get("APPIAN_PROFILE_INTERVAL_MS", "5"))
+        self._interval_s = max(0.001, interval_ms / 1000.0)
+        self._cpu: Optional[cProfile.Profile] = None
+        self._monitor: Optional[_Monitor] = None
+        self._started_wall = 0.0
+        self._started_cpu = 0.0
+
+    def start(self) -> None:
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        if "mem" in self.modes:
+            tracemalloc.start(int(os.environ.get("APPIAN_PROFILE_TRACE_FRAMES", "10")))
+        if "sample" in self.modes or "mem" in self.modes:
+            self._monitor = _Monitor(self._interval_s, "sample" in self.modes, "mem" in self.modes)
+            self._monitor.start()
+        if "cpu" in self.modes:
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+
+    def finish(self, status: str) -> List[Path]:
+        """Stop every profiler and write its reports; returns the files written."""
+        if self._cpu is not None:
+            self._cpu.disable()
+        if self._monitor is not None:
+            self._monitor.stop()
+        wall = time.perf_counter() - self._started_wall
+        cpu = time.process_time() - self._started_cpu
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written: List[Path] = []
+        summary: Dict[str, object] = {
+            "name": self.name,
+            "pid": os.getpid(),
+            "argv": _scrub_argv(sys.argv),
+            "modes": list(self.modes),
+            "status": status,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "cpu_ratio": round(cpu / wall, 3) if wall else None,
+        }
+        if resource is not None:
+            # ru_maxrss: KiB en Linux
+            summary["maxrss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if "mem" in self.modes:
+            # Antes del reporte de CPU: pstats asigna bastante y ensuciaría la foto final
+            current, peak = tracemalloc.get_traced_memory()
+            summary["tracemalloc_current_bytes"] = current
+            summary["tracemalloc_peak_bytes"] = peak
+            written.append(self._write_mem(current, peak))
+            tracemalloc.stop()
+        if self._cpu is not None:
+            written.extend(self._write_cpu(self._cpu))
+        if self._monitor is not None and self._monitor.sample:
+            summary["samples"] = self._monitor.samples
+            summary["sample_interval_ms"] = round(self._interval_s * 1000, 3)
+            written.append(self._write_collapsed(self._monitor.stacks))
+        summary_path = self.out_dir / f"{self.stem}.json"
+        summary["files"] = [p.name for p in written]
+        summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        written.append(summary_path)
+        return written
+
+    def _write_cpu(self, prof: cProfile.Profile) -> List[Path]:
+        stats_path = self.out_dir / f"{self.stem}.pstats"
+        prof.dump_stats(str(stats_path))
+        text = io.StringIO()
+        stats = pstats.Stats(prof, stream=text)
+        stats.sort_stats("cumulative").print_stats(50)
+        stats.sort_stats("tottime").print_stats(30)
+        report = self.out_dir / f"{self.stem}.cpu.txt"
+        report.write_text(text.getvalue(), encoding="utf-8")
+        return [stats_path, report]
+
+    def _write_mem(self, current: int, peak: int) -> Path:
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        )
+        lines = [f"current={current}B peak={peak}B", ""]
+        final = tracemalloc.take_snapshot().filter_traces(ignore)
+        lines.append("Top 25 asignaciones vivas al terminar (por línea):")
+        lines.extend(f"  {stat}" for stat in final.statistics("lineno")[:25])
+        near_peak = self._monitor.peak_snapshot if self._monitor is not None else None
+        if near_peak is not None:
+            near_peak = near_peak.filter_traces(ignore)
+            lines.append("")
+            lines.append(
+                f"Top 25 asignaciones cerca del pico ({self._monitor.peak_snapshot_bytes}B):"
+            )
+            lines.extend(f"  {stat}" for stat in near_peak.statistics("lineno")[:25])
+            lines.append("")
+            lines.append("Top 5 tracebacks cerca del pico:")
+            for stat in near_peak.statistics("traceback")[:5]:
+                lines.append(f"  {stat.count} bloques, {stat.size}B")
+                lines.extend(f"    {line}" for line in stat.traceback.format())
+        report = self.out_dir / f"{self.stem}.mem.txt"
+        report.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return report
+
+    def _write_collapsed(self, stacks: Counter) -> Path:
+        report = self.out_dir / f"{self.stem}.collapsed"
+        with report.open("w", encoding="utf-8") as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        return report
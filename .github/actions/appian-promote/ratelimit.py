@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Token-bucket rate limiting of Appian calls per base URL.
+
+Every request of ``HttpClient`` takes one token from the bucket of its host
+before being sent; without tokens it sleeps until one accrues, so bursts of
+polls and downloads are smoothed out instead of tripping tenant throttling
+(each 429/503 costs a full retry delay). Tokens are reserved in arrival order,
+so concurrent callers queue fairly rather than spinning.
+
+``APPIAN_RATE_LIMIT`` (requests/second; unset or ``0`` = off) and
+``APPIAN_RATE_BURST`` apply to every host; ``APPIAN_RATE_LIMITS`` overrides
+them per base URL (``https://qa.example.com=5/10,https://prod.example.com=2``
+as ``rate[/burst]``). With ``APPIAN_RATE_LIMIT_DIR`` the bucket state lives in
+``<dir>/<host>.bucket`` under ``flock``, shared by every process on the host.
+Stdlib only: ``async_http`` imports this module.
+"""
+
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runners
+    fcntl = None  # type: ignore[assignment]
+
+from logger import log as _log
+
+# Esperas más largas que esto se informan una por una
+_LOG_WAIT_S = 1.0
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value.strip()) or "_"
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class TokenBucket:
+    """In-process bucket: ``rate`` tokens/second, at most ``burst`` saved up."""
+
+    def __init__(self, host: str, rate: float, burst: float) -> None:
+        self.host = host
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            # Se permite saldo negativo: cada llamada reserva su turno y espera la deuda
+            self.tokens = _refill(self.tokens, self.updated, now, self.rate, self.burst) - 1
+            self.updated = now
+            return max(0.0, -self.tokens / self.rate)
+
+
+class FileTokenBucket(TokenBucket):
+    """Bucket whose state is a file shared by every process on the host."""
+
+    def __init__(self, host: str, rate: float, burst: float, path: Path) -> None:
+        super().__init__(host, rate, burst)
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def reserve(self) -> float:
+        with self._lock, self.path.open("a+") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                fh.seek(0)
+                try:
+                    state = json.loads(fh.read() or "{}")
+                    tokens = float(state["tokens"])
+                    updated = float(state["updated"])
+                except (ValueError, KeyError, TypeError):
+                    tokens, updated = self.burst, 0.0
+                # Reloj de pared: los procesos no comparten el monotónico
+                now = time.time()
+                tokens = _refill(tokens, updated, now, self.rate, self.burst) - 1
+                fh.seek(0)
+                fh.truncate()
+                fh.write(json.dumps({"tokens": tokens, "updated": now}))
+                fh.flush()
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        return max(0.0, -tokens / self.rate)
+
+
+class WaitStats:
+    """Time calls spent waiting on the limiter (process totals)."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.delayed = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, wait_s: float) -> None:
+        with self._lock:
+            self.calls += 1
+            if wait_s > 0:
+                self.delayed += 1
+                self.total_s += wait_s
+                self.max_s = max(self.max_s, wait_s)
+
+
+WAITS = WaitStats()
+
+
+def _parse_overrides(raw: str) -> Dict[str, Tuple[float, Optional[float]]]:
+    overrides: Dict[str, Tuple[float, Optional[float]]] = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        url, spec = item.rsplit("=", 1)
+        match = re.fullmatch(r"\s*([\d.]+)\s*(?:/\s*([\d.]+))?\s*", spec)
+        if not match:
+            raise RuntimeError(f"APPIAN_RATE_LIMITS inválido: {item!r} (use url=rate[/burst])")
+        host = (urlsplit(url.strip()).netloc or url.strip()).lower()
+        burst = float(match.group(2)) if match.group(2) else None
+        overrides[host] = (float(match.group(1)), burst)
+    return overrides
+
+
+_BUCKETS: Dict[str, Optional[TokenBucket]] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def bucket_for(url: str) -> Optional[TokenBucket]:
+    """Return the process-wide bucket for the host of ``url`` (``None``: unlimited)."""
+    host = urlsplit(url).netloc.lower() or url
+    with _BUCKETS_LOCK:
+        if host in _BUCKETS:
+            return _BUCKETS[host]
+        rate = float(os.environ.get("APPIAN_RATE_LIMIT", "0") or 0)
+        burst: Optional[float] = float(os.environ.get("APPIAN_RATE_BURST", "0") or 0) or None
+        override = _parse_overrides(os.environ.get("APPIAN_RATE_LIMITS", "")).get(host)
+        if override is not None:
+            rate, burst = override[0], override[1] or burst
+        bucket: Optional[TokenBucket] = None
+        if rate > 0:
+            burst = burst or max(1.0, rate)
+            shared_dir = os.environ.get("APPIAN_RATE_LIMIT_DIR", "")
+            if shared_dir and fcntl is not None:
+                path = Path(shared_dir).resolve() / f"{_slug(host)}.bucket"
+                bucket = FileTokenBucket(host, rate, burst, path)
+            else:
+                bucket = TokenBucket(host, rate, burst)
+            _log(
+                f"ratelimit=ON host={host} rate={rate:g}/s burst={burst:g} "
+                f"mode={'file' if isinstance(bucket, FileTokenBucket) else 'process'}"
+            )
+        _BUCKETS[host] = bucket
+        return bucket
+
+
+def note_wait(bucket: TokenBucket, wait_s: float, what: str) -> None:
+    WAITS.add(wait_s)
+    if wait_s >= _LOG_WAIT_S:
+        _log(f"ratelimit.wait={wait_s:.1f}s host={bucket.host} {what}")
+
+
+def _report() -> None:
+    if WAITS.delayed:
+        _log(
+            f"ratelimit.total_wait={WAITS.total_s:.1f}s delayed={WAITS.delayed}/{WAITS.calls} "
+            f"max={WAITS.max_s:.1f}s"
+        )
+
+
+atexit.register(_report)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Promote the applications of a release in dependency order.
+
+A release spec (JSON, or YAML with PyYAML installed) lists the applications,
+their artifacts and ``dependsOn``; relative paths are resolved against the
+spec's directory::
+
+    {
+      "name": "release-2026.10",
+      "apps": [
+        {"name": "shared", "package": "dist/shared.zip", "icf": "icf/shared.properties"},
+        {"name": "orders", "package": "dist/orders.zip", "dependsOn": ["shared"]},
+        {"name": "billing", "package": "dist/billing.zip", "dependsOn": ["shared"]}
+      ]
+    }
+
+Each application is inspected and imported only after everything it depends
+on has been imported (the inspection checks precedents against the target);
+independent branches run concurrently on one event loop, at most
+``max_parallel`` at a time. When an application fails, everything downstream
+of it is cancelled without being submitted, while unrelated branches go on.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from checkpoint import Checkpoint
+from utils import log
+
+# Campos del spec por app -> atributo equivalente de los argumentos de promote
+APP_FIELDS = {
+    "package": "package_path",
+    "icf": "icf_path",
+    "adminSettings": "admin_settings_path",
+    "plugins": "plugins_zip",
+    "dbScriptsDir": "db_scripts_dir",
+    "manifest": "manifest",
+}
+_PATH_FIELDS = frozenset(APP_FIELDS)
+_TEXT_FIELDS = ("dataSource", "deploymentName", "description")
+OK_STATUSES = frozenset({"COMPLETED", "SKIPPED"})
+
+
+class ReleaseApp(NamedTuple):
+    name: str
+    depends_on: Tuple[str, ...]
+    paths: Dict[str, Path]
+    data_source: str
+    deployment_name: str
+    description: str
+    skip_inspection: bool
+
+
+class ReleaseSpec(NamedTuple):
+    name: str
+    apps: Dict[str, ReleaseApp]
+
+
+def _read_spec(path: Path) -> dict:
+    if not path.exists():
+        raise FileNotFoundError(f"No existe el spec de release: {path}")
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yml", ".yaml"):
+        # Import diferido: solo los specs YAML necesitan PyYAML
+        try:
+            import yaml
+        except ImportError as exc:
+            raise RuntimeError("PyYAML es necesario para specs YAML; use JSON") from exc
+        data = yaml.safe_load(text)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            raise RuntimeError(f"Spec de release inválido ({path}): {exc}") from exc
+    if not isinstance(data, dict) or not isinstance(data.get("apps"), list) or not data["apps"]:
+        raise RuntimeError(f"El spec de release debe tener una lista 'apps' no vacía: {path}")
+    return data
+
+
+def load_spec(path: Path) -> ReleaseSpec:
+    """Parse and validate the release spec at ``path`` (dependencies included)."""
+    data = _read_spec(path)
+    base_dir = path.resolve().parent
+    defaults = data.get("defaults") or {}
+    apps: Dict[str, ReleaseApp] = {}
+    for raw in data["apps"]:
+        if not isinstance(raw, dict) or not str(raw.get("name") or "").strip():
+            raise RuntimeError(f"Cada app del spec necesita 'name': {raw!r}")
+        entry = {**defaults, **raw}
+        name = str(entry["name"]).strip()
+        if name in apps:
+            raise RuntimeError(f"App duplicada en el spec: {name}")
+        unknown = set(entry) - _PATH_FIELDS - set(_TEXT_FIELDS) - {
+            "name",
+            "dependsOn",
+            "skipInspection",
+        }
+        if unknown:
+            fields = ", ".join(sorted(unknown))
+            raise RuntimeError(f"Campos desconocidos en la app {name}: {fields}")
+        if not entry.get("package"):
+            raise RuntimeError(f"La app {name} no define 'package'")
+        depends_on = entry.get("dependsOn") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        apps[name] = ReleaseApp(
+            name,
+            tuple(str(dep).strip() for dep in depends_on),
+            {
+                field: (base_dir / str(entry[field])).resolve()
+                for field in _PATH_FIELDS
+                if entry.get(field)
+            },
+            str(entry.get("dataSource") or ""),
+            str(entry.get("deploymentName") or ""),
+            str(entry.get("description") or ""),
+            bool(entry.get("skipInspection", False)),
+        )
+    spec = ReleaseSpec(str(data.get("name") or path.stem), apps)
+    plan_waves(spec)
+    return spec
+
+
+def plan_waves(spec: ReleaseSpec) -> List[List[str]]:
+    """Group apps into waves: each wave depends only on earlier ones (Kahn)."""
+    for app in spec.apps.values():
+        missing = [dep for dep in app.depends_on if dep not in spec.apps]
+        if missing:
+            raise RuntimeError(
+                f"La app {app.name} depende de apps inexistentes: {', '.join(missing)}"
+            )
+    pending = {name: set(app.depends_on) for name, app in spec.apps.items()}
+    waves: List[List[str]] = []
+    while pending:
+        # Orden del spec dentro de cada ola: el plan es estable entre corridas
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            raise RuntimeError(f"Dependencias circulares entre: {', '.join(sorted(pending))}")
+        waves.append(ready)
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return waves
+
+
+def downstream(spec: ReleaseSpec, name: str) -> List[str]:
+    """Apps that depend on ``name``, directly or transitively."""
+    found: List[str] = []
+    frontier = [name]
+    while frontier:
+        current = frontier.pop()
+        for app in spec.apps.values():
+            if current in app.depends_on and app.name not in found:
+                found.append(app.name)
+                frontier.append(app.name)
+    return found
+
+
+# promote(app, previous) -> {"status", "uuid", ...}; ``previous``: resultado de una corrida
+# anterior registrado en el checkpoint del release (solo con resume)
+PromoteFn = Callable[[ReleaseApp, Optional[dict]], Awaitable[dict]]
+
+
+class ReleaseScheduler:
+    """Run ``promote`` for every app once its dependencies have completed."""
+
+    def __init__(
+        self,
+        spec: ReleaseSpec,
+        promote: PromoteFn,
+        max_parallel: int = 4,
+        state: Optional[Checkpoint] = None,
+        resume: bool = False,
+    ) -> None:
+        self.spec = spec
+        self.promote = promote
+        self.max_parallel = max(1, max_parallel)
+        self.state = state
+        self.previous: Dict[str, dict] = {}
+        if state is not None:
+            saved = state.resumable(resume)
+            self.previous = dict((saved or {}).get("apps") or {})
+        self.results: Dict[str, dict] = {}
+
+    def _record(self, name: str, result: dict) -> None:
+        self.results[name] = result
+        if self.state is not None and result["status"] in OK_STATUSES:
+            apps = dict(self.state.data.get("apps") or {})
+            apps[name] = {key: result.get(key) for key in ("status", "uuid", "sha256")}
+            self.state.save(state="RUNNING", release=self.spec.name, apps=apps)
+
+    async def _run_app(
+        self,
+        app: ReleaseApp,
+        deps: List["asyncio.Task[dict]"],
+        slots: asyncio.Semaphore,
+    ) -> dict:
+        results = await asyncio.gather(*deps)
+        blocked = [r["name"] for r in results if r["status"] not in OK_STATUSES]
+        if blocked:
+            log(f"release.app=CANCELLED name={app.name} blocked_by={','.join(blocked)}")
+            result = {"name": app.name, "status": "CANCELLED", "blockedBy": blocked}
+            self._record(app.name, result)
+            return result
+        async with slots:
+            log(f"release.app=START name={app.name}")
+            started = time.monotonic()
+            try:
+                outcome = await self.promote(app, self.previous.get(app.name))
+                status = str(outcome.get("status") or "COMPLETED")
+                result = {"name": app.name, **outcome, "status": status}
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                result = {"name": app.name, "status": "FAILED", "error": str(exc)[:2000]}
+                # Solo se cancela lo que depende de esta app; las otras ramas siguen
+                skipped = downstream(self.spec, app.name)
+                log(
+                    f"release.app=FAILED name={app.name} error={type(exc).__name__}: {exc} "
+                    f"cancels={','.join(skipped) or '-'}"
+                )
+            result["durationS"] = round(time.monotonic() - started, 1)
+        if result["status"] in OK_STATUSES:
+            log(
+                f"release.app={result['status']} name={app.name} uuid={result.get('uuid') or '-'} "
+                f"duration={result['durationS']:.0f}s"
+            )
+        self._record(app.name, result)
+        return result
+
+    async def run(self) -> Dict[str, dict]:
+        """Promote every app; returns the result of each one, in spec order."""
+        waves = plan_waves(self.spec)
+        for index, wave in enumerate(waves, 1):
+            log(f"release.plan wave={index} apps={','.join(wave)}")
+        slots = asyncio.Semaphore(self.max_parallel)
+        tasks: Dict[str, "asyncio.Task[dict]"] = {}
+        for wave in waves:
+            for name in wave:
+                app = self.spec.apps[name]
+                deps = [tasks[dep] for dep in app.depends_on]
+                tasks[name] = asyncio.ensure_future(self._run_app(app, deps, slots))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        counts: Dict[str, int] = {}
+        for result in self.results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        log("release=DONE " + " ".join(f"{k.lower()}={v}" for k, v in sorted(counts.items())))
+        if self.state is not None and all(
+            r["status"] in OK_STATUSES for r in self.results.values()
+        ):
+            # Release completo: un re-run con --resume ya no tiene nada que saltar
+            self.state.clear()
+        return {name: self.results[name] for name in self.spec.apps}
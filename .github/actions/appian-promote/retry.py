@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Shared retry policy and per-run retry budget for Appian calls."""
+
+import asyncio
+import os
+import threading
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from errors import AppianError
+from metrics import count_retry
+from utils import log
+
+T = TypeVar("T")
+
+
+class RetryBudget:
+    """Cap on the total number of retries a single run may spend.
+
+    Every policy draws from the same budget, so a degraded tenant cannot make a
+    run retry each call to its own limit one after the other.
+    """
+
+    def __init__(self, total: int) -> None:
+        self.total = max(0, total)
+        self.used = 0
+        self._warned = False
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.total - self.used)
+
+    def consume(self) -> bool:
+        with self._lock:
+            if self.used >= self.total:
+                if not self._warned:
+                    log(f"retry.budget=EXHAUSTED used={self.used}/{self.total}")
+                    self._warned = True
+                return False
+            self.used += 1
+            return True
+
+
+_BUDGET: Optional[RetryBudget] = None
+_BUDGET_LOCK = threading.Lock()
+_JOB_BUDGET: ContextVar[Optional[RetryBudget]] = ContextVar("appian_job_budget", default=None)
+
+
+def retry_budget() -> RetryBudget:
+    """Return the process-wide retry budget (``APPIAN_RETRY_BUDGET``, default 30)."""
+    job = _JOB_BUDGET.get()
+    if job is not None:
+        return job
+    global _BUDGET
+    with _BUDGET_LOCK:
+        if _BUDGET is None:
+            _BUDGET = RetryBudget(int(os.environ.get("APPIAN_RETRY_BUDGET", "30")))
+        return _BUDGET
+
+
+def start_job_retry_budget(total: int) -> RetryBudget:
+    """Give the current context (one service job) its own retry budget."""
+    budget = RetryBudget(total)
+    _JOB_BUDGET.set(budget)
+    return budget
+
+
+class RetryPolicy:
+    """Bounded, budgeted retry schedule for transient Appian errors."""
+
+    def __init__(
+        self,
+        attempts: int,
+        delay_s: float,
+        backoff: float = 1.0,
+        max_delay_s: float = 300.0,
+        budget: Optional[RetryBudget] = None,
+    ) -> None:
+        self.attempts = max(0, attempts)
+        self.delay_s = max(0.0, delay_s)
+        self.backoff = max(1.0, backoff)
+        self.max_delay_s = max_delay_s
+        self.budget = budget or retry_budget()
+
+    @classmethod
+    def from_env(
+        cls,
+        attempts_var: str,
+        default_attempts: int,
+        delay_var: str,
+        default_delay_s: float,
+        backoff: float = 1.0,
+    ) -> "RetryPolicy":
+        return cls(
+            attempts=int(os.environ.get(attempts_var, str(default_attempts))),
+            delay_s=float(os.environ.get(delay_var, str(default_delay_s))),
+            backoff=backoff,
+        )
+
+    def allows(self, exc: BaseException, attempt: int) -> bool:
+        """Whether ``exc`` may be retried as retry number ``attempt`` (1-based)."""
+        if not isinstance(exc, AppianError) or not exc.retryable:
+            return False
+        if attempt > self.attempts:
+            return False
+        if not self.budget.consume():
+            return False
+        count_retry(exc.cause)
+        return True
+
+    def delay_for(self, attempt: int) -> float:
+        delay = self.delay_s * (self.backoff ** max(0, attempt - 1))
+        return min(delay, self.max_delay_s)
+
+    async def run(self, fn: Callable[[], Awaitable[T]], label: str) -> T:
+        """Await ``fn()`` retrying allowed failures; logs ``<label>=RETRY n/N``."""
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except AppianError as exc:
+                attempt += 1
+                if not self.allows(exc, attempt):
+                    raise
+                log(f"{label}=RETRY {attempt}/{self.attempts} ({exc.cause}: {exc.summary})")
+                await asyncio.sleep(self.delay_for(attempt))
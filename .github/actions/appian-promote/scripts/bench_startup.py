@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark of every CLI entry point, with a regression guard.
+
+Each case launches a fresh interpreter, as composite steps do, and measures:
+
+- ``import_ms``: module import time reported by ``-X importtime`` (top-level
+  cumulative, one extra run);
+- ``wall_ms``: process wall time, median of ``--repeat`` runs;
+- ``first_request_ms``: spawn to the first HTTP request reaching a local
+  stand-in server (answers 400, so the CLI stops right after), for the cases
+  that talk to Appian.
+
+``--check`` fails when a case imports a module its path must not need (e.g.
+PyYAML without ``--map``, the import flow for ``inspect``) or exceeds the
+baseline (``--baseline``, written with ``--write-baseline``) by more than
+``--tolerance`` x + ``--slack-ms``. Stdlib only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+ACTIONS_DIR = Path(__file__).resolve().parents[2]
+DEFAULT_BASELINE = Path(__file__).resolve().with_name("startup_baseline.json")
+
+# Fuera de estos caminos no se necesita la pila HTTP ni el perfilador
+_HTTP_STACK = ("asyncio", "ssl", "async_http")
+_PROFILER = ("cProfile", "pstats", "tracemalloc")
+
+
+class Case(NamedTuple):
+    name: str
+    script: str
+    args: Tuple[str, ...]
+    request: bool = False
+    forbid: Tuple[str, ...] = ()
+    env: Tuple[Tuple[str, str], ...] = ()
+
+
+def _cases(base_url: str, work: Path) -> List[Case]:
+    pkg = str(work / "package.zip")
+    auth = ("--base-url", base_url, "--api-key", "bench")
+    urls_file = work / "urls.env"
+    return [
+        Case(
+            "promote.inspect",
+            "appian-promote/appian_cli.py",
+            ("inspect", *auth, "--package-path", pkg),
+            request=True,
+            forbid=("import_cli", "watch", "deploy_queue", "checkpoint", "ledger", *_PROFILER),
+        ),
+        Case(
+            "promote.import",
+            "appian-promote/appian_cli.py",
+            ("import", *auth, "--package-path", pkg),
+            request=True,
+            forbid=("inspect_cli", "watch", *_PROFILER),
+        ),
+        Case(
+            "promote.promote",
+            "appian-promote/appian_cli.py",
+            ("promote", *auth, "--package-path", pkg),
+            request=True,
+            forbid=("watch", *_PROFILER),
+        ),
+        Case(
+            "promote.watch",
+            "appian-promote/appian_cli.py",
+            ("watch", "bench:deployment:bench-uuid", "--base-urls-file", str(urls_file),
+             "--max-wait", "1"),
+            request=True,
+            forbid=("inspect_cli", "import_cli", "deploy_queue", "ledger", *_PROFILER),
+            env=(("APPIAN_BENCH_API_KEY", "bench"),),
+        ),
+        Case(
+            "export.export",
+            "appian-export/appian_cli.py",
+            ("export", *auth, "--kind", "package", "--rid", "bench", "--outdir",
+             str(work / "export")),
+            request=True,
+            forbid=("export_cache", *_PROFILER),
+            env=(("APPIAN_EXPORT_RETRIES", "0"),),
+        ),
+        Case(
+            "resolve-package",
+            "appian-resolve-package/appian_cli.py",
+            ("resolve", *auth, "--app-uuid", "bench", "--package-name", "bench"),
+            request=True,
+            forbid=_PROFILER,
+        ),
+        Case(
+            "icf-build",
+            "appian-build-icf/icf_build.py",
+            ("--template", str(work / "template.properties"), "--env", "dev", "--out",
+             str(work / "icf.properties")),
+            forbid=("yaml", *_HTTP_STACK, *_PROFILER),
+            env=(("ICF_JSON_OVERRIDES", "constant.BENCH=1"),),
+        ),
+        Case(
+            "resolve-api-key",
+            "appian-promote/scripts/resolve_api_key.py",
+            ("--help",),
+            forbid=(*_HTTP_STACK, *_PROFILER),
+        ),
+        Case(
+            "artifact-name",
+            "appian-export/scripts/artifact_name.py",
+            ("--help",),
+            forbid=(*_HTTP_STACK, *_PROFILER),
+        ),
+        Case(
+            "export-postprocess",
+            "appian-export/scripts/export_postprocess.py",
+            ("--help",),
+            forbid=(*_HTTP_STACK, *_PROFILER),
+        ),
+        Case(
+            "resource-resolver",
+            "appian-export/scripts/resource_resolver.py",
+            ("--help",),
+            forbid=(*_HTTP_STACK, *_PROFILER),
+        ),
+        Case(
+            "prepare-db-scripts",
+            "appian-prepare-db-scripts/prepare_db_scripts.py",
+            ("--help",),
+            forbid=(*_HTTP_STACK, *_PROFILER),
+        ),
+    ]
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    first_at: Optional[float] = None
+
+    def _answer(self) -> None:
+        if _StandIn.first_at is None:
+            _StandIn.first_at = time.monotonic()
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = b'{"title": "bench"}'
+        self.send_response(400)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _answer
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def _prepare(work: Path, base_url: str) -> None:
+    with zipfile.ZipFile(work / "package.zip", "w") as zf:
+        # upload.PreparedUpload rechaza paquetes de menos de 1 KiB
+        zf.writestr("META-INF/MANIFEST.MF", "bench\n" + "#" * 2048)
+    (work / "template.properties").write_text("#constant.BENCH=\n", encoding="utf-8")
+    (work / "urls.env").write_text(f"BENCH={base_url}\n", encoding="utf-8")
+
+
+def _env(case: Case) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("APPIAN_")}
+    env.update(case.env)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    # Como en las actions: los helpers encuentran profiling/logger por PYTHONPATH
+    env["PYTHONPATH"] = str(ACTIONS_DIR / "appian-promote")
+    return env
+
+
+def _run_once(case: Case) -> Tuple[float, Optional[float]]:
+    _StandIn.first_at = None
+    cmd = [sys.executable, str(ACTIONS_DIR / case.script), *case.args]
+    started = time.monotonic()
+    subprocess.run(cmd, env=_env(case), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.monotonic() - started
+    first = _StandIn.first_at - started if _StandIn.first_at is not None else None
+    return wall * 1000, first * 1000 if first is not None else None
+
+
+def _import_profile(case: Case) -> Tuple[float, List[str]]:
+    cmd = [sys.executable, "-X", "importtime", str(ACTIONS_DIR / case.script), *case.args]
+    proc = subprocess.run(
+        cmd, env=_env(case), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    total_us = 0
+    modules: List[str] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # cabecera
+        modules.append(name.strip())
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def measure(case: Case, repeat: int) -> dict:
+    import_ms, modules = _import_profile(case)
+    runs = [_run_once(case) for _ in range(repeat)]
+    firsts = [first for _, first in runs if first is not None]
+    result = {
+        "import_ms": round(import_ms, 1),
+        "wall_ms": round(statistics.median(wall for wall, _ in runs), 1),
+        "modules": len(modules),
+        "forbidden": sorted(set(case.forbid) & set(modules)),
+    }
+    if case.request:
+        result["first_request_ms"] = round(statistics.median(firsts), 1) if firsts else None
+    return result
+
+
+def check(
+    results: Dict[str, dict],
+    baseline: Dict[str, dict],
+    tolerance: float,
+    slack_ms: float,
+) -> List[str]:
+    """Forbidden imports, CLIs that never reached the network and slowdowns."""
+    problems: List[str] = []
+    for name, result in results.items():
+        if result["forbidden"]:
+            problems.append(f"{name}: importa {', '.join(result['forbidden'])}")
+        if "first_request_ms" in result and result["first_request_ms"] is None:
+            problems.append(f"{name}: el CLI no llegó a enviar ningún request")
+        for metric in ("import_ms", "first_request_ms", "wall_ms"):
+            reference = (baseline.get(name) or {}).get(metric)
+            value = result.get(metric)
+            if reference is None or value is None:
+                continue
+            limit = reference * tolerance + slack_ms
+            if value > limit:
+                problems.append(
+                    f"{name}: {metric}={value:.0f}ms > {limit:.0f}ms (baseline {reference:.0f}ms)"
+                )
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--repeat", type=int, default=5, help="Corridas por caso (mediana)")
+    p.add_argument("--case", action="append", default=[], help="Solo estos casos (repetible)")
+    p.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    p.add_argument("--write-baseline", action="store_true", help="Guarda los resultados")
+    p.add_argument("--check", action="store_true", help="Falla ante regresiones")
+    p.add_argument("--tolerance", type=float, default=1.5, help="Factor sobre el baseline")
+    p.add_argument("--slack-ms", type=float, default=25.0, help="Margen absoluto (ruido)")
+    p.add_argument("--json-output", default="", help="Archivo con los resultados")
+    args = p.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="appian-bench-") as tmp:
+        work = Path(tmp)
+        _prepare(work, base_url)
+        for case in _cases(base_url, work):
+            if args.case and case.name not in args.case:
+                continue
+            results[case.name] = measure(case, max(1, args.repeat))
+            r = results[case.name]
+            first = r.get("first_request_ms")
+            print(
+                f"{case.name:<20} import={r['import_ms']:>6.1f}ms wall={r['wall_ms']:>6.1f}ms "
+                f"first_request={'-' if first is None else f'{first:.1f}ms':>9} "
+                f"modules={r['modules']}"
+                + (f" FORBIDDEN={','.join(r['forbidden'])}" if r["forbidden"] else ""),
+                file=sys.stderr,
+            )
+    server.shutdown()
+
+    payload = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if args.json_output:
+        Path(args.json_output).write_text(payload, encoding="utf-8")
+    if args.write_baseline:
+        Path(args.baseline).write_text(payload, encoding="utf-8")
+        print(f"baseline escrito en {args.baseline}", file=sys.stderr)
+    if args.check:
+        baseline_path = Path(args.baseline)
+        baseline = (
+            json.loads(baseline_path.read_text(encoding="utf-8"))
+            if baseline_path.exists()
+            else {}
+        )
+        problems = check(results, baseline, args.tolerance, args.slack_ms)
+        for problem in problems:
+            print(f"::error::startup: {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print("startup: sin regresiones", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Check the deployment log parser against a log and its ``summary.objects``.
+
+Without arguments parses ``deploy_log_sample.txt`` (real Appian phrasing,
+including successes reported "with 0 errors") and compares the counts with
+its import summary. ``--log`` and ``--summary`` (a deployment result JSON or
+just its ``summary.objects``) check any other log. Exits 1 with
+``::error::`` lines on a mismatch. Stdlib only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from deploy_log import DeploymentLogParser  # noqa: E402
+
+SAMPLE_LOG = Path(__file__).resolve().with_name("deploy_log_sample.txt")
+SAMPLE_SUMMARY = {"imported": 4, "failed": 2, "skipped": 1}
+SAMPLE_FAILED_CODES = {"APNX-1-4198-004", "APNX-1-4205-013"}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--log", default=str(SAMPLE_LOG), help="Log de deployment a parsear")
+    p.add_argument("--summary", default="", help="JSON con summary.objects del deployment")
+    args = p.parse_args(argv)
+
+    parser = DeploymentLogParser()
+    with open(args.log, "rb") as fh:
+        for chunk in iter(lambda: fh.read(4096), b""):
+            parser.feed(chunk)
+    parser.close()
+    if args.summary:
+        data = json.loads(Path(args.summary).read_text(encoding="utf-8"))
+        summary = (data.get("summary") or {}).get("objects") or data
+    else:
+        summary = SAMPLE_SUMMARY
+    report = parser.report(summary)
+    problems = list(report["mismatches"])
+    if not args.summary and Path(args.log) == SAMPLE_LOG:
+        codes = {failure["code"] for failure in report["failures"]}
+        if codes != SAMPLE_FAILED_CODES:
+            problems.append(f"códigos de falla: {sorted(codes)} != {sorted(SAMPLE_FAILED_CODES)}")
+    print(json.dumps(report["counts"], sort_keys=True), file=sys.stderr)
+    for problem in problems:
+        print(f"::error::deploy_log: {problem}", file=sys.stderr)
+    if problems:
+        return 1
+    print("deploy_log: coincide con el resumen", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""Concurrent load generator for export/inspect/import flows.
+
+Each flow runs the real ``export_resource``, ``inspect_package`` and
+``import_package`` (the exported package is what gets inspected and imported)
+against a local stand-in of the Deployment Management API. Flows arrive at
+``--rate`` per second (``0`` = all at once; ``--poisson`` for exponential
+gaps) and are served by ``--workers`` processes, one flow at a time each, like
+parallel jobs on one runner host. ``--workers 1,2,4,8`` sweeps several levels.
+
+The stand-in completes each deployment/inspection after ``--*-delay`` seconds,
+runs at most ``--tenant-slots`` of them at once (the rest wait in line, as in
+a tenant's internal queue), adds ``--latency-ms`` to every response and fails
+``--error-rate`` of the requests with 503.
+
+Reported per level: throughput, p50/p95/p99 latency per phase (plus the wait
+between arrival and pickup), errors, and CPU time and max RSS per worker.
+CLI logs go to ``<workdir>/worker-<n>.log``. Stdlib only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows runners
+    resource = None  # type: ignore[assignment]
+
+ACTIONS_DIR = Path(__file__).resolve().parents[2]
+PROMOTE_DIR = ACTIONS_DIR / "appian-promote"
+API_PATH = "/suite/deployment-management/v2"
+PHASES = ("export", "inspect", "import")
+_ROUTE = re.compile(
+    r"^/suite/deployment-management/v2/(?P<kind>deployments|inspections)"
+    r"(?:/(?P<uuid>[0-9a-f-]+)(?:/(?P<sub>[a-z-]+))?)?/?$"
+)
+
+
+# --- Stand-in API ------------------------------------------------------------
+
+
+class Tenant:
+    """Jobs of the stand-in tenant: at most ``slots`` run at once, FIFO."""
+
+    def __init__(self, delays: Dict[str, float], slots: int, package: bytes) -> None:
+        self.delays = delays
+        self.slots = slots
+        self.package = package
+        self._lock = threading.Lock()
+        self._free_at: List[float] = []
+        self.jobs: Dict[str, dict] = {}
+        self.requests = 0
+        self.errors = 0
+        self.max_backlog = 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._free_at = []
+            self.jobs = {}
+            self.requests = self.errors = self.max_backlog = 0
+
+    def submit(self, kind: str) -> str:
+        now = time.monotonic()
+        with self._lock:
+            start = now
+            if self.slots > 0:
+                # Sin slot libre, el job espera al que termine primero (como la cola del tenant)
+                while len(self._free_at) >= self.slots:
+                    start = max(start, heapq.heappop(self._free_at))
+            done_at = start + self.delays[kind]
+            if self.slots > 0:
+                heapq.heappush(self._free_at, done_at)
+            job_id = str(uuid.uuid4())
+            self.jobs[job_id] = {"kind": kind, "done_at": done_at}
+            backlog = sum(1 for job in self.jobs.values() if job["done_at"] > now)
+            self.max_backlog = max(self.max_backlog, backlog)
+        return job_id
+
+    def note_request(self, failed: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+
+    def status(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if time.monotonic() < job["done_at"]:
+            return {"status": "IN_PROGRESS"}
+        return {"status": "COMPLETED", "kind": job["kind"]}
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    tenant: Tenant
+    latency_s = 0.0
+    error_rate = 0.0
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _send(self, code: int, body: object, content_type: str = "application/json") -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _drain(self) -> None:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                self.rfile.read(size + 2)
+                if size == 0:
+                    return
+        length = int(self.headers.get("Content-Length") or 0)
+        while length > 0:
+            length -= len(self.rfile.read(min(length, 1 << 16)))
+
+    def _url(self, *parts: str) -> str:
+        return f"http://{self.headers['Host']}{API_PATH}/" + "/".join(parts)
+
+    def _handle(self) -> None:
+        tenant = self.tenant
+        self._drain()
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        failed = bool(self.error_rate) and random.random() < self.error_rate
+        tenant.note_request(failed)
+        if failed:
+            self._send(503, {"title": "Service Unavailable (load test)"})
+            return
+        route = _ROUTE.match(self.path.split("?", 1)[0])
+        if route is None:
+            self._send(404, {"title": "Not Found"})
+            return
+        kind, job_id, sub = route.group("kind", "uuid", "sub")
+        if self.command == "POST" and job_id is None:
+            if kind == "inspections":
+                job_id = tenant.submit("inspect")
+            else:
+                action = self.headers.get("Action-Type", "").lower()
+                job_id = tenant.submit("export" if action == "export" else "import")
+            url = self._url(kind, job_id)
+            self._send(200, {"uuid": job_id, "url": url, "status": "IN_PROGRESS"})
+            return
+        if self.command != "GET" or job_id is None:
+            self._send(405, {"title": "Method Not Allowed"})
+            return
+        state = tenant.status(job_id)
+        if state is None:
+            self._send(404, {"title": "Not Found"})
+        elif sub == "package-zip":
+            self._send(200, tenant.package, "application/zip")
+        elif sub == "log":
+            self._send(200, b"Import finished\n", "text/plain")
+        elif sub:
+            self._send(404, {"title": "Not Found"})
+        elif state["status"] != "COMPLETED":
+            self._send(200, state)
+        elif state["kind"] == "export":
+            package_url = self._url(kind, job_id, "package-zip")
+            self._send(200, {"status": "COMPLETED", "packageZip": package_url})
+        elif state["kind"] == "inspect":
+            self._send(200, {"status": "COMPLETED", "summary": {"problems": {"totalErrors": 0}}})
+        else:
+            objects = {"imported": 1, "failed": 0, "skipped": 0}
+            self._send(200, {"status": "COMPLETED", "summary": {"objects": objects}})
+
+    do_GET = do_POST = _handle
+
+
+def _package(size_kb: int) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        # Contenido incompresible: el tamaño en el cable es el pedido
+        zf.writestr("content/payload.bin", os.urandom(max(2, size_kb) * 1024))
+    return buf.getvalue()
+
+
+# --- Workers -----------------------------------------------------------------
+
+
+def _load_export_cli():
+    # appian-export/appian_cli.py y appian-promote/appian_cli.py comparten nombre de módulo
+    spec = importlib.util.spec_from_file_location(
+        "appian_export_cli", ACTIONS_DIR / "appian-export" / "appian_cli.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _cpu_s() -> float:
+    times = os.times()
+    return times.user + times.system
+
+
+def _worker(
+    index: int,
+    base_url: str,
+    work: str,
+    phases: Tuple[str, ...],
+    tasks: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+) -> None:
+    log_path = Path(work) / f"worker-{index}.log"
+    with log_path.open("a", encoding="utf-8") as fh:
+        os.dup2(fh.fileno(), 2)
+    sys.path.insert(0, str(PROMOTE_DIR))
+    from import_cli import import_package
+    from inspect_cli import inspect_package
+
+    export_resource = _load_export_cli().export_resource
+    results.put(("ready", index))
+    # CPU de los flujos solamente: el arranque y los imports quedan fuera
+    cpu_at_ready = _cpu_s()
+    done = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        flow, arrived = task
+        record = {"flow": flow, "worker": index, "wait": time.time() - arrived, "phases": {}}
+        package = Path(work) / f"flow-{flow}" / "package.zip"
+        try:
+            for phase in phases:
+                started = time.perf_counter()
+                if phase == "export":
+                    export_resource(base_url, "load-test", "package", f"pkg-{flow}", package)
+                elif phase == "inspect":
+                    inspect_package(base_url, "load-test", package)
+                else:
+                    import_package(base_url, "load-test", package, name=f"Load test {flow}")
+                record["phases"][phase] = time.perf_counter() - started
+            record["ok"] = True
+        except BaseException as exc:  # noqa: BLE001 - se reporta cualquier falla del flujo
+            record["ok"] = False
+            record["error"] = f"{type(exc).__name__}: {exc}"[:300]
+        record["total"] = sum(record["phases"].values())
+        record["finished"] = time.time()
+        done += 1
+        results.put(("flow", record))
+    cpu_s = _cpu_s()
+    usage = resource.getrusage(resource.RUSAGE_SELF) if resource is not None else None
+    results.put(
+        (
+            "worker",
+            {
+                "worker": index,
+                "pid": os.getpid(),
+                "flows": done,
+                "cpu_s": round(cpu_s - cpu_at_ready, 3),
+                # ru_maxrss: KiB en Linux, bytes en macOS
+                "max_rss_mb": (
+                    usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+                    if usage
+                    else None
+                ),
+                "log": str(log_path),
+            },
+        )
+    )
+
+
+# --- Driver ------------------------------------------------------------------
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (``q`` in 0..100); ``None`` without samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _latency(values: List[float]) -> Dict[str, Optional[float]]:
+    stats = {f"p{q}": percentile(values, q) for q in (50, 95, 99)}
+    stats["max"] = max(values) if values else None
+    return {key: round(value, 3) if value is not None else None for key, value in stats.items()}
+
+
+def run_level(args: argparse.Namespace, workers: int, tenant: Tenant, base_url: str) -> dict:
+    tenant.reset()
+    ctx = multiprocessing.get_context("spawn")
+    tasks, results = ctx.Queue(), ctx.Queue()
+    work = tempfile.mkdtemp(prefix=f"w{workers}-", dir=args.workdir)
+    phases = tuple(args.phases)
+    procs = [
+        ctx.Process(target=_worker, args=(i, base_url, work, phases, tasks, results), daemon=True)
+        for i in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    # Las llegadas empiezan con los workers ya importados: el arranque no cuenta como espera
+    for _ in procs:
+        results.get()
+
+    started = time.time()
+    rng = random.Random(args.seed)
+    for flow in range(args.flows):
+        tasks.put((flow, time.time()))
+        if args.rate > 0 and flow + 1 < args.flows:
+            gap = rng.expovariate(args.rate) if args.poisson else 1.0 / args.rate
+            time.sleep(gap)
+    for _ in procs:
+        tasks.put(None)
+
+    # Leer antes de join: un proceso con datos pendientes en la Queue no termina
+    flows: List[dict] = []
+    per_worker: List[dict] = []
+    while len(flows) < args.flows or len(per_worker) < workers:
+        kind, payload = results.get()
+        (flows if kind == "flow" else per_worker).append(payload)
+        if kind == "flow" and len(flows) % max(1, args.flows // 10) == 0:
+            print(f"  workers={workers} flows={len(flows)}/{args.flows}", file=sys.stderr)
+    for proc in procs:
+        proc.join()
+    finished = max((f["finished"] for f in flows), default=started)
+    elapsed = max(finished - started, 1e-9)
+
+    ok = [f for f in flows if f["ok"]]
+    for worker in per_worker:
+        worker["cpu_pct"] = round(100 * worker["cpu_s"] / elapsed, 1)
+    latency = {phase: _latency([f["phases"][phase] for f in ok]) for phase in phases}
+    latency["flow"] = _latency([f["total"] for f in ok])
+    latency["wait"] = _latency([f["wait"] for f in flows])
+    return {
+        "workers": workers,
+        "flows": len(flows),
+        "ok": len(ok),
+        "failed": len(flows) - len(ok),
+        "errors": sorted({f["error"] for f in flows if not f["ok"]})[:10],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_min": round(60 * len(ok) / elapsed, 2),
+        "latency_s": latency,
+        "workers_usage": sorted(per_worker, key=lambda w: w["worker"]),
+        "server": {
+            "requests": tenant.requests,
+            "injected_errors": tenant.errors,
+            "max_backlog": tenant.max_backlog,
+        },
+        "workdir": work,
+    }
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def _print_level(level: dict) -> None:
+    print(
+        f"workers={level['workers']} ok={level['ok']}/{level['flows']} "
+        f"elapsed={level['elapsed_s']}s throughput={level['throughput_per_min']}/min "
+        f"requests={level['server']['requests']} max_backlog={level['server']['max_backlog']}"
+    )
+    for phase, stats in level["latency_s"].items():
+        print(
+            f"  {phase:<8} p50={_fmt(stats['p50'])}s p95={_fmt(stats['p95'])}s "
+            f"p99={_fmt(stats['p99'])}s max={_fmt(stats['max'])}s"
+        )
+    for worker in level["workers_usage"]:
+        print(
+            f"  worker {worker['worker']}: flows={worker['flows']} cpu={_fmt(worker['cpu_s'])}s "
+            f"({worker.get('cpu_pct', '-')}%) max_rss={_fmt(worker['max_rss_mb'])}MB"
+        )
+    for error in level["errors"]:
+        print(f"  error: {error}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--workers", default="4", help="Procesos concurrentes; lista = barrido (1,2,4)")
+    p.add_argument("--flows", type=int, default=20, help="Flujos por nivel")
+    p.add_argument("--rate", type=float, default=0.0, help="Llegadas por segundo (0 = todas ya)")
+    p.add_argument("--poisson", action="store_true", help="Llegadas con gaps exponenciales")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument(
+        "--phases",
+        type=lambda raw: [x for x in raw.split(",") if x],
+        default=list(PHASES),
+        help="Fases de cada flujo, en orden (default export,inspect,import)",
+    )
+    p.add_argument("--export-delay", type=float, default=3.0, help="Segundos del export en Appian")
+    p.add_argument("--inspect-delay", type=float, default=2.0)
+    p.add_argument("--import-delay", type=float, default=5.0)
+    p.add_argument("--tenant-slots", type=int, default=0, help="Jobs a la vez (0 = sin límite)")
+    p.add_argument("--latency-ms", type=float, default=0.0, help="Latencia por respuesta")
+    p.add_argument("--error-rate", type=float, default=0.0, help="Fracción de requests con 503")
+    p.add_argument("--package-kb", type=int, default=512, help="Tamaño del paquete exportado")
+    p.add_argument("--poll-interval", type=int, default=1, help="APPIAN_*_POLL_INTERVAL")
+    p.add_argument("--workdir", default="", help="Directorio de trabajo (default temporal)")
+    p.add_argument("--json-output", default="", help="Archivo con el reporte completo")
+    args = p.parse_args(argv)
+    unknown = set(args.phases) - set(PHASES)
+    if unknown or not args.phases:
+        p.error(f"--phases inválidas: {', '.join(sorted(unknown)) or '(vacío)'}")
+    if "export" not in args.phases:
+        p.error("--phases debe incluir export: inspect/import usan el paquete exportado")
+    levels = [int(x) for x in args.workers.split(",") if x.strip()]
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="appian-load-")
+    Path(args.workdir).mkdir(parents=True, exist_ok=True)
+
+    # Los workers (spawn) heredan el entorno: polls rápidos y sin APPIAN_DEADLINE del job
+    os.environ["APPIAN_EXPORT_POLL_INTERVAL"] = str(args.poll_interval)
+    os.environ["APPIAN_PROMOTE_POLL_INTERVAL"] = str(args.poll_interval)
+    os.environ.pop("APPIAN_DEADLINE", None)
+
+    delays = {
+        "export": args.export_delay,
+        "inspect": args.inspect_delay,
+        "import": args.import_delay,
+    }
+    tenant = Tenant(delays, args.tenant_slots, _package(args.package_kb))
+    _StandIn.tenant = tenant
+    _StandIn.latency_s = args.latency_ms / 1000
+    _StandIn.error_rate = args.error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"stand-in={base_url} workdir={args.workdir}", file=sys.stderr)
+
+    report = {"config": {k: v for k, v in vars(args).items() if k != "json_output"}, "levels": []}
+    try:
+        for workers in levels:
+            level = run_level(args, workers, tenant, base_url)
+            report["levels"].append(level)
+            _print_level(level)
+    finally:
+        server.shutdown()
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"reporte escrito en {args.json_output}", file=sys.stderr)
+    return 1 if any(level["failed"] for level in report["levels"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,8 @@ import sys
 from pathlib import Path
 from typing import Dict
 
+from profiling import run_main
+
 
 ENV_ALIAS: Dict[str, str] = {
     "dev": "APPIAN_DEV_API_KEY",
@@ -83,4 +85,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_main(main, "resolve-api-key"))
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""Long-running promotion service and the thin client the CLIs use to reach it.
+
+``appian_cli.py serve`` listens on a Unix socket (``--socket``, mode 0600) or
+a localhost TCP port (``--port``) and runs export/inspect/import/promote jobs
+on a pool of ``--workers`` threads. Each worker keeps its own event loop and
+pooled ``HttpClient`` between jobs, so connections (and TLS sessions) to every
+tenant stay warm, and config, imports and rate-limit buckets are built once.
+
+Protocol: one JSON request line, answered with JSON lines until the job ends::
+
+    -> {"op": "run", "cli": "promote", "command": "import", "args": {...}}
+    <- {"event": "accepted", "job": 7, "running": 1, "queued": 0}
+    <- {"event": "log", "line": "deploy.status=IN_PROGRESS uuid=..."}
+    <- {"event": "result", "job": 7, "exitCode": 0, "output": "", "durationS": 42.1}
+
+``{"op": "status"}`` returns the counters and the warm connections per origin.
+The same requests are accepted as HTTP (``POST /jobs``, ``GET /status``), so
+``curl --unix-socket`` works too. With ``APPIAN_SERVICE`` (socket path or
+``host:port``) the export and promote CLIs parse their usual arguments, send
+them here with paths made absolute, and print the job's log lines and output
+as if they had run locally; if the service is down they run locally.
+
+Each job gets its own ``APPIAN_DEADLINE`` (from the client's environment,
+counted from submission) and retry budget. The other settings the CLIs read
+from the environment (``SERVICE_ENV``: poll waits, store, rate limits, queue,
+``RUNNER_TEMP``...) come from the service's, so the client sends its values
+and the service refuses the job when they differ; the client then runs it
+locally. Per-run variables only the action steps read (``APPIAN_BASE_URL``,
+``APPIAN_SOURCE_ENV``...) are not compared. Metrics and profiles are
+per process, so a client with ``APPIAN_METRICS_*``/``APPIAN_PROFILE`` runs
+locally without asking.
+
+``--port`` requires ``APPIAN_SERVICE_TOKEN``: every request carries it
+(``"token"`` in the JSON line, ``Authorization: Bearer`` over HTTP). On a Unix
+socket the file mode is enough, but a configured token is checked as well.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import hmac
+import importlib.util
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from async_http import warm_connections
+from deadline import start_job_deadline
+from logger import flush_logs, log_line, set_log_sink
+from retry import start_job_retry_budget
+from utils import log
+
+PROTOCOL_VERSION = 2
+# Variables que los CLIs servidos leen del entorno del proceso: cliente y servicio deben
+# coincidir. Lo que el cliente ya pasa como argumento (APPIAN_BASE_URL, APPIAN_TARGET_ENV,
+# APPIAN_MANIFEST_ALLOW_UNLISTED), lo que viaja por job (APPIAN_DEADLINE,
+# APPIAN_RETRY_BUDGET) y lo que solo leen los pasos bash de las actions no se compara.
+# Una variable nueva que lean los CLIs va aquí.
+SERVICE_ENV = frozenset(
+    {
+        "APPIAN_ARTIFACT_STORE",
+        "APPIAN_ARTIFACT_STORE_LINK",
+        "APPIAN_ARTIFACT_STORE_MAX_MB",
+        "APPIAN_CHECKPOINT_DIR",
+        "APPIAN_CIRCUIT_COOLDOWN",
+        "APPIAN_CIRCUIT_FAILURE_THRESHOLD",
+        "APPIAN_DB_LEDGER_DIR",
+        "APPIAN_DEADLINE_MIN_PHASE",
+        "APPIAN_EXPORT_MAX_WAIT",
+        "APPIAN_EXPORT_POLL_INTERVAL",
+        "APPIAN_EXPORT_RETRIES",
+        "APPIAN_EXPORT_RETRY_DELAY",
+        "APPIAN_HASH_WORKERS",
+        "APPIAN_HTTP_CASSETTE",
+        "APPIAN_HTTP_LATENCY_SCALE",
+        "APPIAN_HTTP_MODE",
+        "APPIAN_LOG_BUFFER",
+        "APPIAN_LOG_COLLAPSE_S",
+        "APPIAN_LOG_FLUSH_S",
+        "APPIAN_LOG_FORMAT",
+        "APPIAN_LOG_LEVEL",
+        "APPIAN_MAX_CONCURRENCY",
+        "APPIAN_METRICS_FILE",
+        "APPIAN_METRICS_LABELS",
+        "APPIAN_METRICS_PUSH_METHOD",
+        "APPIAN_METRICS_PUSH_TIMEOUT",
+        "APPIAN_METRICS_PUSH_URL",
+        "APPIAN_PACKAGE_PAGE_SIZE",
+        "APPIAN_POLL_HISTORY",
+        "APPIAN_POLL_MAX_INTERVAL",
+        "APPIAN_PROFILE",
+        "APPIAN_PROMOTE_IMPORT_RETRIES",
+        "APPIAN_PROMOTE_INSPECTION_RETRIES",
+        "APPIAN_PROMOTE_MAX_WAIT",
+        "APPIAN_PROMOTE_POLL_INTERVAL",
+        "APPIAN_PROMOTE_RETRY_DELAY",
+        "APPIAN_QUEUE_BACKEND",
+        "APPIAN_QUEUE_DIR",
+        "APPIAN_QUEUE_LANE",
+        "APPIAN_QUEUE_MAX_WAIT",
+        "APPIAN_QUEUE_POLL_INTERVAL",
+        "APPIAN_QUEUE_STALE",
+        "APPIAN_RATE_BURST",
+        "APPIAN_RATE_LIMIT",
+        "APPIAN_RATE_LIMITS",
+        "APPIAN_RATE_LIMIT_DIR",
+        "APPIAN_RELEASE_MAX_PARALLEL",
+        "APPIAN_THROUGHPUT_BPS",
+        "APPIAN_TIMEOUT_SAFETY",
+        "APPIAN_VERIFY_CACHE",
+        "RUNNER_DEBUG",
+        "RUNNER_TEMP",
+    }
+)
+# Métricas y perfiles son del proceso: en el servicio solo saldrían al pararlo
+_LOCAL_ONLY_ENV = ("APPIAN_METRICS_FILE", "APPIAN_METRICS_PUSH_URL", "APPIAN_PROFILE")
+# Argumentos de los CLIs que son rutas: el cliente los resuelve contra su cwd
+PATH_ARGS = frozenset(
+    {
+        "package_path",
+        "customization_path",
+        "icf_path",
+        "admin_settings_path",
+        "plugins_zip",
+        "db_scripts_dir",
+        "manifest",
+        "verify_cache",
+        "json_output",
+        "checkpoint_dir",
+        "db_ledger_dir",
+        "queue_dir",
+        "spec",
+        "outdir",
+    }
+)
+SERVED_COMMANDS = {
+    "promote": frozenset({"inspect", "import", "promote", "release"}),
+    "export": frozenset({"export"}),
+}
+_MAX_REQUEST = 1024 * 1024
+
+# (args) -> texto para stdout (o None); errores como excepciones, como en el CLI
+Runner = Callable[[argparse.Namespace], Optional[str]]
+
+
+def shared_env() -> Dict[str, str]:
+    """The ``SERVICE_ENV`` settings a served job takes from the service's environment."""
+    return {key: os.environ[key] for key in SERVICE_ENV if key in os.environ}
+
+
+def _env_mismatch(client_env: Dict[str, str]) -> List[str]:
+    ours = shared_env()
+    return sorted(k for k in set(ours) | set(client_env) if ours.get(k) != client_env.get(k))
+
+
+def _load_export_cli():
+    # appian-export/appian_cli.py y appian-promote/appian_cli.py comparten nombre de módulo
+    spec = importlib.util.spec_from_file_location(
+        "appian_export_cli",
+        Path(__file__).resolve().parent.parent / "appian-export" / "appian_cli.py",
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _export_runner() -> Runner:
+    run_export = _load_export_cli().run_export
+
+    def _run(args: argparse.Namespace) -> Optional[str]:
+        return json.dumps(run_export(args))
+
+    return _run
+
+
+class _Job:
+    def __init__(self, job_id: int, request: dict, loop: asyncio.AbstractEventLoop) -> None:
+        self.id = job_id
+        self.cli = str(request.get("cli") or "")
+        self.command = str(request.get("command") or "")
+        self.args = dict(request.get("args") or {})
+        self.deadline_s = float(request.get("deadline") or 0)
+        self.retry_budget = int(request.get("retryBudget") or 0)
+        self.events: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+        self.loop = loop
+        self.submitted = time.monotonic()
+
+    def emit(self, event: dict) -> None:
+        # Se llama desde el hilo worker: la cola pertenece al loop del servidor
+        self.loop.call_soon_threadsafe(self.events.put_nowait, event)
+
+
+class PromotionService:
+    """Accept jobs over a stream socket and run them on a thread pool."""
+
+    def __init__(
+        self, runners: Dict[str, Runner], workers: int = 4, token: str = ""
+    ) -> None:
+        self.runners = runners
+        self.token = token
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="appian-job")
+        self.started = time.monotonic()
+        self.counts = {"running": 0, "queued": 0, "completed": 0, "failed": 0}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "version": PROTOCOL_VERSION,
+            "workers": self.workers,
+            "uptimeS": round(time.monotonic() - self.started, 1),
+            **counts,
+            "warmConnections": warm_connections(),
+        }
+
+    def _execute(self, job: _Job) -> Tuple[int, str]:
+        with self._lock:
+            self.counts["queued"] -= 1
+            self.counts["running"] += 1
+        set_log_sink(lambda line: job.emit({"event": "log", "line": line}))
+        deadline_s = job.deadline_s or float(os.environ.get("APPIAN_DEADLINE", "0") or 0)
+        start_job_deadline(deadline_s)
+        start_job_retry_budget(
+            job.retry_budget or int(os.environ.get("APPIAN_RETRY_BUDGET", "30"))
+        )
+        try:
+            output = self.runners[job.cli](argparse.Namespace(**job.args))
+            return 0, output or ""
+        except SystemExit as exc:
+            code = exc.code if exc.code is not None else 0
+            return (code if isinstance(code, int) else 1), ""
+        except Exception:
+            # Mismo texto que el traceback del CLI local, pero en el stderr del cliente
+            for line in traceback.format_exc().rstrip("\n").split("\n"):
+                job.emit({"event": "log", "line": line})
+            return 1, ""
+        finally:
+            with self._lock:
+                self.counts["running"] -= 1
+
+    def _authorized(self, token: Any) -> bool:
+        if not self.token:
+            return True
+        return isinstance(token, str) and hmac.compare_digest(token, self.token)
+
+    async def _run(self, request: dict, send: Callable[[dict], Any]) -> None:
+        cli, command = str(request.get("cli") or ""), str(request.get("command") or "")
+        if cli not in self.runners or command not in SERVED_COMMANDS.get(cli, ()):
+            await send({"event": "error", "error": f"Comando no soportado: {cli} {command}"})
+            return
+        mismatch = _env_mismatch(dict(request.get("env") or {}))
+        if mismatch:
+            log(f"service.job=REJECTED cmd={cli}:{command} env distinto: {','.join(mismatch)}")
+            await send(
+                {
+                    "event": "error",
+                    "code": "env_mismatch",
+                    "error": f"Entorno distinto al del servicio: {', '.join(mismatch)}",
+                }
+            )
+            return
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._next_id += 1
+            job = _Job(self._next_id, request, loop)
+            self.counts["queued"] += 1
+            running, queued = self.counts["running"], self.counts["queued"]
+        log(f"service.job=ACCEPTED id={job.id} cmd={cli}:{command}")
+        await send({"event": "accepted", "job": job.id, "running": running, "queued": queued})
+        # Contexto vacío por job: sink de logs, deadline y budget no se filtran entre jobs
+        future = loop.run_in_executor(
+            self.executor, contextvars.Context().run, self._execute, job
+        )
+        future.add_done_callback(lambda _: job.events.put_nowait(None))
+        connected = True
+        while True:
+            event = await job.events.get()
+            if event is None:
+                break
+            if connected:
+                try:
+                    await send(event)
+                except (ConnectionError, OSError):
+                    # El job sigue: cortar un import a mitad de camino es peor que terminarlo
+                    connected = False
+                    log(f"service.job=DETACHED id={job.id} el cliente se desconectó")
+        exit_code, output = future.result()
+        duration = time.monotonic() - job.submitted
+        with self._lock:
+            self.counts["completed" if exit_code == 0 else "failed"] += 1
+        log(f"service.job=DONE id={job.id} exit={exit_code} duration={duration:.1f}s")
+        if connected:
+            await send(
+                {
+                    "event": "result",
+                    "job": job.id,
+                    "exitCode": exit_code,
+                    "output": output,
+                    "durationS": round(duration, 1),
+                }
+            )
+
+    async def _serve_http(
+        self, first: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        method, path = (first.decode("latin-1").split(" ") + ["", ""])[:2]
+        length, token = 0, ""
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = min(int(value.strip() or 0), _MAX_REQUEST)
+            elif name == "authorization" and value.strip().lower().startswith("bearer "):
+                token = value.strip()[7:].strip()
+        body = await reader.readexactly(length) if length else b""
+        head = "HTTP/1.1 {}\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n"
+
+        async def send(event: dict) -> None:
+            writer.write(json.dumps(event).encode("utf-8") + b"\n")
+            await writer.drain()
+
+        if not self._authorized(token):
+            writer.write(head.format("401 Unauthorized").encode("ascii"))
+            await send({"event": "error", "error": "No autorizado (APPIAN_SERVICE_TOKEN)"})
+        elif method == "GET" and path.startswith("/status"):
+            writer.write(head.format("200 OK").encode("ascii"))
+            await send(self.status())
+        elif method == "POST" and path.startswith("/jobs"):
+            writer.write(head.format("200 OK").encode("ascii"))
+            await self._run(json.loads(body or b"{}"), send)
+        else:
+            writer.write(head.format("404 Not Found").encode("ascii"))
+            await send({"event": "error", "error": f"Ruta desconocida: {method} {path}"})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def send(event: dict) -> None:
+            writer.write(json.dumps(event).encode("utf-8") + b"\n")
+            await writer.drain()
+
+        try:
+            first = await reader.readline()
+            if first[:1] != b"{":
+                await self._serve_http(first, reader, writer)
+                return
+            request = json.loads(first)
+            op = request.get("op", "run")
+            if not self._authorized(request.get("token")):
+                await send({"event": "error", "error": "No autorizado (APPIAN_SERVICE_TOKEN)"})
+            elif op == "status":
+                await send(self.status())
+            elif op == "run":
+                await self._run(request, send)
+            else:
+                await send({"event": "error", "error": f"Operación desconocida: {op}"})
+        except (ValueError, asyncio.IncompleteReadError) as exc:
+            await send({"event": "error", "error": f"Request inválido: {exc}"})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: Optional[Path] = None, port: int = 0) -> None:
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+            socket_path.parent.mkdir(parents=True, exist_ok=True)
+            server = await asyncio.start_unix_server(
+                self.handle, str(socket_path), limit=_MAX_REQUEST
+            )
+            # Los requests llevan API keys: solo el usuario del runner puede conectarse
+            os.chmod(socket_path, 0o600)
+            where = f"unix:{socket_path}"
+        else:
+            # Solo localhost y con token: los jobs escriben rutas del cliente como este usuario
+            if not self.token:
+                raise RuntimeError("--port requiere APPIAN_SERVICE_TOKEN (o use --socket)")
+            server = await asyncio.start_server(
+                self.handle, "127.0.0.1", port, limit=_MAX_REQUEST
+            )
+            where = f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        log(f"service=LISTENING at={where} workers={self.workers} pid={os.getpid()}")
+        async with server:
+            await stop.wait()
+        log("service=STOPPING esperando los jobs en curso")
+        await asyncio.to_thread(self.executor.shutdown, True)
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+        log(
+            f"service=STOPPED completed={self.counts['completed']} "
+            f"failed={self.counts['failed']}"
+        )
+
+
+def serve(
+    runners: Dict[str, Runner],
+    socket_path: Optional[Path] = None,
+    port: int = 0,
+    workers: int = 4,
+) -> None:
+    """Run the service until SIGINT/SIGTERM (``export`` is added when missing)."""
+    runners = dict(runners)
+    runners.setdefault("export", _export_runner())
+    token = os.environ.get("APPIAN_SERVICE_TOKEN", "")
+    asyncio.run(PromotionService(runners, workers, token).serve(socket_path, port))
+
+
+def service_address() -> str:
+    """``APPIAN_SERVICE``: socket path (or ``unix:<path>``) or ``host:port``; empty = off."""
+    return os.environ.get("APPIAN_SERVICE", "").strip()
+
+
+def _connect(address: str) -> socket.socket:
+    for prefix in ("http://", "tcp://"):
+        if address.startswith(prefix):
+            address = address[len(prefix):].rstrip("/")
+    if address.startswith("unix:") or "/" in address:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[5:] if address.startswith("unix:") else address)
+        return sock
+    host, _, port = address.rpartition(":")
+    return socket.create_connection((host or "127.0.0.1", int(port)))
+
+
+def submit(cli: str, args: argparse.Namespace, address: Optional[str] = None) -> Optional[int]:
+    """Run ``cli args.cmd`` on the service; return its exit code.
+
+    ``None`` when the service cannot be reached or refuses the job because its
+    environment differs (the caller runs locally).
+    """
+    address = address or service_address()
+    local = [key for key in _LOCAL_ONLY_ENV if os.environ.get(key)]
+    if local:
+        log(f"service=SKIPPED ({','.join(local)} es por proceso); se ejecuta localmente")
+        return None
+    payload = {
+        key: (str(Path(value).resolve()) if key in PATH_ARGS and value else value)
+        for key, value in vars(args).items()
+    }
+    request = {
+        "op": "run",
+        "cli": cli,
+        "command": args.cmd,
+        "args": payload,
+        "deadline": float(os.environ.get("APPIAN_DEADLINE", "0") or 0),
+        "retryBudget": int(os.environ.get("APPIAN_RETRY_BUDGET", "0") or 0),
+        "env": shared_env(),
+        "token": os.environ.get("APPIAN_SERVICE_TOKEN", ""),
+    }
+    try:
+        sock = _connect(address)
+    except OSError as exc:
+        log(f"service=UNAVAILABLE at={address} ({exc}); se ejecuta localmente")
+        return None
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode("utf-8") + b"\n")
+        stream.flush()
+        for raw in stream:
+            event = json.loads(raw)
+            kind = event.get("event")
+            if kind == "log":
+                log_line(event["line"])
+            elif kind == "accepted":
+                log(
+                    f"service.job={event['job']} at={address} running={event['running']} "
+                    f"queued={event['queued']}"
+                )
+            elif kind == "result":
+                flush_logs()
+                if event.get("output"):
+                    print(event["output"])
+                return int(event.get("exitCode", 1))
+            elif kind == "error" and event.get("code") == "env_mismatch":
+                log(f"service=REJECTED at={address} ({event.get('error')}); se ejecuta localmente")
+                return None
+            elif kind == "error":
+                raise RuntimeError(f"El servicio rechazó el job: {event.get('error')}")
+    raise RuntimeError(f"El servicio {address} cerró la conexión sin resultado del job")
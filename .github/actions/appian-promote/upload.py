@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Prepared multipart uploads shared by inspection and import requests."""
+
+import hashlib
+import json
+import os
+import uuid as _uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from artifact_store import ArtifactStore
+from utils import _guess_ct
+
+CHUNK_SIZE = 1024 * 1024
+
+# (ruta, nombre a enviar, orderId opcional) — mismo formato que import_cli.DbScriptSpec
+DbScriptSpec = Tuple[Path, str, Optional[int]]
+
+
+class Attachment(NamedTuple):
+    path: Path
+    filename: str
+    size: int
+    sha256: str
+    mtime_ns: int
+    content_type: str
+
+
+def _describe(
+    path: Path,
+    filename: Optional[str] = None,
+    sha256: Optional[str] = None,
+) -> Tuple[Attachment, bytes]:
+    """Hash and size ``path`` in one pass; also returns its first bytes.
+
+    A ``sha256`` already verified (export manifest) is trusted as is and only
+    the first bytes are read.
+    """
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    with path.open("rb") as fh:
+        st = os.fstat(fh.fileno())
+        if sha256:
+            head = fh.read(4)
+            size = st.st_size
+        else:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                if not head:
+                    head = chunk[:4]
+                digest.update(chunk)
+                size += len(chunk)
+    attachment = Attachment(
+        path=path,
+        filename=filename or path.name,
+        size=size,
+        sha256=sha256 or digest.hexdigest(),
+        mtime_ns=st.st_mtime_ns,
+        content_type=_guess_ct(path),
+    )
+    return attachment, head
+
+
+class MultipartBody:
+    """Replayable streaming multipart/form-data body.
+
+    Iterating yields the encoded body chunk by chunk straight from disk; every
+    iteration starts over, so the same object serves retries. Files are checked
+    against the size/mtime recorded at preparation instead of being re-hashed.
+    """
+
+    def __init__(self, json_part: dict, parts: Sequence[Tuple[str, Attachment]]) -> None:
+        self.boundary = f"----AppianBoundary{_uuid.uuid4().hex}"
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._json = (
+            f"--{self.boundary}\r\n"
+            "Content-Disposition: form-data; name=\"json\"\r\n"
+            "Content-Type: application/json\r\n\r\n"
+        ).encode("utf-8") + json.dumps(json_part).encode("utf-8") + b"\r\n"
+        self._parts: List[Tuple[bytes, Attachment]] = []
+        for field, att in parts:
+            head = (
+                f"--{self.boundary}\r\n"
+                f"Content-Disposition: form-data; name=\"{field}\"; "
+                f"filename=\"{att.filename}\"\r\n"
+                f"Content-Type: {att.content_type}\r\n\r\n"
+            ).encode("utf-8")
+            self._parts.append((head, att))
+        self._tail = f"--{self.boundary}--\r\n".encode("utf-8")
+        self.length = (
+            len(self._json)
+            + sum(len(head) + att.size + 2 for head, att in self._parts)
+            + len(self._tail)
+        )
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._json
+        for head, att in self._parts:
+            yield head
+            with att.path.open("rb") as fh:
+                st = os.fstat(fh.fileno())
+                if st.st_size != att.size or st.st_mtime_ns != att.mtime_ns:
+                    raise RuntimeError(
+                        f"El archivo cambió después de prepararse para upload: {att.path}"
+                    )
+                while True:
+                    chunk = fh.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            yield b"\r\n"
+        yield self._tail
+
+
+class PreparedUpload:
+    """Validated, hashed and sized attachments for one promotion.
+
+    Built once per run; ``inspection_body`` and ``import_body`` reuse the same
+    metadata so files are read from disk only while streaming each request.
+    ``digests`` (resolved path -> SHA-256) skips hashing files already verified.
+    """
+
+    def __init__(
+        self,
+        package_path: Path,
+        customization_path: Optional[Path] = None,
+        admin_settings_path: Optional[Path] = None,
+        plugins_zip: Optional[Path] = None,
+        db_scripts: Optional[List[DbScriptSpec]] = None,
+        digests: Optional[Dict[Path, str]] = None,
+    ) -> None:
+        if not package_path.exists():
+            raise FileNotFoundError(f"No existe el paquete: {package_path}")
+        if customization_path and not customization_path.exists():
+            raise FileNotFoundError(f"No existe customization file: {customization_path}")
+        if admin_settings_path and not admin_settings_path.exists():
+            raise FileNotFoundError(f"No existe admin console settings: {admin_settings_path}")
+        if plugins_zip and not plugins_zip.exists():
+            raise FileNotFoundError(f"No existe plugins zip: {plugins_zip}")
+        for script_path, _, _ in db_scripts or []:
+            if not script_path.exists():
+                raise FileNotFoundError(f"No existe database script: {script_path}")
+
+        known = digests or {}
+
+        def _describe_known(path: Path, filename: Optional[str] = None) -> Tuple[Attachment, bytes]:
+            return _describe(path, filename, known.get(path.resolve()))
+
+        try:
+            self.package, head = _describe_known(package_path)
+        except OSError as e:
+            raise RuntimeError(f"No se pudo validar el ZIP del paquete: {e}") from e
+        if self.package.size < 1024 or not (len(head) >= 2 and head[:2] == b"PK"):
+            raise RuntimeError(
+                "El artifact no es un ZIP válido para Appian "
+                f"(size={self.package.size}B, magic={head!r})."
+            )
+        self.customization = (
+            _describe_known(customization_path)[0] if customization_path else None
+        )
+        self.admin_settings = (
+            _describe_known(admin_settings_path)[0] if admin_settings_path else None
+        )
+        self.plugins = _describe_known(plugins_zip)[0] if plugins_zip else None
+        # orderId se fija aquí según la posición original para no depender de filtros posteriores
+        self.db_scripts: List[Tuple[Attachment, int]] = []
+        for idx, (script_path, script_name, order_id) in enumerate(db_scripts or [], start=1):
+            att = _describe_known(script_path, script_name or script_path.name)[0]
+            self.db_scripts.append((att, order_id if order_id is not None else idx))
+        self._store: Optional[ArtifactStore] = None
+        self._pins: List[Path] = []
+
+    def use_store(self, store: ArtifactStore) -> int:
+        """Stream every attachment ``store`` already holds from the store object.
+
+        Objects are looked up by the digests computed (or verified) here and
+        pinned until ``release_store``, so a concurrent job evicting them cannot
+        cut an upload short. Misses keep streaming from the workspace and are
+        not added: the export fills the store. Returns the number of hits.
+        """
+        self._store = store
+
+        def _resolve(att: Optional[Attachment]) -> Optional[Attachment]:
+            if att is None:
+                return None
+            try:
+                pinned = store.pin(att.sha256)
+            except OSError:
+                # Sin hardlinks en el store: se sube desde el workspace
+                return att
+            if pinned is None:
+                return att
+            self._pins.append(pinned)
+            return att._replace(path=pinned, mtime_ns=pinned.stat().st_mtime_ns)
+
+        self.package = _resolve(self.package)
+        self.customization = _resolve(self.customization)
+        self.admin_settings = _resolve(self.admin_settings)
+        self.plugins = _resolve(self.plugins)
+        self.db_scripts = [(_resolve(att), order_id) for att, order_id in self.db_scripts]
+        return len(self._pins)
+
+    def release_store(self) -> None:
+        """Unpin the store objects taken by ``use_store`` (idempotent)."""
+        pins, self._pins = self._pins, []
+        for pinned in pins:
+            self._store.unpin(pinned)
+
+    @property
+    def attachments(self) -> List[Attachment]:
+        found = [self.package, self.customization, self.admin_settings, self.plugins]
+        found.extend(att for att, _ in self.db_scripts)
+        return [att for att in found if att is not None]
+
+    def _common(self) -> Tuple[dict, List[Tuple[str, Attachment]]]:
+        json_obj: dict = {"packageFileName": self.package.filename}
+        parts: List[Tuple[str, Attachment]] = [("packageFileName", self.package)]
+        if self.customization:
+            json_obj["customizationFileName"] = self.customization.filename
+            parts.append(("customizationFileName", self.customization))
+        if self.admin_settings:
+            json_obj["adminConsoleSettingsFileName"] = self.admin_settings.filename
+            parts.append(("adminConsoleSettingsFileName", self.admin_settings))
+        return json_obj, parts
+
+    def inspection_body(self) -> MultipartBody:
+        json_obj, parts = self._common()
+        return MultipartBody(json_obj, parts)
+
+    def import_body(
+        self,
+        name: str,
+        description: str,
+        data_source: Optional[str] = None,
+    ) -> MultipartBody:
+        common, parts = self._common()
+        json_obj: dict = {"name": name, "description": description}
+        json_obj.update(common)
+        if self.plugins:
+            json_obj["pluginsFileName"] = self.plugins.filename
+            parts.append(("pluginsFileName", self.plugins))
+        if data_source:
+            json_obj["dataSource"] = data_source
+        if self.db_scripts:
+            payload_scripts = []
+            for idx, (att, order_id) in enumerate(self.db_scripts, start=1):
+                payload_scripts.append({"fileName": att.filename, "orderId": str(order_id)})
+                parts.append((f"databaseScript{idx}", att))
+            json_obj["databaseScripts"] = payload_scripts
+        return MultipartBody(json_obj, parts)
@@ -2,39 +2,31 @@
 """Shared utilities for Appian promotion scripts."""
 
 import json
-import sys
-import uuid as _uuid
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from typing import Dict, Tuple
 
-
-def log(msg: str) -> None:
-    """Emit a log line compatible with GitHub Actions."""
-    print(msg, flush=True, file=sys.stderr)
+from async_http import Body, default_client, run_sync
+from logger import log  # noqa: F401 - los módulos siguen importando log desde utils
 
 
 def _http(
     method: str,
     url: str,
     headers: dict,
-    data: bytes | None = None,
+    data: Body = None,
     timeout: int = 60,
 ) -> Tuple[bytes, Dict[str, str]]:
-    req = Request(url, data=data, method=method)
-    for k, v in headers.items():
-        req.add_header(k, v)
-    try:
-        with urlopen(req, timeout=timeout) as resp:
-            raw = resp.read()
-            hdrs = {k.lower(): v for k, v in resp.headers.items()}
-            return raw, hdrs
-    except HTTPError as e:
-        message = e.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {e.code} on {url}: {message}") from e
-    except URLError as e:
-        raise RuntimeError(f"Network error on {url}: {e}") from e
+    """Blocking request over the shared async client (see ``async_http``).
+
+    Raises ``AppianHTTPError``/``AppianNetworkError``; connections stay pooled
+    between calls on the same thread.
+    """
+
+    async def _call() -> Tuple[bytes, Dict[str, str]]:
+        resp = await default_client().request(method, url, headers, data, timeout=timeout)
+        return resp.body, resp.headers
+
+    return run_sync(_call())
 
 
 def http_json(method: str, url: str, headers: dict, body: dict | None = None, timeout: int = 60):
@@ -61,38 +53,3 @@ def _guess_ct(path: Path) -> str:
     if name.endswith(".sql") or name.endswith(".ddl"):
         return "text/plain"
     return "application/octet-stream"
-
-
-FileEntry = Union[Path, Tuple[Path, Optional[str]]]
-
-
-def _multipart_form(json_part: dict, files: Dict[str, FileEntry]) -> Tuple[bytes, str]:
-    boundary = f"----AppianBoundary{_uuid.uuid4().hex}"
-    parts: list[bytes] = []
-
-    json_bytes = json.dumps(json_part).encode("utf-8")
-    parts.append((
-        f"--{boundary}\r\n"
-        f"Content-Disposition: form-data; name=\"json\"\r\n"
-        f"Content-Type: application/json\r\n\r\n"
-    ).encode("utf-8") + json_bytes + b"\r\n")
-
-    for field, entry in files.items():
-        if isinstance(entry, tuple):
-            path, override_name = entry
-        else:
-            path, override_name = entry, None
-        data = path.read_bytes()
-        ct = _guess_ct(path)
-        filename = override_name or path.name
-        disp = (
-            f"--{boundary}\r\n"
-            f"Content-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
-            f"Content-Type: {ct}\r\n\r\n"
-        ).encode("utf-8")
-        parts.append(disp + data + b"\r\n")
-
-    parts.append(f"--{boundary}--\r\n".encode("utf-8"))
-    body = b"".join(parts)
-    content_type = f"multipart/form-data; boundary={boundary}"
-    return body, content_type
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Watch many Appian deployments/inspections across environments at once.
+
+Each target is polled by its own task on one event loop; start times are
+staggered over the poll interval so requests do not burst, and targets leave
+the schedule as soon as they reach a terminal state. Status transitions are
+streamed as JSON lines.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, IO, List, NamedTuple, Optional
+
+from async_http import gather_all
+from deadline import operation_deadline
+from engine import AppianEngine
+from errors import AppianError, AppianHTTPError
+from metrics import count_final_status, count_poll
+from retry import RetryPolicy
+from utils import log
+
+DEFAULT_BASE_URLS_FILE = (
+    Path(__file__).resolve().parent.parent / "_config" / "appian_base_urls.env"
+)
+
+KINDS = ("deployment", "inspection")
+
+DEPLOYMENT_TERMINAL = frozenset(
+    {
+        "COMPLETED",
+        "COMPLETED_WITH_ERRORS",
+        "COMPLETED_WITH_IMPORT_ERRORS",
+        "COMPLETED_WITH_PUBLISH_ERRORS",
+        "COMPLETED_WITH_EXPORT_ERRORS",
+        "FAILED",
+        "PENDING_REVIEW",
+        "REJECTED",
+    }
+)
+INSPECTION_TERMINAL = frozenset({"COMPLETED", "FAILED"})
+# Mismo criterio que import_package: PENDING_REVIEW no es un fallo
+OK_STATUSES = frozenset({"COMPLETED", "PENDING_REVIEW"})
+
+
+class WatchTarget(NamedTuple):
+    env: str
+    kind: str
+    uuid: str
+
+
+def parse_target(spec: str) -> WatchTarget:
+    """Parse ``ENV:UUID`` or ``ENV:KIND:UUID`` (kind: deployment|inspection)."""
+    parts = [p.strip() for p in spec.split(":")]
+    if len(parts) == 2:
+        env, kind, uuid = parts[0], "deployment", parts[1]
+    elif len(parts) == 3:
+        env, kind, uuid = parts
+    else:
+        raise ValueError(f"Target inválido '{spec}': use ENV:UUID o ENV:KIND:UUID")
+    kind = kind.lower()
+    if kind not in KINDS:
+        raise ValueError(f"Tipo inválido '{kind}' en '{spec}': use deployment|inspection")
+    if not env or not uuid:
+        raise ValueError(f"Target inválido '{spec}': falta env o uuid")
+    return WatchTarget(env.lower(), kind, uuid)
+
+
+def load_base_urls(path: Path) -> Dict[str, str]:
+    """Read ``ENV=https://...`` lines (same file the composite actions grep)."""
+    if not path.exists():
+        raise FileNotFoundError(f"No existe archivo de base URLs: {path}")
+    urls: Dict[str, str] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        urls[key.strip().lower()] = value.strip()
+    return urls
+
+
+def resolve_engines(
+    targets: List[WatchTarget],
+    base_urls_file: Path,
+) -> Dict[str, AppianEngine]:
+    """One engine per environment; keys come from ``APPIAN_<ENV>_API_KEY``."""
+    urls = load_base_urls(base_urls_file)
+    engines: Dict[str, AppianEngine] = {}
+    for env in sorted({t.env for t in targets}):
+        base_url = urls.get(env)
+        if not base_url:
+            raise RuntimeError(f"Entorno '{env}' no definido en {base_urls_file}")
+        key_var = f"APPIAN_{env.upper()}_API_KEY"
+        api_key = os.environ.get(key_var, "")
+        if not api_key:
+            raise RuntimeError(f"Variable '{key_var}' no definida o vacía para '{env}'")
+        engines[env] = AppianEngine(base_url, api_key)
+    return engines
+
+
+def _inspection_errors(payload: dict) -> int:
+    problems = (payload.get("summary") or {}).get("problems") or {}
+    return int(problems.get("totalErrors") or 0)
+
+
+class DeploymentWatcher:
+    """Poll many targets concurrently and emit JSON-line transitions."""
+
+    def __init__(
+        self,
+        engines: Dict[str, AppianEngine],
+        interval_s: float,
+        max_wait_s: float,
+        out: IO[str] = sys.stdout,
+    ) -> None:
+        self.engines = engines
+        self.interval_s = max(0.0, interval_s)
+        # Con APPIAN_DEADLINE ningún target espera más que lo que le queda a la corrida
+        self.max_wait_s = operation_deadline().grant("watch", max_wait_s)
+        self.out = out
+        self.results: Dict[WatchTarget, dict] = {}
+
+    def _emit(self, event: str, target: WatchTarget, **fields: object) -> None:
+        record = {
+            "ts": round(time.time(), 3),
+            "event": event,
+            "env": target.env,
+            "kind": target.kind,
+            "uuid": target.uuid,
+        }
+        record.update(fields)
+        self.out.write(json.dumps(record) + "\n")
+        self.out.flush()
+
+    async def _fetch(self, target: WatchTarget) -> dict:
+        engine = self.engines[target.env]
+        if target.kind == "inspection":
+            return await engine.get_inspection(target.uuid)
+        return await engine.get_deployment(target.uuid)
+
+    async def _watch_one(self, target: WatchTarget, delay_s: float) -> dict:
+        terminal = INSPECTION_TERMINAL if target.kind == "inspection" else DEPLOYMENT_TERMINAL
+        policy = RetryPolicy(int(os.environ.get("APPIAN_WATCH_RETRIES", "5")), self.interval_s)
+        await asyncio.sleep(delay_s)
+        started = time.monotonic()
+        previous = ""
+        retries = 0
+        while True:
+            status = ""
+            payload: dict = {}
+            count_poll(f"watch.{target.kind}")
+            try:
+                payload = await self._fetch(target)
+                status = str(payload.get("status", "")).upper()
+                retries = 0
+            except AppianHTTPError as exc:
+                if not (target.kind == "inspection" and exc.status == 404):
+                    retries += 1
+                    if not policy.allows(exc, retries):
+                        return self._finish(target, "ERROR", previous, error=exc.summary)
+                # Inspección recién creada: 404 hasta que Appian la registra
+                status = previous or "PENDING"
+            except AppianError as exc:
+                retries += 1
+                if not policy.allows(exc, retries):
+                    return self._finish(target, "ERROR", previous, error=exc.summary)
+                status = previous
+            if status and status != previous:
+                self._emit("status", target, status=status, previous=previous or None)
+                previous = status
+            if status in terminal:
+                count_final_status(f"watch.{target.kind}", status)
+                if target.kind == "inspection" and status == "COMPLETED":
+                    errors = _inspection_errors(payload)
+                    if errors:
+                        return self._finish(target, "FAILED", status, inspection_errors=errors)
+                outcome = "OK" if status in OK_STATUSES else "FAILED"
+                return self._finish(target, outcome, status)
+            if time.monotonic() - started > self.max_wait_s:
+                return self._finish(target, "TIMEOUT", previous)
+            await asyncio.sleep(self.interval_s)
+
+    def _finish(self, target: WatchTarget, outcome: str, status: str, **extra: object) -> dict:
+        result = {"outcome": outcome, "status": status or None}
+        result.update(extra)
+        self.results[target] = result
+        self._emit("done", target, **result)
+        return result
+
+    async def run(self, targets: List[WatchTarget]) -> int:
+        """Watch ``targets`` until all finish; return a combined exit code."""
+        unique = list(dict.fromkeys(targets))
+        # Repartir el primer poll a lo largo de un intervalo para evitar ráfagas
+        step = self.interval_s / len(unique) if unique else 0.0
+        await gather_all(*(self._watch_one(t, idx * step) for idx, t in enumerate(unique)))
+        counts: Dict[str, int] = {}
+        for result in self.results.values():
+            counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+        ok = counts.get("OK", 0) == len(unique)
+        summary = {"ts": round(time.time(), 3), "event": "summary", "total": len(unique)}
+        summary.update({k.lower(): v for k, v in sorted(counts.items())})
+        summary["success"] = ok
+        self.out.write(json.dumps(summary) + "\n")
+        self.out.flush()
+        log(
+            f"watch.result={'OK' if ok else 'FAILED'} "
+            + " ".join(f"{k.lower()}={v}" for k, v in sorted(counts.items()))
+        )
+        return 0 if ok else 1
+
+
+async def watch_async(
+    targets: List[WatchTarget],
+    base_urls_file: Optional[Path] = None,
+    interval_s: Optional[float] = None,
+    max_wait_s: Optional[float] = None,
+    out: IO[str] = sys.stdout,
+) -> int:
+    engines = resolve_engines(targets, base_urls_file or DEFAULT_BASE_URLS_FILE)
+    if interval_s is None:
+        interval_s = float(os.environ.get("APPIAN_PROMOTE_POLL_INTERVAL", "5"))
+    if max_wait_s is None:
+        max_wait_s = float(os.environ.get("APPIAN_PROMOTE_MAX_WAIT", "1800"))
+    log(f"watch: {len(targets)} targets en {len(engines)} entornos (intervalo {interval_s:g}s)")
+    return await DeploymentWatcher(engines, interval_s, max_wait_s, out).run(targets)
@@ -2,43 +2,48 @@
 """CLI helpers to resolve Appian package UUIDs by name."""
 
 import argparse
-import json
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
-
-
-def http_json(method: str, url: str, headers: dict):
-    """Perform an HTTP request and parse a JSON response."""
-    req = Request(url, method=method)
-    for k, v in headers.items():
-        req.add_header(k, v)
-    try:
-        with urlopen(req, timeout=60) as resp:
-            raw = resp.read()
-            return json.loads(raw.decode("utf-8"))
-    except HTTPError as e:
-        message = e.read().decode("utf-8", "ignore")
-        raise RuntimeError(f"HTTP {e.code} on {url}: {message}") from e
-    except URLError as e:
-        raise RuntimeError(f"Network error on {url}: {e}") from e
+import sys
+from pathlib import Path
+from typing import List
+
+# Cliente HTTP compartido (rate limit, retries, circuit breaker) y perfilado opcional
+_PROMOTE_DIR = Path(__file__).resolve().parents[1] / "appian-promote"
+if str(_PROMOTE_DIR) not in sys.path:
+    sys.path.append(str(_PROMOTE_DIR))
+
+from async_http import run_sync  # noqa: E402
+from engine import AppianEngine  # noqa: E402
+from profiling import run_main  # noqa: E402
+from retry import RetryPolicy  # noqa: E402
 
 
 def resolve_package_uuid(base_url: str, api_key: str, app_uuid: str, package_name: str) -> str:
-    """Resolve the UUID for a package by calling the Appian Deployment Management API."""
-    url = f"{base_url.rstrip('/')}/suite/deployment-management/v2/applications/{app_uuid}/packages"
-    headers = {"appian-api-key": api_key, "Accept": "application/json"}
-    data = http_json("GET", url, headers)
-    pkgs = data.get("packages", []) or []
-    # Prefer exact (case-insensitive), fallback to substring.
-    # Appian already sorts by lastModified desc.
+    """Resolve the UUID for a package by calling the Appian Deployment Management API.
+
+    Prefers an exact (case-insensitive) name, falling back to a substring.
+    Appian lists packages by lastModified desc, so the listing is walked page
+    by page and stops at the first exact match; the first substring match
+    only wins once the whole listing has been seen without one.
+    """
     name_ci = package_name.strip().lower()
-    exact = [p for p in pkgs if str(p.get("name", "")).strip().lower() == name_ci]
-    if exact:
-        return exact[0].get("uuid")
-    partial = [p for p in pkgs if name_ci in str(p.get("name", "")).strip().lower()]
-    if partial:
-        return partial[0].get("uuid")
-    raise RuntimeError(f"No se encontró package con nombre '{package_name}'.")
+    partial: List[dict] = []
+
+    def _exact(pkg: dict) -> bool:
+        pkg_name = str(pkg.get("name", "")).strip().lower()
+        if pkg_name == name_ci:
+            return True
+        if not partial and name_ci in pkg_name:
+            partial.append(pkg)
+        return False
+
+    engine = AppianEngine(base_url, api_key)
+    policy = RetryPolicy.from_env("APPIAN_RESOLVE_RETRIES", 3, "APPIAN_RESOLVE_RETRY_DELAY", 5)
+    match = run_sync(engine.scan_packages(app_uuid, _exact, policy=policy))
+    if match is None and partial:
+        match = partial[0]
+    if match is None:
+        raise RuntimeError(f"No se encontró package con nombre '{package_name}'.")
+    return match.get("uuid")
 
 
 def main():
@@ -59,4 +64,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_main(main, "resolve-package")